@@ -53,6 +53,18 @@ ANALYST_SYSTEM_PROMPT = """Ты — опытный аналитик данных
 Всегда возвращай объект с полями "logic" и "next_step". Никогда не возвращай "tool" и "reason" напрямую без обертки в "next_step".
 """
 
+# Порядок инструментов из плана в ANALYST_SYSTEM_PROMPT (используется фиксированным планировщиком)
+ANALYST_PLAN = [
+    "PrimaryFeatureFinder",
+    "CorrelationAnalysis",
+    "DescriptiveStatsComparator",
+    "CategoricalFeatureAnalysis",
+    "DistributionVisualizer",
+    "OutlierDetector",
+    "InteractionAnalyzer",
+    "FullModelFeatureImportance",
+]
+
 
 
 def create_analyst_agent(tools: List) -> callable:
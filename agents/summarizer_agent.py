@@ -1,11 +1,12 @@
 # agents/summarizer_agent.py
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 
+from core.image_policy import is_image_path
 from core.logger import get_logger
 
 load_dotenv()
@@ -151,7 +152,7 @@ def _format_interaction_details(result: Optional[Dict[str, Any]]) -> str:
     details = result.get("details", {})
     interactions = details.get("interactions", [])
     
-    if not interactions:
+    if not interactions and not details.get("pairwise_interactions"):
         return ""
     
     lines = ["\n**Анализ взаимодействий:**"]
@@ -191,6 +192,14 @@ def _format_interaction_details(result: Optional[Dict[str, Any]]) -> str:
                 value_str = f"{value}"
             
         lines.append(f"| {feature} | {type_} | {value_str} | {metric} |")
+
+    # Парные взаимодействия (LR-тест лучших пар после отбора)
+    for pair in details.get("pairwise_interactions", []):
+        feature = " × ".join(pair.get("features", []))
+        lines.append(
+            f"| {feature} | pair | p={pair.get('p_value', float('nan')):.2e}, "
+            f"LR={pair.get('lr_statistic', float('nan')):.2f} | lr_test |"
+        )
     
     return "\n".join(lines)
 
@@ -213,7 +222,7 @@ def _format_insight_visualization_details(result: Optional[Dict[str, Any]]) -> s
         
         # Добавляем пути к изображениям
         for plot_type, filepath in plot_data.items():
-            if plot_type != "description" and filepath and isinstance(filepath, str) and filepath.endswith('.png'):
+            if plot_type != "description" and filepath and isinstance(filepath, str) and is_image_path(filepath):
                 # Извлекаем относительный путь для Markdown
                 # Предполагаем, что файлы сохраняются в report/output/images/
                 # filepath может быть, например: report/output/images/desc_MonthlyRevenue_min_boxplot.png
@@ -314,12 +323,12 @@ SUMMARIZER_PROMPT = """
 """
 
 
-def generate_summary(
-    insights: List[str], 
-    tool_results: List[Dict[str, Any]], 
-    filename: str = "unknown.csv"
-) -> str:
-    """Генерирует итоговый аналитический отчёт на основе результатов инструментов."""
+def _summary_chain(
+    insights: List[str],
+    tool_results: List[Dict[str, Any]],
+    filename: str,
+) -> Tuple[Any, Dict[str, str]]:
+    """Цепочка (prompt | llm) и её входные данные для итогового отчёта."""
     logger.info(f"📝 Summarizer Agent инициализирован для файла {filename}")
 
     llm = ChatOpenAI(
@@ -350,7 +359,7 @@ def generate_summary(
     prompt = ChatPromptTemplate.from_template(SUMMARIZER_PROMPT)
     chain = prompt | llm
 
-    response = chain.invoke({
+    return chain, {
         "filename": filename,
         "insights_list": insights_list,
         "primary_feature_summary": get_summary("PrimaryFeatureFinder"),
@@ -371,6 +380,26 @@ def generate_summary(
         # Новые поля для InsightDrivenVisualizer
         "insight_viz_summary": get_summary("InsightDrivenVisualizer"),
         "insight_viz_details": _format_insight_visualization_details(insight_viz_result),
-    })
+    }
+
 
+def generate_summary(
+    insights: List[str], 
+    tool_results: List[Dict[str, Any]], 
+    filename: str = "unknown.csv"
+) -> str:
+    """Генерирует итоговый аналитический отчёт на основе результатов инструментов."""
+    chain, inputs = _summary_chain(insights, tool_results, filename)
+    response = chain.invoke(inputs)
+    return response.content
+
+
+async def agenerate_summary(
+    insights: List[str],
+    tool_results: List[Dict[str, Any]],
+    filename: str = "unknown.csv"
+) -> str:
+    """Асинхронная версия generate_summary: запрос к LLM через ainvoke."""
+    chain, inputs = _summary_chain(insights, tool_results, filename)
+    response = await chain.ainvoke(inputs)
     return response.content
@@ -1,5 +1,6 @@
 # agents/tools_wrapper.py
-from typing import Dict, Any
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 
@@ -13,17 +14,30 @@ from tools.distribution_visualizer import distribution_visualizer
 from tools.outlier_detector import outlier_detector
 from tools.interaction_analyzer import interaction_analyzer
 from tools.insight_driven_visualizer import insight_driven_visualizer
+from core.plotting import get_current_registry
 
-# Глобальные переменные для передачи данных
-CURRENT_DF = None
-CURRENT_TARGET = None
+# Данные текущего запуска (DataFrame, таргет, контекст анализа). Хранятся в ContextVar,
+# а не в глобальных переменных: у каждой задачи asyncio (и у потоков, запущенных из неё
+# через asyncio.to_thread или с копией контекста) свой запуск, и параллельные анализы
+# в одном процессе не видят данных друг друга.
+_CURRENT_DATA: ContextVar[Tuple[Any, Optional[str], Any]] = ContextVar(
+    "insightfinder_current_data", default=(None, None, None)
+)
 
 
-def set_current_data(df, target_column: str):
-    """Устанавливает глобальные данные, доступные всем тулзам."""
-    global CURRENT_DF, CURRENT_TARGET
-    CURRENT_DF = df
-    CURRENT_TARGET = target_column
+def set_current_data(df, target_column: str, context=None):
+    """
+    Устанавливает данные текущего запуска, доступные всем тулзам.
+
+    context — общий AnalysisContext, построенный один раз за запуск;
+    если не передан, каждый инструмент строит его сам.
+    """
+    _CURRENT_DATA.set((df, target_column, context))
+
+
+def get_current_data() -> Tuple[Any, Optional[str], Any]:
+    """Данные текущего запуска: (DataFrame, таргет, контекст анализа)."""
+    return _CURRENT_DATA.get()
 
 
 class PrimaryFeatureFinderTool(BaseTool):
@@ -32,7 +46,8 @@ class PrimaryFeatureFinderTool(BaseTool):
     return_direct: bool = False
 
     def _run(self, tool_input: Any = None, **kwargs) -> dict:
-        if CURRENT_DF is None or CURRENT_TARGET is None:
+        df, target_column, context = get_current_data()
+        if df is None or target_column is None:
             return {
                 "tool_name": self.name,
                 "status": "error",
@@ -40,7 +55,7 @@ class PrimaryFeatureFinderTool(BaseTool):
                 "details": {},
                 "error_message": "Ошибка: данные не загружены."
             }
-        return primary_feature_finder(CURRENT_DF, CURRENT_TARGET)
+        return primary_feature_finder(df, target_column, context=context)
 
 
 class CorrelationAnalysisTool(BaseTool):
@@ -49,7 +64,8 @@ class CorrelationAnalysisTool(BaseTool):
     return_direct: bool = False
 
     def _run(self, tool_input: Any = None, **kwargs) -> dict:
-        if CURRENT_DF is None or CURRENT_TARGET is None:
+        df, target_column, context = get_current_data()
+        if df is None or target_column is None:
             return {
                 "tool_name": self.name,
                 "status": "error",
@@ -57,7 +73,7 @@ class CorrelationAnalysisTool(BaseTool):
                 "details": {},
                 "error_message": "Ошибка: данные не загружены."
             }
-        return correlation_analysis(CURRENT_DF, CURRENT_TARGET)
+        return correlation_analysis(df, target_column, context=context)
 
 
 class DescriptiveStatsComparatorTool(BaseTool):
@@ -66,7 +82,8 @@ class DescriptiveStatsComparatorTool(BaseTool):
     return_direct: bool = False
 
     def _run(self, tool_input: Any = None, **kwargs) -> dict:
-        if CURRENT_DF is None or CURRENT_TARGET is None:
+        df, target_column, context = get_current_data()
+        if df is None or target_column is None:
             return {
                 "tool_name": self.name,
                 "status": "error",
@@ -74,7 +91,7 @@ class DescriptiveStatsComparatorTool(BaseTool):
                 "details": {},
                 "error_message": "Ошибка: данные не загружены."
             }
-        return descriptive_stats_comparator(CURRENT_DF, CURRENT_TARGET)
+        return descriptive_stats_comparator(df, target_column, context=context)
 
 
 class CategoricalFeatureAnalysisTool(BaseTool):
@@ -83,7 +100,8 @@ class CategoricalFeatureAnalysisTool(BaseTool):
     return_direct: bool = False
 
     def _run(self, tool_input: Any = None, **kwargs) -> dict:
-        if CURRENT_DF is None or CURRENT_TARGET is None:
+        df, target_column, context = get_current_data()
+        if df is None or target_column is None:
             return {
                 "tool_name": self.name,
                 "status": "error",
@@ -91,16 +109,17 @@ class CategoricalFeatureAnalysisTool(BaseTool):
                 "details": {},
                 "error_message": "Ошибка: данные не загружены."
             }
-        return categorical_feature_analysis(CURRENT_DF, CURRENT_TARGET)
+        return categorical_feature_analysis(df, target_column, context=context)
 
 
 class FullModelFeatureImportanceTool(BaseTool):
     name: str = "FullModelFeatureImportance"
-    description: str = "Обучает Random Forest и возвращает топ-10 важных признаков."
+    description: str = "Обучает Random Forest (на больших данных — на подвыборках строк) и возвращает топ-10 важных признаков."
     return_direct: bool = False
 
     def _run(self, tool_input: Any = None, **kwargs) -> dict:
-        if CURRENT_DF is None or CURRENT_TARGET is None:
+        df, target_column, context = get_current_data()
+        if df is None or target_column is None:
             return {
                 "tool_name": self.name,
                 "status": "error",
@@ -108,7 +127,7 @@ class FullModelFeatureImportanceTool(BaseTool):
                 "details": {},
                 "error_message": "Ошибка: данные не загружены."
             }
-        return full_model_importance(CURRENT_DF, CURRENT_TARGET)
+        return full_model_importance(df, target_column, context=context)
 
 
 class DistributionVisualizerTool(BaseTool):
@@ -117,7 +136,8 @@ class DistributionVisualizerTool(BaseTool):
     return_direct: bool = False
 
     def _run(self, tool_input: Any = None, **kwargs) -> dict:
-        if CURRENT_DF is None or CURRENT_TARGET is None:
+        df, target_column, context = get_current_data()
+        if df is None or target_column is None:
             return {
                 "tool_name": self.name,
                 "status": "error",
@@ -125,7 +145,9 @@ class DistributionVisualizerTool(BaseTool):
                 "details": {},
                 "error_message": "Ошибка: данные не загружены."
             }
-        return distribution_visualizer(CURRENT_DF, CURRENT_TARGET)
+        return distribution_visualizer(
+            df, target_column, plot_registry=get_current_registry(), context=context
+        )
 
 
 class OutlierDetectorTool(BaseTool):
@@ -134,7 +156,8 @@ class OutlierDetectorTool(BaseTool):
     return_direct: bool = False
 
     def _run(self, tool_input: Any = None, **kwargs) -> dict:
-        if CURRENT_DF is None or CURRENT_TARGET is None:
+        df, target_column, context = get_current_data()
+        if df is None or target_column is None:
             return {
                 "tool_name": self.name,
                 "status": "error",
@@ -142,16 +165,17 @@ class OutlierDetectorTool(BaseTool):
                 "details": {},
                 "error_message": "Ошибка: данные не загружены."
             }
-        return outlier_detector(CURRENT_DF, CURRENT_TARGET)
+        return outlier_detector(df, target_column, context=context)
 
 
 class InteractionAnalyzerTool(BaseTool):
     name: str = "InteractionAnalyzer"
-    description: str = "Анализирует взаимодействия между признаками и целевой переменной."
+    description: str = "Анализирует связи признаков с целевой переменной и ищет парные взаимодействия признаков (отбор по всем парам, LR-тест лучших)."
     return_direct: bool = False
 
     def _run(self, tool_input: Any = None, **kwargs) -> dict:
-        if CURRENT_DF is None or CURRENT_TARGET is None:
+        df, target_column, context = get_current_data()
+        if df is None or target_column is None:
             return {
                 "tool_name": self.name,
                 "status": "error",
@@ -159,7 +183,7 @@ class InteractionAnalyzerTool(BaseTool):
                 "details": {},
                 "error_message": "Ошибка: данные не загружены."
             }
-        return interaction_analyzer(CURRENT_DF, CURRENT_TARGET)
+        return interaction_analyzer(df, target_column, context=context)
 
 class InsightDrivenVisualizerTool(BaseTool):
     name: str = "InsightDrivenVisualizer"
@@ -191,3 +215,13 @@ ALL_TOOLS = [
     InteractionAnalyzerTool()
     # InsightDrivenVisualizerTool() - переехал в оркестратор
 ]
+
+# Входы инструментов для планировщика-графа (core/scheduler.py); выход инструмента —
+# его результат под его именем. DATA_INPUT — общие DataFrame и контекст (set_current_data).
+# Инструменты ALL_TOOLS читают только общие данные и друг от друга не зависят,
+# InsightDrivenVisualizer строит графики по результатам остальных.
+DATA_INPUT = "data"
+TOOL_INPUTS: Dict[str, List[str]] = {
+    **{tool.name: [DATA_INPUT] for tool in ALL_TOOLS},
+    "InsightDrivenVisualizer": [DATA_INPUT] + [tool.name for tool in ALL_TOOLS],
+}
@@ -0,0 +1,292 @@
+# core/analysis_context.py
+"""
+Общий контекст анализа: предобработка данных, выполняемая один раз за запуск.
+
+Все инструменты повторяли одни и те же шаги — отделение таргета, его
+кодирование, выбор числовых/категориальных столбцов, копирование и
+label-encoding. Контекст делает это один раз, а инструменты читают
+готовые массивы.
+
+Инструменты могут работать параллельно (core/scheduler.py), поэтому
+ленивые артефакты кэша вычисляются под замком своего ключа (cache_lock):
+каждый считается один раз, даже если его одновременно запросили
+несколько потоков.
+"""
+import threading
+import warnings
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.cardinality import (
+    ID_LIKE_RATIO,
+    MAX_CATEGORY_LEVELS,
+    approx_distinct,
+    fold_rare_levels,
+    is_id_like,
+    is_numeric_id_like,
+)
+from core.utils import select_numeric, to_float_array
+
+
+@dataclass
+class AnalysisContext:
+    """
+    Предобработанное представление датасета для инструментов анализа.
+
+    Attributes:
+        target_column: Имя целевой переменной.
+        y: Целевая переменная: исходные целые значения для числового таргета,
+            коды классов (как у LabelEncoder) — для строкового.
+        classes: Исходные значения классов таргета.
+        feature_names: Признаки (кроме таргета и столбцов-идентификаторов)
+            в порядке столбцов DataFrame.
+        numeric_names: Числовые признаки.
+        numeric: Числовой блок (n_rows, n_numeric), float64, NaN — пропуски.
+            Хранится по столбцам (Fortran order): каждый признак непрерывен в памяти.
+        medians: Медианы числовых признаков для заполнения пропусков.
+        categorical_names: Нечисловые признаки (строки, category, bool, даты).
+        cat_codes: Коды категорий (n_rows, n_categorical), int32, -1 — пропуск.
+        cat_levels: Уровни (уникальные значения) каждого категориального признака;
+            у признаков с высокой кардинальностью редкие уровни свёрнуты в OTHER_LEVEL.
+        cardinality_report: Какие столбцы пропущены как идентификаторы
+            (skipped_columns) и у каких свёрнуты редкие уровни (folded_columns).
+        fingerprint: Отпечаток датасета (из `df.attrs`), если известен.
+        frame_id: id() DataFrame, по которому построен контекст.
+        cache: Артефакты, вычисляемые инструментами лениво и переиспользуемые
+            в пределах запуска. Заполняются под замком ключа (cache_lock).
+    """
+
+    target_column: str
+    y: np.ndarray
+    classes: np.ndarray
+    feature_names: List[str]
+    numeric_names: List[str]
+    numeric: np.ndarray
+    medians: np.ndarray
+    categorical_names: List[str]
+    cat_codes: np.ndarray
+    cat_levels: List[np.ndarray]
+    cardinality_report: Dict[str, Any] = field(default_factory=dict)
+    fingerprint: Optional[str] = None
+    frame_id: Optional[int] = field(default=None, compare=False)
+    cache: Dict[str, Any] = field(default_factory=dict)
+    _cache_locks: Dict[Any, threading.RLock] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _cache_locks_guard: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def cache_lock(self, key: Any) -> threading.RLock:
+        """
+        Замок ключа кэша. Проверка и заполнение `cache[key]` выполняются под ним,
+        чтобы параллельные инструменты не считали один артефакт дважды.
+        """
+        with self._cache_locks_guard:
+            return self._cache_locks.setdefault(key, threading.RLock())
+
+    def cached(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """Значение `cache[key]`; при отсутствии вычисляется compute() (один раз на ключ)."""
+        if key in self.cache:
+            return self.cache[key]
+        with self.cache_lock(key):
+            if key not in self.cache:
+                self.cache[key] = compute()
+            return self.cache[key]
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.y)
+
+    @property
+    def is_binary(self) -> bool:
+        return len(self.classes) == 2
+
+    @property
+    def y_binary(self) -> np.ndarray:
+        """Таргет как индикатор второго класса (0/1, int8) — для бинарной задачи."""
+        return self.cached("y_binary", lambda: (self.y == self.classes[-1]).astype(np.int8))
+
+    @property
+    def y_index(self) -> np.ndarray:
+        """Индекс класса таргета (0..n_classes-1) для каждой строки (кэшируется)."""
+        if self.classes.dtype.kind in "biuf":
+            return self.cached("y_index", lambda: np.searchsorted(self.classes, self.y))
+        # Для строкового таргета y уже содержит коды классов
+        return self.y
+
+    def numeric_filled(self) -> np.ndarray:
+        """Числовой блок с пропусками, заполненными медианой (кэшируется)."""
+        def compute() -> np.ndarray:
+            filled = self.numeric.copy(order="F")
+            nan_rows, nan_cols = np.where(np.isnan(filled))
+            filled[nan_rows, nan_cols] = self.medians[nan_cols]
+            return filled
+
+        return self.cached("numeric_filled", compute)
+
+    def encoded_features(self) -> np.ndarray:
+        """
+        Матрица всех признаков для моделей (n_rows, n_features), float64.
+
+        Числовые признаки заполнены медианой, категориальные заменены кодами
+        (пропуск — отдельный код). Порядок столбцов совпадает с feature_names.
+        Результат кэшируется.
+        """
+        def compute() -> np.ndarray:
+            position = {name: i for i, name in enumerate(self.feature_names)}
+            matrix = np.empty((self.n_rows, len(self.feature_names)), dtype=np.float64, order="F")
+            if self.numeric_names:
+                filled = self.numeric_filled()
+                for j, name in enumerate(self.numeric_names):
+                    matrix[:, position[name]] = filled[:, j]
+            for j, name in enumerate(self.categorical_names):
+                codes = self.cat_codes[:, j]
+                matrix[:, position[name]] = np.where(codes < 0, len(self.cat_levels[j]), codes)
+            return matrix
+
+        return self.cached("encoded_features", compute)
+
+
+def _encode_target(target: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Кодирует таргет так же, как это делали инструменты (LabelEncoder / astype(int))."""
+    if target.dtype.kind not in "biufc":
+        classes, y = np.unique(target.astype(str).to_numpy(), return_inverse=True)
+        return y.astype(np.int64), classes
+    # Числовой таргет сохраняет исходные значения (0/1), а не коды
+    values = target.astype(int).to_numpy().astype(np.int64)
+    return values, np.unique(values)
+
+
+def build_analysis_context(
+    df: pd.DataFrame,
+    target_column: str,
+    max_levels: int = MAX_CATEGORY_LEVELS,
+    id_ratio: float = ID_LIKE_RATIO,
+) -> AnalysisContext:
+    """
+    Строит контекст анализа для DataFrame.
+
+    Категориальные столбцы, похожие на идентификаторы (оценка числа
+    уникальных значений > max_levels и >= id_ratio от числа наблюдений),
+    и такие же целочисленные столбцы, плотно заполняющие свой диапазон
+    (последовательные номера), исключаются из признаков; у остальных
+    столбцов больше max_levels уровней редкие уровни сворачиваются
+    в OTHER_LEVEL.
+
+    Args:
+        df: Входной DataFrame.
+        target_column: Имя целевой переменной.
+        max_levels: Максимальное число уровней категориального признака.
+        id_ratio: Доля уникальных значений, с которой столбец считается идентификатором.
+
+    Returns:
+        AnalysisContext.
+
+    Raises:
+        ValueError: Если целевой столбец отсутствует.
+    """
+    if target_column not in df.columns:
+        raise ValueError(f"target_column '{target_column}' not found")
+
+    y, classes = _encode_target(df[target_column])
+    X = df.drop(columns=[target_column])
+
+    skipped_columns: Dict[str, int] = {}
+    numeric_names = []
+    for name in select_numeric(X).columns:
+        # Целочисленные идентификаторы (номер клиента) не являются признаками
+        if is_numeric_id_like(X[name], max_levels, id_ratio):
+            skipped_columns[name] = int(round(approx_distinct(X[name].dropna())))
+            continue
+        numeric_names.append(name)
+    numeric = np.empty((len(X), len(numeric_names)), dtype=np.float64, order="F")
+    for j, name in enumerate(numeric_names):
+        numeric[:, j] = to_float_array(X[name])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        medians = np.nanmedian(numeric, axis=0) if numeric_names else np.empty(0)
+
+    numeric_set = set(select_numeric(X).columns)
+    categorical_names: List[str] = []
+    for name in X.columns:
+        if name in numeric_set:
+            continue
+        n_observed = int(X[name].notna().sum())
+        # Оценка кардинальности нужна, только если уровней может быть больше max_levels
+        if n_observed > max_levels:
+            n_distinct = approx_distinct(X[name])
+            if is_id_like(n_distinct, n_observed, max_levels, id_ratio):
+                skipped_columns[name] = int(round(n_distinct))
+                continue
+        categorical_names.append(name)
+
+    folded_columns: Dict[str, Dict[str, int]] = {}
+    cat_codes = np.empty((len(X), len(categorical_names)), dtype=np.int32, order="F")
+    cat_levels: List[np.ndarray] = []
+    for j, name in enumerate(categorical_names):
+        codes, levels = pd.factorize(X[name], sort=True)
+        codes, levels, n_folded = fold_rare_levels(codes, np.asarray(levels, dtype=object), max_levels)
+        if n_folded:
+            folded_columns[name] = {"n_levels": max_levels + n_folded, "kept_levels": max_levels}
+        cat_codes[:, j] = codes
+        cat_levels.append(levels)
+
+    feature_names = [name for name in X.columns if name not in skipped_columns]
+
+    return AnalysisContext(
+        target_column=target_column,
+        y=y,
+        classes=classes,
+        feature_names=feature_names,
+        numeric_names=numeric_names,
+        numeric=numeric,
+        medians=medians,
+        categorical_names=categorical_names,
+        cat_codes=cat_codes,
+        cat_levels=cat_levels,
+        cardinality_report={"skipped_columns": skipped_columns, "folded_columns": folded_columns},
+        fingerprint=df.attrs.get("fingerprint"),
+        frame_id=id(df),
+    )
+
+
+def get_analysis_context(
+    df: pd.DataFrame, target_column: str, context: Optional[AnalysisContext] = None
+) -> AnalysisContext:
+    """
+    Возвращает переданный контекст, если он построен для тех же данных,
+    иначе строит новый. Позволяет вызывать инструменты и без оркестратора.
+
+    Args:
+        df: Входной DataFrame.
+        target_column: Имя целевой переменной.
+        context: Готовый контекст (например, из оркестратора).
+
+    Returns:
+        AnalysisContext.
+    """
+    if (
+        context is not None
+        and context.target_column == target_column
+        and context.n_rows == len(df)
+        and _built_for(context, df)
+    ):
+        return context
+    return build_analysis_context(df, target_column)
+
+
+def _built_for(context: AnalysisContext, df: pd.DataFrame) -> bool:
+    """
+    Построен ли контекст по этому DataFrame: тот же объект либо тот же
+    отпечаток и тот же набор столбцов (attrs с отпечатком переходят и на
+    производные таблицы, поэтому одного отпечатка недостаточно).
+    """
+    if context.frame_id == id(df):
+        return True
+    fingerprint = df.attrs.get("fingerprint")
+    if fingerprint is None or fingerprint != context.fingerprint:
+        return False
+    skipped = context.cardinality_report.get("skipped_columns", {})
+    columns = [context.target_column, *context.feature_names, *skipped]
+    return len(columns) == df.shape[1] and all(name in df.columns for name in columns)
@@ -0,0 +1,233 @@
+# core/binning.py
+"""
+Квантованное (бинированное) представление признаков для деревьев.
+
+Каждый признак переводится в коды бинов (не больше 255 на признак),
+матрица хранится как uint8 — в 8 раз компактнее float64. Пропуск имеет
+собственный код (максимальное значение типа). Матрица строится один раз
+на датасет: в пределах запуска — в кэше контекста, между запусками — на
+диске рядом с кэшем датасета, по ключу из его отпечатка.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from core.analysis_context import AnalysisContext
+from core.logger import get_logger
+
+logger = get_logger(__name__, "orchestrator.log")
+
+# Максимум бинов на числовой признак
+MAX_BINS = 255
+
+
+@dataclass
+class BinnedMatrix:
+    """
+    Бинированные признаки контекста.
+
+    Attributes:
+        codes: Коды бинов (n_rows, n_features), uint8 (uint16, если у
+            категориального признака больше 255 уровней); столбцы в порядке
+            feature_names, хранение по столбцам (Fortran order).
+        feature_names: Имена признаков.
+        is_categorical: Флаг категориального признака для каждого столбца.
+        n_bins: Число бинов (без бина пропусков) каждого признака.
+        thresholds: Для числовых признаков — пороги между соседними бинами
+            (значения <= thresholds[k] лежат в бинах 0..k); для категориальных —
+            пустой массив (код бина = код уровня из контекста).
+        missing_code: Код пропуска.
+        is_quantized: Флаг числового признака, у которого уникальных значений
+            больше max_bins: он разбит на квантильные бины, и пороги по нему
+            приближённые (лучший точный порог может лежать внутри бина).
+    """
+
+    codes: np.ndarray
+    feature_names: List[str]
+    is_categorical: np.ndarray
+    n_bins: np.ndarray
+    thresholds: List[np.ndarray]
+    missing_code: int
+    is_quantized: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes)
+
+
+def bin_numeric_column(values: np.ndarray, max_bins: int = MAX_BINS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Переводит числовой столбец в коды бинов.
+
+    Args:
+        values: Значения столбца (float, NaN — пропуск).
+        max_bins: Максимальное число бинов.
+
+    Returns:
+        Кортеж (codes, thresholds): codes — int32, -1 для пропусков;
+        thresholds[k] — порог между бинами k и k+1 (значения <= порога
+        попадают в бины 0..k). Для точных бинов порог — середина между
+        соседними уникальными значениями, как у DecisionTreeClassifier.
+    """
+    codes, thresholds, _ = _bin_numeric(values, max_bins)
+    return codes, thresholds
+
+
+def _bin_numeric(values: np.ndarray, max_bins: int) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """bin_numeric_column и флаг квантильного (приближённого) бинирования."""
+    observed = ~np.isnan(values)
+    finite = values[observed]
+    codes = np.full(len(values), -1, dtype=np.int32)
+    if finite.size == 0:
+        return codes, np.empty(0), False
+
+    unique = np.unique(finite)
+    if len(unique) <= max_bins:
+        codes[observed] = np.searchsorted(unique, finite)
+        thresholds = (unique[:-1] + unique[1:]) / 2.0
+    else:
+        # Верхние границы квантильных бинов; значение x попадает в первый бин с границей >= x
+        upper = np.unique(np.quantile(finite, np.linspace(0, 1, max_bins + 1)[1:]))
+        upper[-1] = unique[-1]
+        codes[observed] = np.searchsorted(upper, finite, side="left")
+        thresholds = upper[:-1]
+    return codes, thresholds, len(unique) > max_bins
+
+
+def build_binned_matrix(ctx: AnalysisContext, max_bins: int = MAX_BINS) -> BinnedMatrix:
+    """
+    Строит бинированную матрицу всех признаков контекста.
+
+    Args:
+        ctx: Контекст анализа.
+        max_bins: Максимум бинов на числовой признак (не больше 255).
+
+    Returns:
+        BinnedMatrix.
+    """
+    max_bins = min(max_bins, MAX_BINS)
+    numeric_index = {name: j for j, name in enumerate(ctx.numeric_names)}
+    categorical_index = {name: j for j, name in enumerate(ctx.categorical_names)}
+    max_levels = max((len(levels) for levels in ctx.cat_levels), default=0)
+    dtype = np.uint8 if max(max_bins, max_levels) <= np.iinfo(np.uint8).max else np.uint16
+    missing_code = int(np.iinfo(dtype).max)
+
+    n_features = len(ctx.feature_names)
+    codes = np.empty((ctx.n_rows, n_features), dtype=dtype, order="F")
+    is_categorical = np.zeros(n_features, dtype=bool)
+    n_bins = np.zeros(n_features, dtype=np.int64)
+    is_quantized = np.zeros(n_features, dtype=bool)
+    thresholds: List[np.ndarray] = []
+
+    for j, name in enumerate(ctx.feature_names):
+        if name in numeric_index:
+            column, thr, is_quantized[j] = _bin_numeric(ctx.numeric[:, numeric_index[name]], max_bins)
+            n_bins[j] = len(thr) + 1
+        else:
+            column = ctx.cat_codes[:, categorical_index[name]]
+            thr = np.empty(0)
+            is_categorical[j] = True
+            n_bins[j] = len(ctx.cat_levels[categorical_index[name]])
+        codes[:, j] = np.where(column < 0, missing_code, column)
+        thresholds.append(thr)
+
+    return BinnedMatrix(
+        codes=codes,
+        feature_names=list(ctx.feature_names),
+        is_categorical=is_categorical,
+        n_bins=n_bins,
+        thresholds=thresholds,
+        missing_code=missing_code,
+        is_quantized=is_quantized,
+    )
+
+
+def _binned_path(ctx: AnalysisContext, max_bins: int) -> Optional[Path]:
+    """Путь файла бинированной матрицы в кэше датасетов (None без отпечатка)."""
+    # Импорт здесь: dataset_cache тянет загрузчик и pyarrow, которые нужны только для кэша
+    from core import dataset_cache
+
+    if ctx.fingerprint is None:
+        return None
+    key = dataset_cache.make_cache_key(
+        ctx.fingerprint, stage="binned", target_column=ctx.target_column, max_bins=max_bins
+    )
+    return dataset_cache.CACHE_DIR / f"{key}.binned.npz"
+
+
+def _save_binned(path: Path, binned: BinnedMatrix) -> None:
+    tmp_path = path.with_suffix(".tmp.npz")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        offsets = np.cumsum([0] + [len(t) for t in binned.thresholds])
+        np.savez(
+            tmp_path,
+            codes=binned.codes,
+            feature_names=np.asarray(binned.feature_names, dtype=str),
+            is_categorical=binned.is_categorical,
+            n_bins=binned.n_bins,
+            thresholds=np.concatenate(binned.thresholds) if binned.thresholds else np.empty(0),
+            offsets=offsets,
+            missing_code=np.int64(binned.missing_code),
+            is_quantized=binned.is_quantized,
+        )
+        tmp_path.replace(path)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сохранить бинированную матрицу в кэш: {e}")
+        tmp_path.unlink(missing_ok=True)
+
+
+def _load_binned(path: Path, ctx: AnalysisContext) -> Optional[BinnedMatrix]:
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            # Файл старого формата (без is_quantized) перестраивается
+            if "is_quantized" not in data.files:
+                return None
+            feature_names = data["feature_names"].tolist()
+            if feature_names != list(ctx.feature_names) or len(data["codes"]) != ctx.n_rows:
+                return None
+            offsets = data["offsets"]
+            flat = data["thresholds"]
+            return BinnedMatrix(
+                codes=np.asfortranarray(data["codes"]),
+                feature_names=feature_names,
+                is_categorical=data["is_categorical"],
+                n_bins=data["n_bins"],
+                thresholds=[flat[offsets[j]:offsets[j + 1]] for j in range(len(feature_names))],
+                missing_code=int(data["missing_code"]),
+                is_quantized=data["is_quantized"],
+            )
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось прочитать бинированную матрицу {path}: {e}")
+        return None
+
+
+def get_binned_matrix(ctx: AnalysisContext, max_bins: int = MAX_BINS, use_disk_cache: bool = True) -> BinnedMatrix:
+    """
+    Возвращает бинированную матрицу контекста, строя её не больше одного раза.
+
+    Сначала проверяется кэш контекста, затем (если у датасета есть отпечаток)
+    дисковый кэш; построенная матрица сохраняется в оба.
+
+    Args:
+        ctx: Контекст анализа.
+        max_bins: Максимум бинов на числовой признак.
+        use_disk_cache: Использовать ли дисковый кэш.
+
+    Returns:
+        BinnedMatrix.
+    """
+    def compute() -> BinnedMatrix:
+        path = _binned_path(ctx, max_bins) if use_disk_cache else None
+        binned = _load_binned(path, ctx) if path is not None else None
+        if binned is None:
+            binned = build_binned_matrix(ctx, max_bins)
+            if path is not None:
+                _save_binned(path, binned)
+        return binned
+
+    return ctx.cached(("binned", max_bins), compute)
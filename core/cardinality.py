@@ -0,0 +1,128 @@
+# core/cardinality.py
+"""
+Обработка категориальных признаков с высокой кардинальностью.
+
+Число уникальных значений оценивается приближённо (HyperLogLog по хэшам
+значений) — без построения полного словаря уровней. Столбцы, похожие на
+идентификаторы (почти все значения уникальны), исключаются из анализа,
+а у остальных столбцов с большим числом уровней редкие уровни
+сворачиваются в общую категорию.
+
+Целочисленные столбцы тоже могут быть идентификаторами (номер клиента):
+они исключаются, если почти все значения уникальны и плотно заполняют
+свой диапазон, как последовательные номера.
+"""
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Точность HyperLogLog: 2**14 регистров, относительная ошибка ~0.8%
+HLL_PRECISION = 14
+# Больше стольких уровней — редкие уровни сворачиваются в OTHER_LEVEL
+MAX_CATEGORY_LEVELS = 50
+# Доля уникальных значений, начиная с которой столбец считается идентификатором
+ID_LIKE_RATIO = 0.9
+# Целочисленный идентификатор занимает не больше стольких диапазонов на уникальное значение
+NUMERIC_ID_SPAN_FACTOR = 2.0
+# Метка уровня, в который сворачиваются редкие значения
+OTHER_LEVEL = "__other__"
+
+
+def approx_distinct(series: pd.Series, precision: int = HLL_PRECISION) -> float:
+    """
+    Приближённое число уникальных непустых значений (HyperLogLog).
+
+    Args:
+        series: Столбец данных.
+        precision: Число бит хэша под номер регистра (2**precision регистров).
+
+    Returns:
+        Оценка числа уникальных значений.
+    """
+    values = series.dropna()
+    if values.empty:
+        return 0.0
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+    m = 1 << precision
+    register = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    # Оставшиеся биты с «стоп-битом», чтобы ранг был ограничен
+    rest = (hashes << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    # Ранг = число ведущих нулей + 1; длина в битах — через «размазывание» старшего бита
+    smeared = rest.copy()
+    for shift in (1, 2, 4, 8, 16, 32):
+        smeared |= smeared >> np.uint64(shift)
+    rank = (64 - np.bitwise_count(smeared) + 1).astype(np.uint8)
+
+    registers = np.zeros(m, dtype=np.uint8)
+    np.maximum.at(registers, register, rank)
+
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros > 0:
+        # Поправка для малых кардинальностей (linear counting)
+        estimate = m * np.log(m / zeros)
+    return float(estimate)
+
+
+def is_id_like(
+    n_distinct: float, n_observed: int, max_levels: int = MAX_CATEGORY_LEVELS, id_ratio: float = ID_LIKE_RATIO
+) -> bool:
+    """
+    Похож ли столбец на идентификатор: уровней больше max_levels и почти
+    каждое значение уникально.
+    """
+    return n_distinct > max_levels and n_distinct >= id_ratio * n_observed
+
+
+def is_numeric_id_like(
+    series: pd.Series, max_levels: int = MAX_CATEGORY_LEVELS, id_ratio: float = ID_LIKE_RATIO
+) -> bool:
+    """
+    Похож ли целочисленный столбец на идентификатор.
+
+    Почти все значения уникальны (как в is_id_like) и плотно заполняют
+    диапазон [min, max] — так выглядят последовательные номера. Денежные
+    суммы и другие измерения в целых числах с большим разбросом не считаются
+    идентификаторами.
+    """
+    if not pd.api.types.is_integer_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return False
+    values = series.dropna()
+    n_observed = len(values)
+    if n_observed <= max_levels:
+        return False
+    n_distinct = approx_distinct(values)
+    if not is_id_like(n_distinct, n_observed, max_levels, id_ratio):
+        return False
+    span = float(values.max()) - float(values.min()) + 1
+    return span <= NUMERIC_ID_SPAN_FACTOR * n_distinct
+
+
+def fold_rare_levels(
+    codes: np.ndarray, levels: np.ndarray, max_levels: int = MAX_CATEGORY_LEVELS
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Оставляет max_levels самых частых уровней, остальные сворачивает в OTHER_LEVEL.
+
+    Args:
+        codes: Коды уровней (как из pd.factorize), -1 — пропуск.
+        levels: Уровни, соответствующие кодам.
+        max_levels: Сколько уровней оставить.
+
+    Returns:
+        Кортеж (новые коды, новые уровни, число свёрнутых уровней).
+        Оставленные уровни сохраняют исходный порядок, OTHER_LEVEL — последний.
+    """
+    if len(levels) <= max_levels:
+        return codes, levels, 0
+    counts = np.bincount(codes[codes >= 0], minlength=len(levels))
+    keep = np.sort(np.argsort(-counts, kind="stable")[:max_levels])
+
+    mapping = np.full(len(levels), max_levels, dtype=codes.dtype)
+    mapping[keep] = np.arange(max_levels, dtype=codes.dtype)
+    new_codes = np.where(codes >= 0, mapping[np.maximum(codes, 0)], codes)
+    new_levels: List[object] = list(levels[keep]) + [OTHER_LEVEL]
+    return new_codes, np.asarray(new_levels, dtype=object), len(levels) - max_levels
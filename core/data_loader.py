@@ -1,24 +1,290 @@
 # core/data_loader.py
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Параметры потокового режима загрузки по умолчанию
+DEFAULT_CHUNKSIZE = 200_000
+DEFAULT_SAMPLE_ROWS = 20_000
+CATEGORY_MAX_UNIQUE = 1_000
+CATEGORY_MAX_RATIO = 0.5
+
+# Сигнатуры колоночных форматов
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+FEATHER_V1_MAGIC = b"FEA1"
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
 
-def load_data(filepath: str) -> pd.DataFrame:
+COLUMNAR_EXTENSIONS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".ftr": "feather",
+    ".arrow": "arrow",
+    ".ipc": "arrow",
+    ".arrows": "arrow_stream",
+}
+
+
+def detect_format(filepath: str) -> str:
     """
-    Загружает CSV-файл в DataFrame.
+    Определяет формат файла по сигнатуре, а при её отсутствии — по расширению.
+
+    Args:
+        filepath: Путь к файлу.
+
+    Returns:
+        Одно из: "parquet", "feather", "arrow", "arrow_stream", "csv".
+    """
+    with open(filepath, "rb") as f:
+        head = f.read(8)
+
+    if head.startswith(PARQUET_MAGIC):
+        return "parquet"
+    if head.startswith(ARROW_FILE_MAGIC):
+        return "arrow"
+    if head.startswith(FEATHER_V1_MAGIC):
+        return "feather"
+    if head.startswith(ARROW_STREAM_MAGIC):
+        return "arrow_stream"
+    return COLUMNAR_EXTENSIONS.get(Path(filepath).suffix.lower(), "csv")
+
+
+def _arrow_types_mapper(arrow_type):
+    """
+    Сопоставляет типы Arrow с типами pandas без копирования буферов.
+
+    Словарные (dictionary) столбцы становятся обычным `category`,
+    остальные — Arrow-backed типами (`int64[pyarrow]`, `string[pyarrow]` и т.д.).
+    """
+    if pa.types.is_dictionary(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+
+def load_columnar(filepath: str, file_format: str, columns: Optional[List[str]]) -> pd.DataFrame:
+    """
+    Читает Parquet / Feather / Arrow IPC в Arrow-backed DataFrame.
+
+    Arrow IPC и Feather читаются через memory map, поэтому несжатые
+    файлы не копируются в память процесса.
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError(
+            "Для чтения Parquet/Feather/Arrow нужна библиотека 'pyarrow': `pip install pyarrow`"
+        )
+
+    if file_format == "parquet":
+        table = pq.read_table(filepath, columns=columns, memory_map=True)
+    elif file_format == "feather":
+        table = feather.read_table(filepath, columns=columns, memory_map=True)
+    else:
+        source = pa.memory_map(filepath, "r")
+        if file_format == "arrow":
+            table = ipc.open_file(source).read_all()
+        else:
+            table = ipc.open_stream(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+
+    return table.to_pandas(types_mapper=_arrow_types_mapper)
+
+
+def _infer_csv_schema(
+    filepath: str,
+    sample_rows: int,
+    category_max_unique: int,
+    category_max_ratio: float,
+    columns: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Определяет схему CSV по выборке первых строк.
+
+    Строковые столбцы с малым числом уникальных значений помечаются как
+    `category`, чтобы читать их сразу в компактном виде.
 
     Args:
         filepath: Путь к CSV-файлу.
+        sample_rows: Количество строк выборки.
+        category_max_unique: Максимум уникальных значений для `category`.
+        category_max_ratio: Максимальная доля уникальных значений для `category`.
+        columns: Список загружаемых столбцов (None — все).
+
+    Returns:
+        Словарь с dtype для чтения и оценкой объёма строки в памяти
+        при стандартном разборе.
+    """
+    sample = pd.read_csv(filepath, nrows=sample_rows, usecols=columns)
+
+    dtypes: Dict[str, Any] = {}
+    for col in sample.columns:
+        if sample[col].dtype != object:
+            continue
+        non_null = sample[col].dropna()
+        n_unique = non_null.nunique()
+        if n_unique <= category_max_unique and n_unique <= max(1, len(non_null)) * category_max_ratio:
+            dtypes[col] = "category"
+        else:
+            dtypes[col] = object
+
+    bytes_per_row = sample.memory_usage(deep=True, index=False).sum() / max(len(sample), 1)
+    return {"dtypes": dtypes, "bytes_per_row": float(bytes_per_row)}
+
+
+def _compact_chunk(chunk: pd.DataFrame, downcast_floats: bool) -> pd.DataFrame:
+    """Понижает разрядность числовых столбцов чанка."""
+    for col in chunk.columns:
+        kind = chunk[col].dtype.kind
+        if kind in "iu":
+            chunk[col] = pd.to_numeric(chunk[col], downcast="integer")
+        elif kind == "f" and downcast_floats:
+            chunk[col] = pd.to_numeric(chunk[col], downcast="float")
+    return chunk
+
+
+def _concat_chunks(chunks: List[pd.DataFrame], category_columns: List[str]) -> pd.DataFrame:
+    """
+    Склеивает чанки, сохраняя тип `category`.
+
+    У каждого чанка свой набор категорий, поэтому перед склейкой
+    категории приводятся к общему объединению.
+    """
+    for col in category_columns:
+        categories = set()
+        for chunk in chunks:
+            if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                categories.update(chunk[col].cat.categories)
+        union = sorted(categories, key=str)
+        for chunk in chunks:
+            if isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                chunk[col] = chunk[col].cat.set_categories(union)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _load_csv_streaming(
+    filepath: str,
+    chunksize: int,
+    sample_rows: int,
+    category_max_unique: int,
+    category_max_ratio: float,
+    downcast_floats: bool,
+    max_memory_mb: Optional[float],
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Читает CSV чанками по схеме, выведенной из выборки.
+
+    Raises:
+        MemoryError: Если объём загруженных данных превысил max_memory_mb.
+    """
+    schema = _infer_csv_schema(filepath, sample_rows, category_max_unique, category_max_ratio, columns)
+    category_columns = [col for col, dtype in schema["dtypes"].items() if dtype == "category"]
+    limit_bytes = max_memory_mb * 1024 ** 2 if max_memory_mb is not None else None
+
+    chunks: List[pd.DataFrame] = []
+    used_bytes = 0
+    for chunk in pd.read_csv(filepath, dtype=schema["dtypes"], chunksize=chunksize, usecols=columns):
+        chunk = _compact_chunk(chunk, downcast_floats)
+        used_bytes += int(chunk.memory_usage(deep=True, index=False).sum())
+        if limit_bytes is not None and used_bytes > limit_bytes:
+            raise MemoryError(
+                f"Превышен лимит памяти при загрузке: {used_bytes / 1024 ** 2:.1f} МБ > {max_memory_mb} МБ"
+            )
+        chunks.append(chunk)
+
+    if not chunks:
+        raise pd.errors.EmptyDataError("No columns to parse from file")
+
+    df = _concat_chunks(chunks, category_columns)
+
+    actual_bytes = int(df.memory_usage(deep=True, index=False).sum())
+    estimated_bytes = int(schema["bytes_per_row"] * len(df))
+    df.attrs["load_stats"] = {
+        "mode": "streaming",
+        "n_chunks": len(chunks),
+        "category_columns": category_columns,
+        "memory_bytes": actual_bytes,
+        "estimated_default_bytes": estimated_bytes,
+        "bytes_saved": max(estimated_bytes - actual_bytes, 0),
+    }
+    print(
+        f"💾 Память: {actual_bytes / 1024 ** 2:.1f} МБ "
+        f"(сэкономлено ~{df.attrs['load_stats']['bytes_saved'] / 1024 ** 2:.1f} МБ)"
+    )
+    return df
+
+
+def load_data(
+    filepath: str,
+    columns: Optional[List[str]] = None,
+    streaming: bool = False,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    category_max_unique: int = CATEGORY_MAX_UNIQUE,
+    category_max_ratio: float = CATEGORY_MAX_RATIO,
+    downcast_floats: bool = True,
+    max_memory_mb: Optional[float] = None,
+) -> pd.DataFrame:
+    """
+    Загружает CSV, Parquet, Feather или Arrow IPC файл в DataFrame.
+
+    Формат определяется по сигнатуре файла (или расширению). Колоночные форматы
+    читаются через pyarrow в Arrow-backed DataFrame без преобразования в
+    NumPy object-массивы. Параметр columns ограничивает загрузку нужными
+    столбцами (для CSV — через usecols).
+
+    В потоковом режиме (streaming=True) схема определяется по выборке, файл
+    читается чанками, числовые столбцы понижаются до минимальной разрядности,
+    а строковые с малым числом уникальных значений хранятся как `category`.
+    Статистика экономии памяти сохраняется в `df.attrs["load_stats"]`.
+
+    Args:
+        filepath: Путь к файлу с данными.
+        columns: Список загружаемых столбцов (None — все).
+        streaming: Включить потоковую загрузку CSV с компактными типами.
+        chunksize: Размер чанка в строках (потоковый режим).
+        sample_rows: Размер выборки для определения схемы (потоковый режим).
+        category_max_unique: Максимум уникальных значений для `category`.
+        category_max_ratio: Максимальная доля уникальных значений для `category`.
+        downcast_floats: Приводить float64 к float32 (потоковый режим).
+        max_memory_mb: Лимит памяти под данные в МБ (потоковый режим).
 
     Returns:
         DataFrame с данными.
 
     Raises:
         FileNotFoundError: Если файл не найден.
-        pd.errors.EmptyDataError: Если файл пуст.
-        pd.errors.ParserError: Если ошибка парсинга.
+        ValueError: Если файл пуст или ошибка парсинга.
+        MemoryError: Если превышен лимит памяти max_memory_mb.
     """
     try:
-        df = pd.read_csv(filepath)
+        file_format = detect_format(filepath)
+        if file_format != "csv":
+            df = load_columnar(filepath, file_format, columns)
+        elif streaming:
+            df = _load_csv_streaming(
+                filepath,
+                chunksize=chunksize,
+                sample_rows=sample_rows,
+                category_max_unique=category_max_unique,
+                category_max_ratio=category_max_ratio,
+                downcast_floats=downcast_floats,
+                max_memory_mb=max_memory_mb,
+                columns=columns,
+            )
+        else:
+            df = pd.read_csv(filepath, usecols=columns)
         print(f"✅ Загружено {len(df)} строк и {len(df.columns)} столбцов")
         return df
     except FileNotFoundError:
@@ -26,4 +292,6 @@ def load_data(filepath: str) -> pd.DataFrame:
     except pd.errors.EmptyDataError:
         raise ValueError(f"Файл пуст: {filepath}")
     except pd.errors.ParserError as e:
-        raise ValueError(f"Ошибка парсинга CSV: {e}")
\ No newline at end of file
+        raise ValueError(f"Ошибка парсинга CSV: {e}")
+    except KeyError as e:
+        raise ValueError(f"Столбец не найден в файле: {e}")
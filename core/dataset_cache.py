@@ -0,0 +1,350 @@
+# core/dataset_cache.py
+"""
+Кэш разобранных датасетов на диске, адресуемый по содержимому.
+
+Ключ кэша строится из отпечатка (fingerprint) исходных байтов файла и
+параметров обработки. Данные хранятся в несжатом Arrow IPC, поэтому
+повторная загрузка — это memory map без разбора и копирования.
+
+Запись в кэш идёт в фоновом потоке, не задерживая анализ. Размер каталога
+кэша ограничен (INSIGHTFINDER_CACHE_MAX_MB): после записи удаляются файлы,
+которые дольше всех не использовались (чтение записи обновляет её mtime).
+
+Полный хэш содержимого считается один раз на файл: отпечаток запоминается
+в индексе по быстрому ключу (путь, размер, mtime_ns и выборочные блоки
+начала, середины и конца файла), и повторная загрузка того же файла
+читает только эти блоки.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, List, Optional
+
+import numpy as np
+
+import pandas as pd
+
+from core.data_loader import load_data, load_columnar, PYARROW_AVAILABLE
+from core.logger import get_logger
+from core.utils import binary_target_codes, make_target_binary
+
+if PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+logger = get_logger(__name__, "orchestrator.log")
+
+CACHE_DIR = Path(os.getenv("INSIGHTFINDER_CACHE_DIR", "cache/datasets"))
+# Предельный размер каталога кэша (вместе с кэшем графиков, бинирования и важностей)
+MAX_CACHE_BYTES = int(float(os.getenv("INSIGHTFINDER_CACHE_MAX_MB", "4096")) * 1024 * 1024)
+FINGERPRINT_BLOCK_SIZE = 8 * 1024 * 1024
+# Размер выборочного блока быстрого ключа файла
+SAMPLE_BLOCK_SIZE = 64 * 1024
+FINGERPRINT_ATTR = "fingerprint"
+
+
+def _hash_file(filepath: str) -> str:
+    """Полный хэш байтов файла (BLAKE2b, блоками)."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, "rb") as f:
+        while True:
+            block = f.read(FINGERPRINT_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat_key(filepath: str) -> str:
+    """Быстрый ключ файла: путь, размер, mtime_ns и блоки начала, середины и конца."""
+    stat = os.stat(filepath)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{os.path.realpath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+    with open(filepath, "rb") as f:
+        for offset in (0, max(stat.st_size // 2 - SAMPLE_BLOCK_SIZE // 2, 0), max(stat.st_size - SAMPLE_BLOCK_SIZE, 0)):
+            f.seek(offset)
+            digest.update(f.read(SAMPLE_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def fingerprint_file(filepath: str) -> str:
+    """
+    Отпечаток содержимого файла.
+
+    Полный хэш байтов считается при первой встрече файла и запоминается в
+    индексе по быстрому ключу (_stat_key); пока файл не изменился, отпечаток
+    берётся из индекса без чтения всего файла. Копия файла по другому пути
+    (например, повторная загрузка через UI) получает тот же отпечаток.
+
+    Args:
+        filepath: Путь к файлу.
+
+    Returns:
+        Шестнадцатеричная строка отпечатка.
+    """
+    index_path = CACHE_DIR / "fingerprints" / _stat_key(filepath)
+    try:
+        return index_path.read_text(encoding="utf-8")
+    except OSError:
+        pass
+
+    fingerprint = _hash_file(filepath)
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index_path.write_text(fingerprint, encoding="utf-8")
+    except OSError as e:
+        logger.warning(f"⚠️ Не удалось сохранить отпечаток файла в индекс: {e}")
+    return fingerprint
+
+
+def fingerprint_dataframe(df: pd.DataFrame) -> str:
+    """
+    Считает отпечаток DataFrame по именам, типам и хэшам значений столбцов.
+
+    Args:
+        df: Входной DataFrame.
+
+    Returns:
+        Шестнадцатеричная строка отпечатка.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for col in df.columns:
+        digest.update(f"{col}:{df[col].dtype}".encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df[col], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def get_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Возвращает отпечаток DataFrame: из `df.attrs`, если он был сохранён
+    при загрузке, иначе считает его по содержимому.
+    """
+    fingerprint = df.attrs.get(FINGERPRINT_ATTR)
+    if fingerprint is None:
+        fingerprint = fingerprint_dataframe(df)
+    return fingerprint
+
+
+def make_cache_key(fingerprint: str, **params: Any) -> str:
+    """
+    Строит ключ кэша из отпечатка данных и параметров обработки.
+
+    Args:
+        fingerprint: Отпечаток исходных данных.
+        **params: Параметры, влияющие на результат (опции загрузки, таргет и т.д.).
+
+    Returns:
+        Шестнадцатеричная строка ключа.
+    """
+    payload = json.dumps(params, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(f"{fingerprint}|{payload}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+# Фоновая запись в кэш: один поток, чтобы записи не конкурировали за диск
+_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+_PENDING_WRITES: List[Future] = []
+_PENDING_LOCK = threading.Lock()
+
+
+def _frame_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.arrow"
+
+
+def _touch(path: Path) -> None:
+    """Отмечает использование записи кэша (для вытеснения давно не используемых)."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_cache(max_bytes: Optional[int] = None) -> int:
+    """
+    Удаляет давно не использованные файлы кэша, пока каталог не уложится в лимит.
+
+    Args:
+        max_bytes: Лимит в байтах (None — MAX_CACHE_BYTES).
+
+    Returns:
+        Число удалённых файлов.
+    """
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    if not CACHE_DIR.exists():
+        return 0
+    files = []
+    for path in CACHE_DIR.rglob("*"):
+        try:
+            if path.is_file() and not path.name.endswith(".tmp"):
+                stat = path.stat()
+                files.append((stat.st_mtime_ns, stat.st_size, path))
+        except OSError:
+            continue
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files, key=lambda item: item[0]):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        logger.info(f"🧹 Из кэша удалено {removed} давно не использованных файлов")
+    return removed
+
+
+def flush_cache_writes() -> None:
+    """Дожидается фоновых записей в кэш (для тестов и перед завершением процесса)."""
+    with _PENDING_LOCK:
+        pending = list(_PENDING_WRITES)
+    for future in pending:
+        future.result()
+
+
+def _save_in_background(key: str, df: pd.DataFrame) -> None:
+    def write() -> None:
+        if save_cached_frame(key, df) is not None:
+            evict_cache()
+
+    future = _WRITER.submit(write)
+    with _PENDING_LOCK:
+        _PENDING_WRITES.append(future)
+    future.add_done_callback(_discard_pending)
+
+
+def _discard_pending(future: Future) -> None:
+    with _PENDING_LOCK:
+        if future in _PENDING_WRITES:
+            _PENDING_WRITES.remove(future)
+
+
+def load_cached_frame(key: str) -> Optional[pd.DataFrame]:
+    """
+    Загружает DataFrame из кэша через memory map.
+
+    Args:
+        key: Ключ кэша.
+
+    Returns:
+        Arrow-backed DataFrame или None, если записи нет.
+    """
+    path = _frame_path(key)
+    if not PYARROW_AVAILABLE or not path.exists():
+        return None
+    try:
+        df = load_columnar(str(path), "arrow", None)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось прочитать кэш {path}: {e}")
+        return None
+    _touch(path)
+    df.attrs[FINGERPRINT_ATTR] = key
+    return df
+
+
+def save_cached_frame(key: str, df: pd.DataFrame) -> Optional[Path]:
+    """
+    Сохраняет DataFrame в кэш как несжатый Arrow IPC файл.
+
+    Запись атомарная: файл пишется во временный путь и затем переименовывается.
+
+    Args:
+        key: Ключ кэша.
+        df: DataFrame для сохранения.
+
+    Returns:
+        Путь к файлу кэша или None, если сохранить не удалось.
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    path = _frame_path(key)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        return path
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сохранить датасет в кэш: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return None
+
+
+def load_data_cached(filepath: str, use_cache: bool = True, **load_kwargs) -> pd.DataFrame:
+    """
+    Загружает файл через load_data, используя кэш по отпечатку содержимого.
+
+    Повторная загрузка того же файла с теми же параметрами читает
+    готовый типизированный DataFrame из кэша. Ключ записи сохраняется
+    в `df.attrs["fingerprint"]`.
+
+    Args:
+        filepath: Путь к файлу с данными.
+        use_cache: Использовать кэш (False — обычная загрузка).
+        **load_kwargs: Параметры загрузки, передаются в load_data.
+
+    Returns:
+        DataFrame с данными.
+    """
+    if not use_cache:
+        return load_data(filepath, **load_kwargs)
+
+    key = make_cache_key(fingerprint_file(filepath), stage="parsed", **load_kwargs)
+    df = load_cached_frame(key)
+    if df is not None:
+        print(f"⚡ Датасет загружен из кэша: {len(df)} строк и {len(df.columns)} столбцов")
+        return df
+
+    df = load_data(filepath, **load_kwargs)
+    # Запись в кэш не задерживает анализ: DataFrame после загрузки не изменяется
+    _save_in_background(key, df)
+    df.attrs[FINGERPRINT_ATTR] = key
+    return df
+
+
+def make_target_binary_cached(df: pd.DataFrame, target_column: str) -> pd.DataFrame:
+    """
+    Кэширующая обёртка над make_target_binary.
+
+    Если у DataFrame есть отпечаток в `df.attrs`, в кэше хранятся только коды
+    таргета (int8, по строке на строку данных), а не копия всего DataFrame:
+    остальные столбцы не меняются и берутся из df.
+
+    Args:
+        df: Входной DataFrame.
+        target_column: Название целевой переменной.
+
+    Returns:
+        DataFrame с целевой переменной 0/1.
+    """
+    fingerprint = df.attrs.get(FINGERPRINT_ATTR)
+    if fingerprint is None or target_column not in df.columns:
+        return make_target_binary(df, target_column)
+
+    key = make_cache_key(fingerprint, stage="binary_target", target_column=target_column)
+    path = CACHE_DIR / f"{key}.target.npy"
+    codes = None
+    if path.exists():
+        try:
+            codes = np.load(path)
+            _touch(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прочитать кэш таргета {path}: {e}")
+    if codes is None or len(codes) != len(df):
+        codes = binary_target_codes(df[target_column])
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            np.save(path, codes)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось сохранить кэш таргета: {e}")
+
+    df_binary = make_target_binary(df, target_column, codes=codes)
+    df_binary.attrs[FINGERPRINT_ATTR] = key
+    return df_binary
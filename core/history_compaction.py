@@ -0,0 +1,151 @@
+# core/history_compaction.py
+"""
+Компактное представление истории инструментов для промпта Analyst.
+
+Раньше на каждом шаге в промпт попадала вся история с отступами
+(json.dumps(..., indent=2)), включая объёмные детали вроде полного списка
+корреляций по всем признакам, и размер промпта рос с каждым шагом.
+
+Теперь Analyst получает по каждому инструменту статус, краткий вывод и
+несколько главных фактов из деталей: скалярные поля деталей сохраняются,
+у вложенных словарей и списков остаются первые top_k элементов
+(инструменты уже сортируют их по значимости), числа округляются, пустые
+значения опускаются. Если результат всё равно не помещается в бюджет
+токенов, факты последовательно сокращаются, начиная со старых шагов.
+Полные детали остаются в истории для итогового отчёта.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.utils import make_serializable
+
+# Бюджет на историю в промпте Analyst (в токенах, оценка по числу символов)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("INSIGHTFINDER_PROMPT_TOKEN_BUDGET", "2000"))
+# Сколько элементов каждого списка/словаря деталей передавать
+DEFAULT_TOP_K = 5
+# Глубина вложенности деталей, которая попадает в промпт
+MAX_DEPTH = 3
+# Максимальная длина строкового значения
+MAX_STRING_LENGTH = 200
+# Примерное число символов на токен (с запасом для кириллицы)
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов текста (без токенизатора модели)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _compact_value(value: Any, top_k: int, depth: int) -> Any:
+    """Сокращённое значение деталей: top_k элементов, округлённые числа, короткие строки."""
+    if isinstance(value, float):
+        return float(f"{value:.4g}")
+    if isinstance(value, str):
+        return value if len(value) <= MAX_STRING_LENGTH else value[:MAX_STRING_LENGTH] + "…"
+    if isinstance(value, (dict, list, tuple)):
+        if depth >= MAX_DEPTH or top_k == 0:
+            return None
+        # Верхний уровень деталей — отдельные факты инструмента, он не сокращается
+        limit = len(value) if depth == 0 else top_k
+        if isinstance(value, dict):
+            items = [
+                (key, _compact_value(item, top_k, depth + 1))
+                for key, item in list(value.items())[:limit]
+            ]
+            compact = {key: item for key, item in items if item not in (None, {}, [])}
+        else:
+            compact = [_compact_value(item, top_k, depth + 1) for item in list(value)[:limit]]
+            compact = [item for item in compact if item not in (None, {}, [])]
+        if len(value) > limit and compact:
+            # Сколько элементов опущено — чтобы Analyst знал, что список неполный
+            if isinstance(compact, dict):
+                compact["…"] = f"+{len(value) - limit}"
+            else:
+                compact.append(f"…+{len(value) - limit}")
+        return compact
+    return value
+
+
+def compact_result(result: Dict[str, Any], top_k: int = DEFAULT_TOP_K) -> Dict[str, Any]:
+    """
+    Компактная запись результата инструмента для промпта.
+
+    Args:
+        result: Запись истории (tool_name, status, summary, details[, error_message]).
+        top_k: Сколько элементов каждого списка/словаря деталей оставить
+            (0 — только статус и краткий вывод).
+
+    Returns:
+        Словарь tool_name, status, summary и (если есть) error и facts.
+    """
+    compact: Dict[str, Any] = {
+        "tool_name": result.get("tool_name"),
+        "status": result.get("status"),
+        "summary": result.get("summary", ""),
+    }
+    if result.get("error_message"):
+        compact["error"] = _compact_value(str(result["error_message"]), top_k, 0)
+    facts = _compact_value(make_serializable(result.get("details") or {}), top_k, 0) if top_k else None
+    if facts:
+        compact["facts"] = facts
+    return compact
+
+
+def _dumps(entries: List[Dict[str, Any]]) -> str:
+    return json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_history(
+    history: List[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    top_k: int = DEFAULT_TOP_K,
+    measure_full: bool = False,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Кодирует историю для промпта Analyst в пределах бюджета токенов.
+
+    Сначала все шаги сокращаются до top_k фактов; если текст не помещается
+    в бюджет, факты старых шагов сокращаются первыми (top_k → … → 0), пока
+    не поместится. Статус и краткий вывод каждого шага остаются всегда.
+
+    Args:
+        history: История инструментов (полные результаты).
+        token_budget: Бюджет токенов (None — DEFAULT_TOKEN_BUDGET).
+        top_k: Начальное число элементов списков/словарей деталей.
+        measure_full: Измерить размер прежнего представления (полная история
+            с отступами). Требует полной сериализации истории — только для
+            отладочной статистики.
+
+    Returns:
+        Кортеж (text, stats): компактный JSON и статистика bytes, tokens,
+        token_budget, reduced_steps (у скольких шагов сокращены факты), а при
+        measure_full — full_bytes и saved_bytes.
+    """
+    token_budget = DEFAULT_TOKEN_BUDGET if token_budget is None else token_budget
+    levels = sorted({top_k, *[k for k in (3, 1) if k < top_k], 0}, reverse=True)
+    step_levels = [0] * len(history)  # индекс в levels для каждого шага
+    entries = [compact_result(item, levels[0]) for item in history]
+    text = _dumps(entries)
+
+    # Сокращение: по кругу от старых шагов к новым, каждый раз на один уровень
+    while estimate_tokens(text) > token_budget:
+        reducible = [i for i, level in enumerate(step_levels) if level < len(levels) - 1]
+        if not reducible:
+            break
+        i = min(reducible, key=lambda index: (step_levels[index], index))
+        step_levels[i] += 1
+        entries[i] = compact_result(history[i], levels[step_levels[i]])
+        text = _dumps(entries)
+
+    size = len(text.encode("utf-8"))
+    stats = {
+        "bytes": size,
+        "tokens": estimate_tokens(text),
+        "token_budget": token_budget,
+        "reduced_steps": sum(level > 0 for level in step_levels),
+    }
+    if measure_full:
+        full_bytes = len(json.dumps(make_serializable(history), ensure_ascii=False, indent=2).encode("utf-8"))
+        stats.update(full_bytes=full_bytes, saved_bytes=max(full_bytes - size, 0))
+    return text, stats
@@ -0,0 +1,180 @@
+# core/image_policy.py
+"""
+Политика вывода изображений отчёта: формат, разрешение и бюджет байт.
+
+Одна и та же политика используется визуализаторами (формат и DPI при
+сохранении графиков) и экспортом в HTML (MIME-типы и бюджет на
+встроенные изображения). Если суммарный размер изображений отчёта
+превышает бюджет, растровые изображения при встраивании сначала
+квантуются в палитру, затем уменьшаются, пока не уложатся в бюджет;
+файлы на диске не меняются.
+
+Настройки по умолчанию берутся из переменных окружения
+INSIGHTFINDER_IMAGE_FORMAT, INSIGHTFINDER_IMAGE_DPI и
+INSIGHTFINDER_IMAGE_BUDGET_MB.
+"""
+import io
+import os
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+from core.logger import get_logger
+
+logger = get_logger(__name__, "orchestrator.log")
+
+# Формат → MIME-тип
+IMAGE_MIME_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+}
+# Форматы, в которых сохраняются графики
+OUTPUT_FORMATS = ("png", "webp", "svg")
+# Бюджет на изображения одного отчёта по умолчанию
+DEFAULT_BYTE_BUDGET = 8 * 1024 * 1024
+# Меньше этой доли исходного размера изображения не уменьшаются
+MIN_SCALE = 0.25
+# Шаг уменьшения при превышении бюджета
+SCALE_STEP = 0.8
+
+
+@dataclass(frozen=True)
+class ImagePolicy:
+    """
+    Параметры вывода изображений.
+
+    Attributes:
+        format: Формат файлов графиков: png, webp или svg.
+        dpi: Разрешение растровых графиков.
+        byte_budget: Максимум байт изображений на один отчёт (None — без ограничения).
+    """
+
+    format: str = "png"
+    dpi: int = 150
+    byte_budget: Optional[int] = DEFAULT_BYTE_BUDGET
+
+    def __post_init__(self):
+        if self.format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown image format '{self.format}'. Available: {list(OUTPUT_FORMATS)}")
+
+    @property
+    def extension(self) -> str:
+        """Расширение файла с точкой."""
+        return f".{self.format}"
+
+    @classmethod
+    def from_env(cls) -> "ImagePolicy":
+        """Политика из переменных окружения (неуказанные — по умолчанию)."""
+        budget_mb = os.getenv("INSIGHTFINDER_IMAGE_BUDGET_MB")
+        return cls(
+            format=os.getenv("INSIGHTFINDER_IMAGE_FORMAT", "png").lower(),
+            dpi=int(os.getenv("INSIGHTFINDER_IMAGE_DPI", "150")),
+            byte_budget=int(float(budget_mb) * 1024 * 1024) if budget_mb else DEFAULT_BYTE_BUDGET,
+        )
+
+
+# Политика текущего запуска — в ContextVar, чтобы параллельные анализы (задачи asyncio)
+# не меняли настройки друг друга; без неё действует политика из окружения
+_CURRENT_POLICY: ContextVar[Optional[ImagePolicy]] = ContextVar("insightfinder_image_policy", default=None)
+_ENV_POLICY: Optional[ImagePolicy] = None
+
+
+def get_image_policy() -> ImagePolicy:
+    """Текущая политика (если не задана — из переменных окружения)."""
+    global _ENV_POLICY
+    policy = _CURRENT_POLICY.get()
+    if policy is not None:
+        return policy
+    if _ENV_POLICY is None:
+        _ENV_POLICY = ImagePolicy.from_env()
+    return _ENV_POLICY
+
+
+def set_image_policy(policy: Optional[ImagePolicy]) -> None:
+    """Задаёт политику текущего контекста (None — вернуться к настройкам из окружения)."""
+    global _ENV_POLICY
+    _CURRENT_POLICY.set(policy)
+    if policy is None:
+        # Настройки окружения перечитываются при следующем обращении
+        _ENV_POLICY = None
+
+
+def mime_type(path: Path) -> Optional[str]:
+    """MIME-тип изображения по расширению или None для неподдерживаемых форматов."""
+    return IMAGE_MIME_TYPES.get(path.suffix.lower().lstrip("."))
+
+
+def is_image_path(path: str) -> bool:
+    """Является ли путь файлом изображения поддерживаемого формата."""
+    return mime_type(Path(path)) is not None
+
+
+def _reencode(data: bytes, suffix: str, scale: float, quantize: bool) -> bytes:
+    """Перекодирует растровое изображение: палитра из 256 цветов и/или уменьшение."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        if scale < 1.0:
+            size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+            image = image.resize(size, Image.LANCZOS)
+        if quantize:
+            image = image.convert("RGB").quantize(colors=256)
+        buffer = io.BytesIO()
+        if suffix == ".webp":
+            image.convert("RGB").save(buffer, format="WEBP", quality=80)
+        elif suffix in (".jpg", ".jpeg"):
+            image.convert("RGB").save(buffer, format="JPEG", quality=80)
+        else:
+            image.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+
+
+def fit_to_budget(paths: Sequence[Path], policy: Optional[ImagePolicy] = None) -> Tuple[Dict[Path, bytes], Dict[str, int]]:
+    """
+    Читает изображения отчёта и ужимает растровые, если их сумма больше бюджета.
+
+    Сначала все растровые изображения квантуются в палитру; если этого
+    мало — уменьшаются с шагом SCALE_STEP (не меньше MIN_SCALE от исходного
+    размера). SVG не меняются.
+
+    Args:
+        paths: Пути существующих изображений (повторы учитываются один раз).
+        policy: Политика (None — текущая).
+
+    Returns:
+        Кортеж (data, stats): data — байты каждого изображения, stats —
+        original_bytes, final_bytes, budget, scale (в процентах), quantized.
+    """
+    policy = policy or get_image_policy()
+    original = {path: path.read_bytes() for path in dict.fromkeys(paths)}
+    total = sum(len(data) for data in original.values())
+    stats = {"original_bytes": total, "final_bytes": total, "budget": policy.byte_budget or 0,
+             "scale": 100, "quantized": 0}
+    if policy.byte_budget is None or total <= policy.byte_budget:
+        return original, stats
+
+    raster = [path for path in original if path.suffix.lower() != ".svg"]
+    data = dict(original)
+    scale, quantize = 1.0, True
+    while True:
+        for path in raster:
+            try:
+                data[path] = _reencode(original[path], path.suffix.lower(), scale, quantize)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось ужать изображение {path}: {e}")
+        total = sum(len(item) for item in data.values())
+        if total <= policy.byte_budget or scale * SCALE_STEP < MIN_SCALE:
+            break
+        scale *= SCALE_STEP
+
+    stats.update(final_bytes=total, scale=int(round(scale * 100)), quantized=len(raster))
+    if total > policy.byte_budget:
+        logger.warning(
+            f"⚠️ Изображения отчёта ({total / 1024 ** 2:.1f} МБ) не уложились в бюджет "
+            f"{policy.byte_budget / 1024 ** 2:.1f} МБ даже после уменьшения"
+        )
+    return data, stats
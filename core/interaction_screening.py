@@ -0,0 +1,282 @@
+# core/interaction_screening.py
+"""
+Поиск парных взаимодействий признаков с бинарным таргетом.
+
+Два прохода:
+
+1. Дешёвый отбор по всем парам. Признаки из бинированной матрицы
+   (core/binning.py) огрубляются до нескольких групп (квантили для
+   числовых, частые уровни для категориальных, пропуск — отдельная группа).
+   Для каждой пары одним np.bincount строится таблица «группа × группа ×
+   класс», и считается отклонение доли класса 1 в ячейках от аддитивного
+   прогноза по двум маргиналам (r_a + r_b - r). Пары с одним признаком
+   обрабатываются блоком, блоки делятся между процессами.
+2. Дорогой тест только для лучших кандидатов: тест отношения
+   правдоподобия (LR) логистической модели с ячейками пары против модели
+   с главными эффектами двух признаков, по всем строкам.
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import stats
+from scipy.special import xlogy
+from sklearn.linear_model import LogisticRegression
+
+from core.analysis_context import AnalysisContext
+from core.binning import BinnedMatrix, get_binned_matrix
+from core.utils import process_pool
+
+# Число групп на признак при отборе (плюс группа пропусков)
+SCREEN_GROUPS = 8
+# Число строк подвыборки для дешёвого прохода
+SCREEN_SAMPLE_ROWS = 50_000
+# Число пар, проходящих к LR-тесту
+MAX_CANDIDATES = 20
+# Число парных столбцов в одном np.bincount
+PAIR_BLOCK_SIZE = 256
+# Меньше стольких пар пул процессов не запускается
+PARALLEL_MIN_PAIRS = 5_000
+
+# Состояние процесса-исполнителя (задаётся в _init_worker)
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def coarse_codes(binned: BinnedMatrix, n_groups: int = SCREEN_GROUPS) -> np.ndarray:
+    """
+    Огрубляет бинированные признаки до n_groups групп.
+
+    Числовые бины объединяются в группы примерно равной численности (по
+    накопленной доле строк), категориальные уровни — n_groups - 1 самых
+    частых по отдельности, остальные в одну группу. Пропуск получает код
+    n_groups.
+
+    Args:
+        binned: Бинированная матрица признаков.
+        n_groups: Число групп на признак.
+
+    Returns:
+        Матрица uint8 (n_rows, n_features) с кодами 0..n_groups.
+    """
+    n_rows, n_features = binned.codes.shape
+    coarse = np.empty((n_rows, n_features), dtype=np.uint8, order="F")
+    for j in range(n_features):
+        column = binned.codes[:, j].astype(np.int64)
+        missing = column == binned.missing_code
+        n_bins = int(binned.n_bins[j])
+        counts = np.bincount(column[~missing], minlength=n_bins)[:n_bins]
+        mapping = np.zeros(max(n_bins, 1), dtype=np.int64)
+        if binned.is_categorical[j]:
+            top = np.argsort(-counts, kind="stable")[:n_groups - 1]
+            mapping[:] = n_groups - 1
+            mapping[top] = np.arange(len(top))
+        elif counts.sum() > 0:
+            before = (np.cumsum(counts) - counts) / counts.sum()
+            mapping[:] = np.minimum((before * n_groups).astype(np.int64), n_groups - 1)
+        coarse[:, j] = np.where(missing, n_groups, mapping[np.where(missing, 0, column)])
+    return coarse
+
+
+def _pair_tables(first: np.ndarray, others: np.ndarray, y: np.ndarray, width: int) -> np.ndarray:
+    """Таблицы (len(others.T), width, width, 2) для пар (first, каждый столбец others)."""
+    n_pairs = others.shape[1]
+    combined = (first.astype(np.int64)[:, None] * width + others) + np.arange(n_pairs) * width * width
+    counts = np.bincount((combined * 2 + y[:, None]).ravel(), minlength=n_pairs * width * width * 2)
+    return counts.reshape(n_pairs, width, width, 2)
+
+
+def interaction_scores(tables: np.ndarray) -> np.ndarray:
+    """
+    Сила взаимодействия по таблицам пар (n_pairs, A, B, 2).
+
+    Взвешенное по размеру ячеек среднее квадрата отклонения доли класса 1
+    в ячейке от аддитивного прогноза r_a + r_b - r по маргиналам пары.
+    """
+    tables = tables.astype(np.float64)
+    n_cell = tables.sum(axis=-1)
+    pos_cell = tables[..., 1]
+    n_total = n_cell.sum(axis=(1, 2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = pos_cell.sum(axis=(1, 2)) / n_total
+        rate_a = pos_cell.sum(axis=2) / n_cell.sum(axis=2)
+        rate_b = pos_cell.sum(axis=1) / n_cell.sum(axis=1)
+        expected = rate_a[:, :, None] + rate_b[:, None, :] - rate[:, None, None]
+        deviation = np.where(n_cell > 0, (pos_cell - n_cell * expected) ** 2 / n_cell, 0.0)
+        scores = deviation.sum(axis=(1, 2)) / n_total
+    return np.where(n_total > 0, scores, 0.0)
+
+
+def _screen_features(
+    codes: np.ndarray, y: np.ndarray, features: List[int], width: int, block_size: int
+) -> List[np.ndarray]:
+    """Оценки пар (i, j > i) для каждого i из features."""
+    n_features = codes.shape[1]
+    result = []
+    for i in features:
+        parts = []
+        for start in range(i + 1, n_features, block_size):
+            block = codes[:, start:min(start + block_size, n_features)].astype(np.int64)
+            parts.append(interaction_scores(_pair_tables(codes[:, i], block, y, width)))
+        result.append(np.concatenate(parts) if parts else np.empty(0))
+    return result
+
+
+def _init_worker(codes: np.ndarray, y: np.ndarray, width: int, block_size: int) -> None:
+    _WORKER_STATE.update(codes=codes, y=y, width=width, block_size=block_size)
+
+
+def _worker_features(features: List[int]) -> List[np.ndarray]:
+    state = _WORKER_STATE
+    return _screen_features(state["codes"], state["y"], features, state["width"], state["block_size"])
+
+
+def screen_pairs(
+    codes: np.ndarray,
+    y_binary: np.ndarray,
+    n_groups: int = SCREEN_GROUPS,
+    n_jobs: Optional[int] = None,
+    block_size: int = PAIR_BLOCK_SIZE,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Дешёвая оценка всех пар признаков.
+
+    Args:
+        codes: Огрублённые коды (n_rows, n_features), значения 0..n_groups.
+        y_binary: Таргет 0/1.
+        n_groups: Число групп (без группы пропусков).
+        n_jobs: Число процессов (None — по числу ядер; 1 — без пула).
+        block_size: Число пар в одном np.bincount.
+
+    Returns:
+        Кортеж (first, second, scores, n_jobs): индексы признаков пар
+        (first < second) и их оценки; n_jobs — фактическое число процессов.
+    """
+    n_features = codes.shape[1]
+    width = n_groups + 1
+    y = np.asarray(y_binary, dtype=np.int64)
+    first, second = np.triu_indices(n_features, k=1)
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(n_features - 1, 1))
+    if len(first) < PARALLEL_MIN_PAIRS:
+        n_jobs = 1
+
+    if n_jobs <= 1:
+        per_feature = _screen_features(codes, y, list(range(n_features)), width, block_size)
+    else:
+        # Признаки раздаются по кругу: у первых признаков больше пар
+        tasks = [list(range(k, n_features, n_jobs)) for k in range(n_jobs)]
+        with process_pool(n_jobs, _init_worker, (codes, y, width, block_size)) as pool:
+            parts = list(pool.map(_worker_features, tasks))
+        per_feature = [None] * n_features
+        for task, part in zip(tasks, parts):
+            for i, scores in zip(task, part):
+                per_feature[i] = scores
+
+    scores = np.concatenate(per_feature) if per_feature else np.empty(0)
+    return first, second, scores, n_jobs
+
+
+def likelihood_ratio_test(table: np.ndarray) -> Dict[str, float]:
+    """
+    LR-тест взаимодействия по таблице пары (A, B, 2).
+
+    Полная модель — своя доля класса 1 в каждой ячейке; нулевая —
+    логистическая регрессия с главными эффектами двух признаков.
+
+    Returns:
+        Словарь: lr_statistic, dof, p_value.
+    """
+    n_cell = table.sum(axis=-1)
+    rows, cols = np.nonzero(n_cell)
+    levels_a, index_a = np.unique(rows, return_inverse=True)
+    levels_b, index_b = np.unique(cols, return_inverse=True)
+    dof = len(rows) - (len(levels_a) + len(levels_b) - 1)
+    if dof <= 0:
+        return {"lr_statistic": 0.0, "dof": 0, "p_value": 1.0}
+
+    pos = table[rows, cols, 1].astype(np.float64)
+    neg = table[rows, cols, 0].astype(np.float64)
+    n = pos + neg
+    ll_full = float(np.sum(xlogy(pos, pos / n) + xlogy(neg, neg / n)))
+
+    # Главные эффекты: one-hot групп двух признаков, обучение на агрегированных ячейках
+    design = np.zeros((len(rows), len(levels_a) + len(levels_b)))
+    design[np.arange(len(rows)), index_a] = 1.0
+    design[np.arange(len(rows)), len(levels_a) + index_b] = 1.0
+    X = np.vstack([design, design])
+    y = np.r_[np.ones(len(rows)), np.zeros(len(rows))]
+    weights = np.r_[pos, neg]
+    keep = weights > 0
+    if len(np.unique(y[keep])) < 2:
+        return {"lr_statistic": 0.0, "dof": int(dof), "p_value": 1.0}
+    model = LogisticRegression(penalty=None, max_iter=1000).fit(X[keep], y[keep], sample_weight=weights[keep])
+    p = model.predict_proba(design)[:, 1]
+    ll_main = float(np.sum(xlogy(pos, p) + xlogy(neg, 1.0 - p)))
+
+    lr = max(2.0 * (ll_full - ll_main), 0.0)
+    return {"lr_statistic": lr, "dof": int(dof), "p_value": float(stats.chi2.sf(lr, dof))}
+
+
+def context_pairwise_interactions(
+    ctx: AnalysisContext,
+    max_candidates: int = MAX_CANDIDATES,
+    sample_rows: int = SCREEN_SAMPLE_ROWS,
+    n_groups: int = SCREEN_GROUPS,
+    n_jobs: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Парные взаимодействия всех признаков контекста. Результат кэшируется в `ctx.cache`.
+
+    Args:
+        ctx: Контекст анализа с бинарным таргетом.
+        max_candidates: Сколько лучших пар первого прохода проверять LR-тестом.
+        sample_rows: Размер подвыборки строк для первого прохода.
+        n_groups: Число групп на признак.
+        n_jobs: Число процессов первого прохода.
+
+    Returns:
+        Словарь: pairs (проверенные пары по возрастанию p-value: features,
+        screening_score, lr_statistic, dof, p_value, p_value_adjusted),
+        n_pairs_evaluated, n_pairs_pruned, n_pairs_tested, sample_rows, n_jobs.
+    """
+    key = ("pairwise_interactions", max_candidates, sample_rows, n_groups)
+    return ctx.cached(key, lambda: _pairwise_interactions(ctx, max_candidates, sample_rows, n_groups, n_jobs))
+
+
+def _pairwise_interactions(
+    ctx: AnalysisContext, max_candidates: int, sample_rows: int, n_groups: int, n_jobs: Optional[int]
+) -> Dict[str, Any]:
+    """Расчёт для context_pairwise_interactions (без кэша)."""
+    codes = coarse_codes(get_binned_matrix(ctx), n_groups)
+    y = ctx.y_binary
+    rows = None
+    if ctx.n_rows > sample_rows:
+        rows = np.sort(np.random.default_rng(42).choice(ctx.n_rows, sample_rows, replace=False))
+    first, second, scores, used_jobs = screen_pairs(
+        codes if rows is None else codes[rows], y if rows is None else y[rows], n_groups, n_jobs
+    )
+
+    candidates = np.argsort(-scores, kind="stable")[:max_candidates]
+    width = n_groups + 1
+    y_int = y.astype(np.int64)
+    pairs = []
+    for k in candidates:
+        i, j = int(first[k]), int(second[k])
+        table = _pair_tables(codes[:, i], codes[:, [j]].astype(np.int64), y_int, width)[0]
+        pairs.append({
+            "features": [ctx.feature_names[i], ctx.feature_names[j]],
+            "screening_score": float(scores[k]),
+            **likelihood_ratio_test(table),
+        })
+    # Поправка Бонферрони на все оценённые пары: кандидаты отобраны по тем же данным
+    for item in pairs:
+        item["p_value_adjusted"] = min(1.0, item["p_value"] * len(scores))
+    pairs.sort(key=lambda item: (item["p_value"], -item["lr_statistic"]))
+
+    return {
+        "pairs": pairs,
+        "n_pairs_evaluated": int(len(scores)),
+        "n_pairs_pruned": int(len(scores) - len(pairs)),
+        "n_pairs_tested": len(pairs),
+        "sample_rows": int(ctx.n_rows if rows is None else len(rows)),
+        "n_jobs": int(used_jobs),
+    }
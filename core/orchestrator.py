@@ -1,181 +1,540 @@
 # core/orchestrator.py
+import asyncio
 import json
-from typing import Tuple, List, Dict, Any
+import logging
+import os
+from typing import Tuple, List, Dict, Any, Optional
 
 import pandas as pd
 from langchain_core.messages import HumanMessage
 
-from agents.analyst_agent import create_analyst_agent
+from agents.analyst_agent import ANALYST_PLAN, create_analyst_agent
 from agents.executor_agent import ExecutorAgent
-from agents.summarizer_agent import generate_summary
-from agents.tools_wrapper import set_current_data, ALL_TOOLS
+from agents.summarizer_agent import agenerate_summary, generate_summary
+from agents.tools_wrapper import set_current_data, ALL_TOOLS, TOOL_INPUTS
+from core.analysis_context import AnalysisContext, build_analysis_context
+from core.history_compaction import encode_history
 from core.logger import get_logger
+from core.plotting import PlotRegistry, set_current_registry
+from core.scheduler import Task, run_tasks
+from core.speculation import ToolPrefetcher
 from core.utils import make_serializable
 
 logger = get_logger(__name__, "orchestrator.log")
 
+# Планировщики: llm — инструменты выбирает Analyst Agent,
+# fixed — план из ANALYST_SYSTEM_PROMPT выполняется без обращения к LLM,
+# parallel — тот же план, независимые инструменты запускаются одновременно (core/scheduler.py)
+PLANNERS = ("llm", "fixed", "parallel")
+DEFAULT_PLANNER = os.getenv("INSIGHTFINDER_PLANNER", "llm")
+MAX_STEPS = 20
 
-def run_simple_orchestration(
-    df: pd.DataFrame, 
-    target_column: str, 
-    filename: str = "data.csv" ) -> Tuple[List[Dict[str, Any]], str]:
+
+def _run_tool(executor: ExecutorAgent, tool_name: str, df: pd.DataFrame, target_column: str) -> Dict[str, Any]:
+    """Запускает инструмент через Executor; исключения превращаются в результат со статусом error."""
+    try:
+        result = executor.run_one_step(tool_name, df=df, target_column=target_column)
+
+        logger.info(f"🛠 RAW Executor результат ({tool_name}): {json.dumps(result, ensure_ascii=False)}")
+
+        if result["status"] == "error":
+            logger.error(f"❌ Ошибка: {result['error_message']}")
+    except Exception as e:
+        logger.error(f"❌ Исключение при выполнении {tool_name}: {e}")
+        result = {
+            "tool_name": tool_name,
+            "status": "error",
+            "summary": "",
+            "details": {},
+            "error_message": str(e),
+        }
+    return result
+
+
+def _record_result(result: Dict[str, Any], history: List[Dict[str, Any]], insights: List[str]) -> None:
+    """Добавляет результат инструмента в историю, а его вывод — в инсайты."""
+    history.append({
+        "tool_name": result["tool_name"],
+        "status": result["status"],
+        "summary": result["summary"],
+        "details": make_serializable(result["details"]),
+    })
+    if result["status"] == "success":
+        insights.append(result["summary"])
+
+
+def _run_insight_visualizer(
+    df: pd.DataFrame,
+    target_column: str,
+    analysis_results: List[Dict[str, Any]],
+    plot_registry: PlotRegistry,
+    context: Optional[AnalysisContext],
+) -> Dict[str, Any]:
+    """Запускает InsightDrivenVisualizer по результатам остальных инструментов."""
+    # Импортируем функцию прямо здесь, чтобы избежать циклических импортов
+    from tools.insight_driven_visualizer import insight_driven_visualizer
+
+    return insight_driven_visualizer(
+        df=df,
+        target_column=target_column,
+        analysis_results=analysis_results,
+        output_dir="report/output/images",
+        plot_registry=plot_registry,
+        context=context,
+    )
+
+
+def _run_fixed_plan(
+    executor: ExecutorAgent,
+    df: pd.DataFrame,
+    target_column: str,
+    history: List[Dict[str, Any]],
+    insights: List[str],
+) -> None:
+    """Выполняет инструменты в порядке плана ANALYST_PLAN без обращения к LLM."""
+    plan = [tool_name for tool_name in ANALYST_PLAN if tool_name in executor.tools]
+    for step_num, tool_name in enumerate(plan, start=1):
+        logger.info(f"Шаг {step_num}: фиксированный план → {tool_name}")
+        _record_result(_run_tool(executor, tool_name, df, target_column), history, insights)
+    logger.info(f"✅ Фиксированный план выполнен: {len(plan)} инструментов")
+
+
+def _run_parallel_plan(
+    executor: ExecutorAgent,
+    df: pd.DataFrame,
+    target_column: str,
+    history: List[Dict[str, Any]],
+    insights: List[str],
+    plot_registry: PlotRegistry,
+    context: Optional[AnalysisContext],
+) -> None:
     """
-    Основной оркестратор: работает с JsonOutputParser.
-    
-    Args:
-        df: DataFrame с данными для анализа
-        target_column: Название целевой переменной
-        filename: Имя файла данных для отчета
-        
+    Выполняет план ANALYST_PLAN и InsightDrivenVisualizer как граф задач.
+
+    Независимые инструменты запускаются одновременно, InsightDrivenVisualizer —
+    после всех, от которых зависит (TOOL_INPUTS). История заполняется в
+    порядке плана, а не завершения.
+    """
+    plan = [tool_name for tool_name in ANALYST_PLAN if tool_name in executor.tools]
+    tasks = [
+        Task(tool_name, lambda inputs, tool_name=tool_name: _run_tool(executor, tool_name, df, target_column),
+             inputs=TOOL_INPUTS[tool_name])
+        for tool_name in plan
+    ]
+    tasks.append(Task(
+        "InsightDrivenVisualizer",
+        lambda inputs: _run_insight_visualizer(
+            df, target_column, [inputs[tool_name] for tool_name in plan if tool_name in inputs], plot_registry, context
+        ),
+        inputs=TOOL_INPUTS["InsightDrivenVisualizer"],
+    ))
+
+    stats: Dict[str, Any] = {}
+    for result in run_tasks(tasks, stats=stats):
+        _record_result(result, history, insights)
+    logger.info(
+        f"✅ Параллельный план выполнен: {stats['n_tasks']} инструментов в {stats['n_jobs']} потоках "
+        f"за {stats['wall_time']:.2f} с (суммарное время инструментов {stats['task_time']:.2f} с)"
+    )
+
+
+def _analyst_question(history: List[Dict[str, Any]]) -> str:
+    """Вопрос к Analyst на очередном шаге: компактная история предыдущих шагов."""
+    if not history:
+        return "Начни анализ с PrimaryFeatureFinder."
+    # В промпт идут краткие выводы и главные факты; полные детали остаются в history
+    # Размер полной истории считается только для отладочного лога: это полная сериализация
+    debug = logger.isEnabledFor(logging.DEBUG)
+    history_json, prompt_stats = encode_history(history, measure_full=debug)
+    logger.info(
+        f"📦 История в промпте: {prompt_stats['bytes']} байт (~{prompt_stats['tokens']} токенов "
+        f"из {prompt_stats['token_budget']}), сокращено шагов: {prompt_stats['reduced_steps']}"
+    )
+    if debug:
+        logger.debug(
+            f"📦 Сэкономлено {prompt_stats['saved_bytes']} байт из {prompt_stats['full_bytes']}"
+        )
+    return (
+        "Учитывай предыдущие результаты.\n\n"
+        f"--- Результаты предыдущих шагов ---\n{history_json}"
+    )
+
+
+def _analyst_input(question: str) -> Dict[str, Any]:
+    return {
+        "messages": [HumanMessage(content=question)],
+        "agent_scratchpad": []
+    }
+
+
+def _log_analyst_response(response: Any) -> None:
+    raw_content = getattr(response, "content", None)
+    if raw_content:
+        logger.info(f"🧠 RAW Analyst ответ: {raw_content}")
+    else:
+        logger.info(f"🧠 RAW Analyst ответ (dict): {json.dumps(response, ensure_ascii=False)}")
+
+    logger.info(f"✅ Analyst вернул: {response}")
+
+
+def _parse_next_step(response: Any) -> Optional[Dict[str, Any]]:
+    """
+    Извлекает next_step из ответа Analyst.
+
     Returns:
-        Кортеж из истории выполнения инструментов и финального отчета
+        Словарь next_step с ключом tool или None, если ответ не разобран.
     """
-    logger.info("Установка данных для инструментов")
-    set_current_data(df, target_column)
+    # Парсим ответ с проверкой структуры
+    next_step_data = None
+    try:
+        if isinstance(response, dict):
+            if "next_step" in response and isinstance(response["next_step"], dict):
+                next_step_data = response["next_step"]
+            elif "tool" in response and "reason" in response:
+                logger.warning("Analyst вернул next_step напрямую, а не в поле 'next_step'. Используем как есть.")
+                next_step_data = response
+            else:
+                logger.error(f"❌ Неверная структура ответа Analyst: {response}")
+        else:
+            logger.error(f"❌ Ответ Analyst не является словарем: {response}")
 
-    analyst = create_analyst_agent(ALL_TOOLS)
-    executor = ExecutorAgent(ALL_TOOLS)
-    logger.info("Агенты инициализированы")
+    except Exception as e:
+        logger.error(f"❌ Неожиданная ошибка при парсинге ответа Analyst: {e}")
+
+    if not next_step_data:
+        logger.warning("Не удалось извлечь next_step. Пропускаем шаг.")
+        return None
+
+    if "tool" not in next_step_data:
+        logger.error(f"❌ В next_step отсутствует ключ 'tool': {next_step_data}")
+        return None
+    logger.info(f"🔍 Analyst выбрал: {next_step_data['tool']}")
+    return next_step_data
 
-    history: List[Dict[str, Any]] = []
-    insights: List[str] = []
 
+def _llm_loop(
+    analyst: Any,
+    prefetcher: ToolPrefetcher,
+    history: List[Dict[str, Any]],
+    insights: List[str],
+) -> None:
+    """Шаги Analyst → Executor до STOP или лимита шагов."""
     step_num = 1
-    max_steps = 20
+    max_steps = MAX_STEPS
     while step_num <= max_steps:
+        # Пока Analyst выбирает шаг, вероятные следующие инструменты считаются в фоне
+        prefetcher.prefetch(done=[item["tool_name"] for item in history])
         logger.info(f"Шаг {step_num}: запрос к Analyst Agent")
-
-        if not history:
-            question = "Начни анализ с PrimaryFeatureFinder."
-        else:
-            serializable_history = make_serializable(history)
-            history_json = json.dumps(serializable_history, ensure_ascii=False, indent=2)
-            question = (
-                "Учитывай предыдущие результаты.\n\n"
-                f"--- Результаты предыдущих шагов ---\n{history_json}"
-            )
+        question = _analyst_question(history)
 
         try:
-            response = analyst.invoke({
-                "messages": [HumanMessage(content=question)],
-                "agent_scratchpad": []
-            })
-
-            raw_content = getattr(response, "content", None)
-            if raw_content:
-                logger.info(f"🧠 RAW Analyst ответ: {raw_content}")
-            else:
-                logger.info(f"🧠 RAW Analyst ответ (dict): {json.dumps(response, ensure_ascii=False)}")
-
-            logger.info(f"✅ Analyst вернул: {response}")
+            response = analyst.invoke(_analyst_input(question))
+            _log_analyst_response(response)
         except Exception as e:
             logger.error(f"❌ Ошибка вызова Analyst: {e}")
             step_num += 1
             continue
 
-        # Парсим ответ с проверкой структуры
-        next_step_data = None
-        try:
-            if isinstance(response, dict):
-                if "next_step" in response and isinstance(response["next_step"], dict):
-                    next_step_data = response["next_step"]
-                elif "tool" in response and "reason" in response:
-                    logger.warning("Analyst вернул next_step напрямую, а не в поле 'next_step'. Используем как есть.")
-                    next_step_data = response
-                else:
-                    logger.error(f"❌ Неверная структура ответа Analyst: {response}")
-            else:
-                logger.error(f"❌ Ответ Analyst не является словарем: {response}")
-
-        except Exception as e:
-            logger.error(f"❌ Неожиданная ошибка при парсинге ответа Analyst: {e}")
-
-        if not next_step_data:
-            logger.warning("Не удалось извлечь next_step. Пропускаем шаг.")
-            step_num += 1
-            continue
-            
-        try:
-            tool_name = next_step_data["tool"]
-            logger.info(f"🔍 Analyst выбрал: {tool_name}")
-        except KeyError:
-            logger.error(f"❌ В next_step отсутствует ключ 'tool': {next_step_data}")
+        next_step_data = _parse_next_step(response)
+        if next_step_data is None:
             step_num += 1
             continue
+        tool_name = next_step_data["tool"]
 
         # STOP
         if tool_name.upper() == "STOP":
             logger.info(f"✅ Анализ завершён: {next_step_data.get('reason', 'Окончание')}")
             break
 
-        # Запуск инструмента
-        # Подготавливаем аргументы: основные + история для специфических инструментов
-        tool_kwargs = {
-            "df": df,
-            "target_column": target_column
-        }
-            
-        try:
-            result = executor.run_one_step(tool_name, df=df, target_column=target_column)
+        # Результат инструмента (из спекулятивного запуска или новым запуском) и его сохранение
+        _record_result(prefetcher.take(tool_name), history, insights)
+
+        step_num += 1
+    else:
+        logger.warning(f"Достигнут лимит шагов ({max_steps}). Принудительная остановка.")
 
-            logger.info(f"🛠 RAW Executor результат ({tool_name}): {json.dumps(result, ensure_ascii=False)}")
 
-            if result["status"] == "error":
-                logger.error(f"❌ Ошибка: {result['error_message']}")
+async def _allm_loop(
+    analyst: Any,
+    prefetcher: ToolPrefetcher,
+    history: List[Dict[str, Any]],
+    insights: List[str],
+) -> None:
+    """Асинхронный вариант _llm_loop: Analyst через ainvoke, инструменты в пуле потоков."""
+    step_num = 1
+    max_steps = MAX_STEPS
+    while step_num <= max_steps:
+        prefetcher.prefetch(done=[item["tool_name"] for item in history])
+        logger.info(f"Шаг {step_num}: запрос к Analyst Agent")
+        # Сериализация истории — вне цикла событий, чтобы не задерживать другие анализы
+        question = await asyncio.to_thread(_analyst_question, history)
+
+        try:
+            response = await analyst.ainvoke(_analyst_input(question))
+            _log_analyst_response(response)
         except Exception as e:
-            logger.error(f"❌ Исключение при выполнении {tool_name}: {e}")
-            result = {
-                "tool_name": tool_name,
-                "status": "error",
-                "summary": "",
-                "details": {},
-                "error_message": str(e),
-            }
-
-        # Сохранение результата
-        history.append({
-            "tool_name": result["tool_name"],
-            "status": result["status"],
-            "summary": result["summary"],
-            "details": make_serializable(result["details"]),
-        })
-
-        if result["status"] == "success":
-            insights.append(result["summary"])
+            logger.error(f"❌ Ошибка вызова Analyst: {e}")
+            step_num += 1
+            continue
+
+        next_step_data = _parse_next_step(response)
+        if next_step_data is None:
+            step_num += 1
+            continue
+        tool_name = next_step_data["tool"]
+
+        if tool_name.upper() == "STOP":
+            logger.info(f"✅ Анализ завершён: {next_step_data.get('reason', 'Окончание')}")
+            break
+
+        # Ожидание фонового результата или синхронный запуск — вне цикла событий
+        result = await asyncio.to_thread(prefetcher.take, tool_name)
+        _record_result(result, history, insights)
 
         step_num += 1
     else:
         logger.warning(f"Достигнут лимит шагов ({max_steps}). Принудительная остановка.")
 
-    # Автоматический запуск InsightDrivenVisualizer
-    logger.info("🔍 Автоматический запуск InsightDrivenVisualizer")
+
+def _log_speculation(stats: Dict[str, Any]) -> None:
+    if stats["launched"]:
+        logger.info(
+            f"🔮 Спекуляция: запущено {stats['launched']}, попаданий {stats['hits']}, "
+            f"промахов {stats['misses']}, отброшено {stats['discarded']}, "
+            f"доля попаданий {(stats['hit_rate'] or 0.0):.0%}; "
+            f"скрыто за ожиданием LLM {stats['hidden_time']:.2f} с, "
+            f"потрачено на отброшенные запуски {stats['wasted_time']:.2f} с"
+        )
+
+
+def _make_prefetcher(executor: ExecutorAgent, df: pd.DataFrame, target_column: str) -> ToolPrefetcher:
+    return ToolPrefetcher(
+        lambda tool_name: _run_tool(executor, tool_name, df, target_column),
+        plan=[tool_name for tool_name in ANALYST_PLAN if tool_name in executor.tools],
+    )
+
+
+def _run_llm_plan(
+    executor: ExecutorAgent,
+    df: pd.DataFrame,
+    target_column: str,
+    history: List[Dict[str, Any]],
+    insights: List[str],
+) -> None:
+    """
+    Цикл Analyst → Executor: LLM выбирает следующий инструмент, пока не вернёт STOP.
+
+    Пока Analyst думает, следующие по плану инструменты спекулятивно
+    выполняются в фоне (core/speculation.py); результат берётся, только
+    если Analyst выбрал именно этот инструмент.
+    """
+    analyst = create_analyst_agent(ALL_TOOLS)
+    logger.info("Analyst Agent инициализирован")
+
+    prefetcher = _make_prefetcher(executor, df, target_column)
     try:
-        # Импортируем функцию прямо здесь, чтобы избежать циклических импортов
-        from tools.insight_driven_visualizer import insight_driven_visualizer
-
-        # Вызываем инструмент напрямую, передавая ему историю
-        insight_result = insight_driven_visualizer(
-            df=df,
-            target_column=target_column,
-            analysis_results=history, # Передаем всю историю
-            output_dir="report/output/images"
+        _llm_loop(analyst, prefetcher, history, insights)
+    finally:
+        stats = prefetcher.close()
+    _log_speculation(stats)
+
+
+async def _arun_llm_plan(
+    executor: ExecutorAgent,
+    df: pd.DataFrame,
+    target_column: str,
+    history: List[Dict[str, Any]],
+    insights: List[str],
+) -> None:
+    """Асинхронный вариант _run_llm_plan."""
+    analyst = create_analyst_agent(ALL_TOOLS)
+    logger.info("Analyst Agent инициализирован")
+
+    prefetcher = _make_prefetcher(executor, df, target_column)
+    try:
+        await _allm_loop(analyst, prefetcher, history, insights)
+    finally:
+        stats = prefetcher.close()
+    _log_speculation(stats)
+
+
+def _check_planner(planner: Optional[str]) -> str:
+    planner = planner or DEFAULT_PLANNER
+    if planner not in PLANNERS:
+        raise ValueError(f"Unknown planner '{planner}'. Available: {list(PLANNERS)}")
+    logger.info(f"Планировщик: {planner}")
+    return planner
+
+
+def _build_context(df: pd.DataFrame, target_column: str) -> Optional[AnalysisContext]:
+    """Кодирование признаков и таргета — один раз на весь запуск (None при ошибке)."""
+    try:
+        context = build_analysis_context(df, target_column)
+        logger.info(
+            f"Контекст анализа построен: {len(context.numeric_names)} числовых, "
+            f"{len(context.categorical_names)} категориальных признаков"
         )
+        skipped = context.cardinality_report.get("skipped_columns", {})
+        folded = context.cardinality_report.get("folded_columns", {})
+        if skipped:
+            logger.info(f"Столбцы-идентификаторы исключены из анализа: {list(skipped)}")
+        if folded:
+            logger.info(f"Редкие уровни свёрнуты в столбцах: {list(folded)}")
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось построить контекст анализа: {e}")
+        context = None
+    return context
+
+
+def _set_run_state(
+    df: pd.DataFrame, target_column: str, context: Optional[AnalysisContext]
+) -> Tuple[PlotRegistry, ExecutorAgent]:
+    """
+    Данные и реестр графиков текущего запуска для инструментов.
+
+    Значения хранятся в ContextVar, поэтому видны только в текущем контексте
+    (потоке или asyncio-задаче) и в пулах, куда он копируется.
+    """
+    set_current_data(df, target_column, context=context)
+    # Графики только регистрируются; рисуются те, на которые сошлётся итоговый отчёт
+    plot_registry = PlotRegistry(df, target_column)
+    set_current_registry(plot_registry)
+
+    executor = ExecutorAgent(ALL_TOOLS)
+    logger.info("Агенты инициализированы")
+    return plot_registry, executor
+
+
+def _run_auto_visualizer(
+    df: pd.DataFrame,
+    target_column: str,
+    history: List[Dict[str, Any]],
+    insights: List[str],
+    plot_registry: PlotRegistry,
+    context: Optional[AnalysisContext],
+) -> None:
+    """Автоматический запуск InsightDrivenVisualizer после планировщиков llm и fixed."""
+    logger.info("🔍 Автоматический запуск InsightDrivenVisualizer")
+    try:
+        # Вызываем инструмент напрямую, передавая ему всю историю
+        insight_result = _run_insight_visualizer(df, target_column, history, plot_registry, context)
         # Добавляем результат в историю, как будто его выполнил агент
-        history.append({
-            "tool_name": insight_result["tool_name"],
-            "status": insight_result["status"],
-            "summary": insight_result["summary"],
-            "details": make_serializable(insight_result["details"]),
-        })
-        if insight_result["status"] == "success":
-            insights.append(insight_result["summary"])
+        _record_result(insight_result, history, insights)
         logger.info(f"✅ InsightDrivenVisualizer выполнен: статус={insight_result['status']}")
     except Exception as e:
         logger.error(f"❌ Ошибка при автоматическом запуске InsightDrivenVisualizer: {e}")
 
 
+def _render_report_plots(plot_registry: PlotRegistry, final_report: str) -> None:
+    """Рисует графики, на которые сослался отчёт; ошибка отрисовки не отменяет текст отчёта."""
+    try:
+        rendered = plot_registry.render_referenced(final_report)
+    except Exception as e:
+        logger.error(f"❌ Ошибка отрисовки графиков отчёта: {e}")
+        return
+    logger.info(
+        f"🖼 Графики: зарегистрировано {plot_registry.stats['registered']}, "
+        f"нарисовано по ссылкам отчёта {sum(path is not None for path in rendered.values())}, "
+        f"отложено {len(plot_registry.pending())}"
+    )
+
+
+def run_simple_orchestration(
+    df: pd.DataFrame, 
+    target_column: str, 
+    filename: str = "data.csv",
+    planner: Optional[str] = None) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Основной оркестратор: работает с JsonOutputParser.
+    
+    Args:
+        df: DataFrame с данными для анализа
+        target_column: Название целевой переменной
+        filename: Имя файла данных для отчета
+        planner: Планировщик шагов: "llm" (выбор инструментов Analyst Agent),
+            "fixed" (план без LLM; LLM вызывается только для отчёта) или
+            "parallel" (тот же план, независимые инструменты одновременно).
+            None — из переменной окружения INSIGHTFINDER_PLANNER (по умолчанию "llm").
+        
+    Returns:
+        Кортеж из истории выполнения инструментов и финального отчета
+    """
+    planner = _check_planner(planner)
+
+    logger.info("Установка данных для инструментов")
+    context = _build_context(df, target_column)
+    plot_registry, executor = _set_run_state(df, target_column, context)
+
+    history: List[Dict[str, Any]] = []
+    insights: List[str] = []
+
+    if planner == "parallel":
+        # InsightDrivenVisualizer входит в граф задач как зависимый от остальных инструментов
+        _run_parallel_plan(executor, df, target_column, history, insights, plot_registry, context)
+    else:
+        if planner == "fixed":
+            _run_fixed_plan(executor, df, target_column, history, insights)
+        else:
+            _run_llm_plan(executor, df, target_column, history, insights)
+        _run_auto_visualizer(df, target_column, history, insights, plot_registry, context)
+
     # Генерация отчёта
     logger.info("📝 Генерация итогового отчёта")
     final_report = generate_summary(insights=insights, tool_results=history, filename=filename)
 
+    _render_report_plots(plot_registry, final_report)
+    return history, final_report
+
+
+async def run_orchestration_async(
+    df: pd.DataFrame,
+    target_column: str,
+    filename: str = "data.csv",
+    planner: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Асинхронный оркестратор: то же, что run_simple_orchestration, без потока на запуск.
+
+    Запросы к LLM (Analyst и итоговый отчёт) выполняются через ainvoke и не
+    занимают поток, пока ждут ответа; CPU-bound инструменты и рисование
+    графиков уходят в пул потоков по умолчанию (asyncio.to_thread). Данные
+    запуска хранятся в ContextVar, поэтому несколько анализов могут
+    одновременно идти в одном цикле событий — каждый в своей asyncio-задаче
+    (например, обработчик Gradio или asyncio.gather).
+
+    Args:
+        df: DataFrame с данными для анализа
+        target_column: Название целевой переменной
+        filename: Имя файла данных для отчета
+        planner: Планировщик шагов ("llm", "fixed" или "parallel"), как в run_simple_orchestration.
+
+    Returns:
+        Кортеж из истории выполнения инструментов и финального отчета
+    """
+    planner = _check_planner(planner)
+
+    logger.info("Установка данных для инструментов")
+    context = await asyncio.to_thread(_build_context, df, target_column)
+    plot_registry, executor = _set_run_state(df, target_column, context)
+
+    history: List[Dict[str, Any]] = []
+    insights: List[str] = []
+
+    if planner == "parallel":
+        await asyncio.to_thread(
+            _run_parallel_plan, executor, df, target_column, history, insights, plot_registry, context
+        )
+    else:
+        if planner == "fixed":
+            await asyncio.to_thread(_run_fixed_plan, executor, df, target_column, history, insights)
+        else:
+            await _arun_llm_plan(executor, df, target_column, history, insights)
+        await asyncio.to_thread(
+            _run_auto_visualizer, df, target_column, history, insights, plot_registry, context
+        )
+
+    logger.info("📝 Генерация итогового отчёта")
+    final_report = await agenerate_summary(insights=insights, tool_results=history, filename=filename)
+
+    await asyncio.to_thread(_render_report_plots, plot_registry, final_report)
     return history, final_report
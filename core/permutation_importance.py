@@ -0,0 +1,157 @@
+# core/permutation_importance.py
+"""
+Permutation importance на отложенной подвыборке.
+
+Базовые предсказания считаются один раз. Для каждого признака столбец
+перемешивается на месте в переиспользуемом буфере (остальные столбцы не
+копируются), после чего восстанавливается. Признаки делятся на блоки,
+которые обрабатываются в пуле процессов; модель и данные передаются
+каждому процессу один раз (через initializer).
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sklearn.metrics import roc_auc_score
+
+from core.logger import get_logger
+from core.utils import process_pool
+
+logger = get_logger(__name__, "orchestrator.log")
+
+# Максимальный размер отложенной подвыборки
+DEFAULT_HOLDOUT_ROWS = 10_000
+# Доля строк, откладываемая для оценки (если строк мало)
+HOLDOUT_FRACTION = 0.2
+
+# Состояние процесса-исполнителя (задаётся в _init_worker)
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def split_holdout(
+    n_rows: int, holdout_rows: int = DEFAULT_HOLDOUT_ROWS, random_state: int = 42
+) -> Dict[str, np.ndarray]:
+    """
+    Делит строки на обучающие и отложенные.
+
+    Args:
+        n_rows: Число строк.
+        holdout_rows: Максимальный размер отложенной подвыборки.
+        random_state: Seed генератора.
+
+    Returns:
+        Словарь с отсортированными индексами train и holdout.
+    """
+    rng = np.random.default_rng(random_state)
+    order = rng.permutation(n_rows)
+    n_holdout = max(1, min(holdout_rows, int(n_rows * HOLDOUT_FRACTION)))
+    return {"train": np.sort(order[n_holdout:]), "holdout": np.sort(order[:n_holdout])}
+
+
+def _score(model: Any, X: np.ndarray, y: np.ndarray) -> float:
+    """ROC AUC по вероятности положительного класса."""
+    return float(roc_auc_score(y, model.predict_proba(X)[:, 1]))
+
+
+def _permute_block(
+    model: Any, X: np.ndarray, y: np.ndarray, baseline: float,
+    features: List[int], n_repeats: int, random_state: int,
+) -> np.ndarray:
+    """Падение качества при перемешивании каждого признака блока, (len(features), n_repeats)."""
+    buffer = X.copy()
+    drops = np.empty((len(features), n_repeats))
+    for i, j in enumerate(features):
+        # Отдельный seed на признак — результат не зависит от разбиения на блоки
+        rng = np.random.default_rng([random_state, j])
+        for r in range(n_repeats):
+            buffer[:, j] = X[rng.permutation(len(X)), j]
+            drops[i, r] = baseline - _score(model, buffer, y)
+        buffer[:, j] = X[:, j]
+    return drops
+
+
+def _init_worker(model: Any, X: np.ndarray, y: np.ndarray, baseline: float) -> None:
+    # Параллельность даёт пул процессов; predict_proba леса с n_jobs=-1 в каждом
+    # процессе умножил бы число потоков на число ядер
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = 1
+    _WORKER_STATE.update(model=model, X=X, y=y, baseline=baseline)
+
+
+def _worker_block(features: List[int], n_repeats: int, random_state: int) -> np.ndarray:
+    state = _WORKER_STATE
+    return _permute_block(
+        state["model"], state["X"], state["y"], state["baseline"], features, n_repeats, random_state
+    )
+
+
+def permutation_importance(
+    model: Any,
+    X: np.ndarray,
+    y: np.ndarray,
+    n_repeats: int = 5,
+    random_state: int = 42,
+    n_jobs: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Permutation importance обученной модели на отложенных данных.
+
+    Args:
+        model: Обученный классификатор с predict_proba.
+        X: Отложенные признаки (n_rows, n_features).
+        y: Отложенный бинарный таргет.
+        n_repeats: Число перемешиваний каждого признака.
+        random_state: Seed.
+        n_jobs: Число процессов (None — по числу ядер; 1 — без пула).
+
+    Returns:
+        Словарь: importances_mean, importances_std (массивы длины n_features),
+        baseline_score (ROC AUC без перемешивания), n_jobs.
+    """
+    n_features = X.shape[1]
+    baseline = _score(model, X, y)
+    n_jobs = min(n_jobs or os.cpu_count() or 1, n_features)
+
+    if n_jobs <= 1:
+        drops = _permute_block(model, X, y, baseline, list(range(n_features)), n_repeats, random_state)
+    else:
+        blocks = [block.tolist() for block in np.array_split(np.arange(n_features), n_jobs)]
+        with process_pool(n_jobs, _init_worker, (model, X, y, baseline)) as pool:
+            parts = list(pool.map(_worker_block, blocks, [n_repeats] * len(blocks), [random_state] * len(blocks)))
+        drops = np.concatenate(parts)
+
+    return {
+        "importances_mean": drops.mean(axis=1),
+        "importances_std": drops.std(axis=1),
+        "baseline_score": baseline,
+        "n_jobs": n_jobs,
+    }
+
+
+def load_cached_importance(key: str) -> Optional[Dict[str, Any]]:
+    """Читает сохранённый результат permutation importance из кэша датасетов."""
+    from core import dataset_cache
+
+    path = dataset_cache.CACHE_DIR / f"{key}.importance.json"
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось прочитать кэш важностей {path}: {e}")
+        return None
+
+
+def save_cached_importance(key: str, payload: Dict[str, Any]) -> None:
+    """Сохраняет результат permutation importance в кэш датасетов (JSON)."""
+    from core import dataset_cache
+
+    path = dataset_cache.CACHE_DIR / f"{key}.importance.json"
+    try:
+        dataset_cache.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сохранить кэш важностей: {e}")
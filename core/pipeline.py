@@ -1,35 +1,17 @@
 # pipeline.py
 
-from core.data_loader import load_data
-from core.utils import make_target_binary, find_binary_target
-from core.orchestrator import run_simple_orchestration
+from core.dataset_cache import load_data_cached, make_target_binary_cached
+from core.utils import find_binary_target
+from core.orchestrator import run_orchestration_async, run_simple_orchestration
 from report.generate_report import save_report
+import asyncio
 import os
 
+import pandas as pd
 
-def analyze_dataset(data_path: str, target_column: str | None = None, filename: str | None = None):
-    """
-    Запускает полный пайплайн анализа данных.
-
-    Args:
-        data_path: Путь к CSV-файлу.
-        target_column: Название целевой переменной. Если None, будет найдена автоматически.
-        filename: Имя файла для отчета. Если None, будет взято из data_path.
-
-    Returns:
-        Кортеж (путь_к_отчету, история, текст_отчета) или None в случае ошибки.
-    """
-    if not os.path.exists(data_path):
-        raise FileNotFoundError(f"Файл не найден: {data_path}")
-
-    print(f"📂 Загружаем данные из {data_path}...")
-    df = load_data(data_path)
-
-    # Если имя файла не передано, используем базовое имя пути
-    if filename is None:
-        filename = os.path.basename(data_path)
-        print(f"📄 Имя файла для отчета: '{filename}'")
 
+def _prepare_dataframe(df: pd.DataFrame, target_column: str | None, export_path: str | None):
+    """Определяет таргет и приводит его к 0/1. Возвращает (df, target_column) или None."""
     if target_column is None:
         print("🔍 Автоопределение бинарной целевой переменной...")
         target_column = find_binary_target(df)
@@ -39,20 +21,22 @@ def analyze_dataset(data_path: str, target_column: str | None = None, filename:
             raise ValueError(f"Столбец '{target_column}' не найден.")
         print(f"🎯 Используем целевую переменную: '{target_column}'")
 
+    if export_path is not None:
+        df.to_csv(export_path, index=False)
+        print(f"💾 Копия данных сохранена: {export_path}")
+
     try:
-        df = make_target_binary(df, target_column)
+        df = make_target_binary_cached(df, target_column)
         print(f"✅ Целевая переменная '{target_column}' преобразована в 0/1.")
     except Exception as e:
         print(f"❌ Ошибка обработки целевой переменной: {e}")
-        return
+        return None
+
+    return df, target_column
 
-    print("🚀 Запускаем мультиагентный анализ...")
-    history, final_report = run_simple_orchestration(
-        df=df,
-        target_column=target_column,
-        filename=filename
-    )
 
+def _save_result(history, final_report):
+    """Сохраняет отчёт и возвращает (путь_к_отчету, история, текст_отчета)."""
     # Инициализируем report_path, чтобы он был доступен в случае ошибки сохранения
     report_path = None
     try:
@@ -64,3 +48,112 @@ def analyze_dataset(data_path: str, target_column: str | None = None, filename:
 
     # Возвращаем report_path (может быть None), историю и текст отчета
     return report_path, history, final_report
+
+
+def analyze_dataframe(
+    df: pd.DataFrame,
+    target_column: str | None = None,
+    filename: str = "data.csv",
+    export_path: str | None = None,
+    planner: str | None = None,
+):
+    """
+    Запускает полный пайплайн анализа для уже загруженного DataFrame.
+
+    Данные передаются в оркестратор напрямую, без промежуточной записи на диск.
+
+    Args:
+        df: DataFrame с данными.
+        target_column: Название целевой переменной. Если None, будет найдена автоматически.
+        filename: Имя файла данных для отчета.
+        export_path: Путь для сохранения копии данных в CSV. Файл пишется
+            только если путь указан явно.
+        planner: Планировщик шагов оркестратора: "llm", "fixed" (фиксированный
+            план без LLM) или "parallel" (тот же план, инструменты параллельно).
+            None — по умолчанию оркестратора.
+
+    Returns:
+        Кортеж (путь_к_отчету, история, текст_отчета) или None в случае ошибки.
+    """
+    prepared = _prepare_dataframe(df, target_column, export_path)
+    if prepared is None:
+        return
+    df, target_column = prepared
+
+    print("🚀 Запускаем мультиагентный анализ...")
+    history, final_report = run_simple_orchestration(
+        df=df,
+        target_column=target_column,
+        filename=filename,
+        planner=planner,
+    )
+
+    return _save_result(history, final_report)
+
+
+async def analyze_dataframe_async(
+    df: pd.DataFrame,
+    target_column: str | None = None,
+    filename: str = "data.csv",
+    export_path: str | None = None,
+    planner: str | None = None,
+):
+    """
+    Асинхронная версия analyze_dataframe (core.orchestrator.run_orchestration_async).
+
+    Подготовка данных и сохранение отчёта выполняются в пуле потоков, запросы
+    к LLM — без блокировки цикла событий, так что несколько анализов могут
+    идти одновременно в одном процессе.
+
+    Args и Returns — как у analyze_dataframe.
+    """
+    prepared = await asyncio.to_thread(_prepare_dataframe, df, target_column, export_path)
+    if prepared is None:
+        return
+    df, target_column = prepared
+
+    print("🚀 Запускаем мультиагентный анализ...")
+    history, final_report = await run_orchestration_async(
+        df=df,
+        target_column=target_column,
+        filename=filename,
+        planner=planner,
+    )
+    return await asyncio.to_thread(_save_result, history, final_report)
+
+
+def analyze_dataset(
+    data_path: str,
+    target_column: str | None = None,
+    filename: str | None = None,
+    use_cache: bool = True,
+    planner: str | None = None,
+    **load_kwargs,
+):
+    """
+    Запускает полный пайплайн анализа данных из файла.
+
+    Args:
+        data_path: Путь к CSV-файлу.
+        target_column: Название целевой переменной. Если None, будет найдена автоматически.
+        filename: Имя файла для отчета. Если None, будет взято из data_path.
+        use_cache: Использовать кэш разобранных датасетов (core/dataset_cache.py).
+        planner: Планировщик шагов оркестратора ("llm", "fixed" или "parallel").
+        **load_kwargs: Параметры загрузки, передаются в load_data
+            (например, streaming=True).
+
+    Returns:
+        Кортеж (путь_к_отчету, история, текст_отчета) или None в случае ошибки.
+    """
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"Файл не найден: {data_path}")
+
+    print(f"📂 Загружаем данные из {data_path}...")
+    df = load_data_cached(data_path, use_cache=use_cache, **load_kwargs)
+
+    # Если имя файла не передано, используем базовое имя пути
+    if filename is None:
+        filename = os.path.basename(data_path)
+        print(f"📄 Имя файла для отчета: '{filename}'")
+
+    return analyze_dataframe(df, target_column, filename, planner=planner)
@@ -0,0 +1,138 @@
+# core/plot_aggregation.py
+"""
+Предварительная агрегация данных для графиков на больших выборках.
+
+Вместо передачи в matplotlib всех строк данные сворачиваются в NumPy до
+нескольких сотен чисел, и время отрисовки зависит от числа бинов, а не
+от числа строк:
+
+- boxplot — статистики (квартили, усы, ограниченное число выбросов) для
+  Axes.bxp;
+- гистограмма с KDE — счётчики по бинам и KDE на равномерной сетке
+  (линейное бинирование + свёртка с гауссовым ядром через FFT);
+- диаграмма рассеяния — двумерная плотность (бины признака × группа таргета).
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from scipy.signal import fftconvolve
+
+# Начиная с этого числа строк диаграмма рассеяния и гистограмма агрегируются
+LARGE_N_ROWS = 50_000
+# Максимум выбросов, рисуемых на boxplot
+MAX_FLIERS = 500
+# Максимум бинов гистограммы
+MAX_HIST_BINS = 100
+# Число узлов сетки KDE
+KDE_GRID_SIZE = 1024
+# Число бинов признака для диаграммы плотности
+DENSITY_BINS = 200
+
+
+def box_stats(values: np.ndarray, whis: float = 1.5, max_fliers: int = MAX_FLIERS, label: Any = None) -> Dict[str, Any]:
+    """
+    Статистики boxplot в формате Axes.bxp.
+
+    Args:
+        values: Значения без пропусков.
+        whis: Длина усов в межквартильных размахах.
+        max_fliers: Максимум выбросов (равномерная по рангу выборка, крайние
+            значения сохраняются).
+        label: Подпись ящика.
+
+    Returns:
+        Словарь med, q1, q3, whislo, whishi, fliers, mean, label.
+    """
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    low, high = q1 - whis * iqr, q3 + whis * iqr
+    inside = values[(values >= low) & (values <= high)]
+    fliers = values[(values < low) | (values > high)]
+    if len(fliers) > max_fliers:
+        fliers = np.sort(fliers)[np.linspace(0, len(fliers) - 1, max_fliers).astype(np.int64)]
+    return {
+        "med": med,
+        "q1": q1,
+        "q3": q3,
+        "whislo": inside.min() if len(inside) else q1,
+        "whishi": inside.max() if len(inside) else q3,
+        "fliers": fliers,
+        "mean": values.mean(),
+        "label": label,
+    }
+
+
+def histogram_edges(values: np.ndarray, max_bins: int = MAX_HIST_BINS) -> np.ndarray:
+    """Общие границы бинов гистограммы (правило numpy "auto", не больше max_bins бинов)."""
+    edges = np.histogram_bin_edges(values, bins="auto")
+    if len(edges) - 1 > max_bins:
+        edges = np.linspace(edges[0], edges[-1], max_bins + 1)
+    return edges
+
+
+def binned_kde(values: np.ndarray, grid_size: int = KDE_GRID_SIZE) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Гауссова KDE на равномерной сетке за O(n + grid_size log grid_size).
+
+    Значения линейно распределяются по двум соседним узлам сетки, затем
+    сетка сворачивается с гауссовым ядром через FFT. Ширина окна — по
+    правилу Скотта (как у scipy.stats.gaussian_kde).
+
+    Args:
+        values: Значения без пропусков.
+        grid_size: Число узлов сетки.
+
+    Returns:
+        Кортеж (grid, density) — плотность, нормированная на 1, или None,
+        если ширину окна определить нельзя (меньше двух разных значений).
+    """
+    n = len(values)
+    std = values.std(ddof=1) if n > 1 else 0.0
+    if not np.isfinite(std) or std == 0:
+        return None
+    bandwidth = std * n ** (-1 / 5)
+    lo, hi = values.min() - 3 * bandwidth, values.max() + 3 * bandwidth
+    grid = np.linspace(lo, hi, grid_size)
+    step = grid[1] - grid[0]
+
+    # Линейное бинирование: вес значения делится между двумя ближайшими узлами
+    position = (values - lo) / step
+    left = np.clip(np.floor(position).astype(np.int64), 0, grid_size - 2)
+    fraction = position - left
+    weights = np.bincount(left, weights=1 - fraction, minlength=grid_size)
+    weights += np.bincount(left + 1, weights=fraction, minlength=grid_size)
+
+    half_width = min(int(np.ceil(4 * bandwidth / step)), grid_size - 1)
+    offsets = np.arange(-half_width, half_width + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    density = np.maximum(fftconvolve(weights, kernel, mode="same"), 0.0) / n
+    return grid, density
+
+
+def group_density(
+    values: np.ndarray, codes: np.ndarray, n_groups: int, n_bins: int = DENSITY_BINS
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Число строк по бинам признака в каждой группе таргета.
+
+    Args:
+        values: Значения признака (NaN — пропуск).
+        codes: Коды групп (отрицательные — пропуск).
+        n_groups: Число групп.
+        n_bins: Число бинов признака.
+
+    Returns:
+        Кортеж (edges, counts): границы бинов и счётчики (n_groups, n_bins).
+    """
+    observed = ~np.isnan(values) & (codes >= 0)
+    x = values[observed]
+    groups = codes[observed].astype(np.int64)
+    if len(x) == 0:
+        return np.linspace(0, 1, n_bins + 1), np.zeros((n_groups, n_bins), dtype=np.int64)
+    lo, hi = x.min(), x.max()
+    if hi == lo:
+        lo, hi = lo - 0.5, hi + 0.5
+    edges = np.linspace(lo, hi, n_bins + 1)
+    bins = np.clip(((x - lo) / (hi - lo) * n_bins).astype(np.int64), 0, n_bins - 1)
+    counts = np.bincount(groups * n_bins + bins, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+    return edges, counts
@@ -0,0 +1,547 @@
+# core/plotting.py
+"""
+Декларативное описание графиков и их отрисовка в пуле процессов.
+
+Визуализаторы не рисуют сами, а описывают графики (PlotSpec: вид,
+признак, префикс, путь файла, подписи) и передают список в render_plots.
+Отрисовка идёт через объектный API matplotlib (Figure без pyplot и его
+глобального состояния), поэтому графики можно строить параллельно.
+Нужные столбцы (признаки и коды таргета) один раз кладутся в общую
+память (multiprocessing.shared_memory), процессы получают их без
+копирования через pickle.
+
+Одинаковые графики (по отпечатку датасета, виду, признаку и оформлению)
+рисуются один раз за запуск и кэшируются на диске между запусками.
+
+В оркестраторе отрисовка отложена (PlotRegistry): визуализаторы только
+регистрируют описания, а рисуются графики, на которые сослался итоговый
+отчёт (или запрошенные из UI).
+
+Формат файлов (по расширению пути) и DPI задаёт политика изображений
+(core/image_policy.py).
+"""
+import os
+import re
+import shutil
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+
+from core.image_policy import get_image_policy
+from core.logger import get_logger
+from core.plot_aggregation import LARGE_N_ROWS, binned_kde, box_stats, group_density, histogram_edges
+from core.utils import process_pool, to_float_array
+
+logger = get_logger(__name__, "orchestrator.log")
+
+# Меньше стольких графиков пул процессов не запускается
+PARALLEL_MIN_PLOTS = 4
+# Имя столбца кодов таргета в общей памяти
+TARGET_CODES = "__target__"
+# Виды графиков, которым нужны значения признака и таргета
+DATA_KINDS = ("boxplot", "histogram", "scatter")
+
+# Состояние процесса-исполнителя (задаётся в _init_worker)
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+@dataclass
+class PlotSpec:
+    """
+    Описание одного графика.
+
+    Attributes:
+        kind: Вид графика: boxplot, histogram, scatter, stacked_bar,
+            feature_importance, outlier_summary.
+        output_path: Путь файла изображения.
+        feature: Признак (для графиков по данным).
+        prefix: Префикс имени файла (в заголовок и ключ кэша не входит).
+        title: Заголовок.
+        xlabel: Подпись оси X (None — по умолчанию для вида графика).
+        ylabel: Подпись оси Y (None — по умолчанию для вида графика).
+        figsize: Размер фигуры в дюймах.
+        params: Готовые данные для графиков без строк датасета
+            (таблица сопряжённости, важности, выбросы).
+    """
+
+    kind: str
+    output_path: str
+    feature: Optional[str] = None
+    prefix: str = ""
+    title: str = ""
+    xlabel: Optional[str] = None
+    ylabel: Optional[str] = None
+    figsize: Tuple[float, float] = (8, 5)
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def safe_feature_name(name: str) -> str:
+    """Создает безопасное имя файла из названия признака."""
+    return "".join(c for c in name if c.isalnum() or c in (' ', '_', '-')).rstrip()
+
+
+def plot_data(df: pd.DataFrame, target_column: str, specs: Sequence[PlotSpec]) -> Tuple[Dict[str, np.ndarray], List[Any]]:
+    """
+    Собирает столбцы, нужные графикам: значения признаков (float64) и коды таргета.
+
+    Args:
+        df: Входной DataFrame.
+        target_column: Имя целевой переменной.
+        specs: Описания графиков.
+
+    Returns:
+        Кортеж (columns, target_levels): columns — словарь имя → массив,
+        коды таргета лежат под именем TARGET_CODES (-1 — пропуск);
+        target_levels — отсортированные значения таргета. Признаки, которые
+        не приводятся к числам, пропускаются: их графики render_plot не построит.
+    """
+    codes, levels = pd.factorize(df[target_column], sort=True)
+    columns: Dict[str, np.ndarray] = {TARGET_CODES: codes.astype(np.float64)}
+    skipped = set()
+    for spec in specs:
+        if spec.kind in DATA_KINDS and spec.feature not in columns and spec.feature not in skipped:
+            try:
+                columns[spec.feature] = to_float_array(df[spec.feature])
+            except (KeyError, TypeError, ValueError) as e:
+                # Нечисловой или отсутствующий признак: его графики не строятся, остальные — да
+                logger.warning(f"⚠️ Признак {spec.feature} не подходит для графика {spec.kind}: {e}")
+                skipped.add(spec.feature)
+    return columns, list(levels)
+
+
+class SharedColumns:
+    """
+    Столбцы одинаковой длины в одном блоке общей памяти (float64).
+
+    Создатель вызывает close(unlink=True); процессы подключаются через
+    attach(name, layout) и получают массивы-представления без копирования.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        names = list(columns)
+        n_rows = len(next(iter(columns.values()))) if columns else 0
+        self.layout = (names, n_rows)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(len(names) * n_rows * 8, 1))
+        block = np.ndarray((len(names), n_rows), dtype=np.float64, buffer=self.shm.buf)
+        for i, name in enumerate(names):
+            block[i] = columns[name]
+        del block
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @staticmethod
+    def attach(name: str, layout: Tuple[List[str], int]) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+        names, n_rows = layout
+        shm = shared_memory.SharedMemory(name=name)
+        block = np.ndarray((len(names), n_rows), dtype=np.float64, buffer=shm.buf)
+        return shm, {column: block[i] for i, column in enumerate(names)}
+
+    def close(self, unlink: bool = False) -> None:
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _groups(columns: Dict[str, np.ndarray], feature: str) -> List[Tuple[int, np.ndarray]]:
+    """Значения признака по группам таргета (без пропусков), по возрастанию кода группы."""
+    codes = columns[TARGET_CODES]
+    values = columns[feature]
+    groups = []
+    for code in np.unique(codes[codes >= 0]).astype(int):
+        subset = values[(codes == code) & ~np.isnan(values)]
+        groups.append((code, subset))
+    return groups
+
+
+def _render_boxplot(ax, spec: PlotSpec, columns: Dict[str, np.ndarray], levels: List[Any]) -> None:
+    # Статистики считаются в NumPy, matplotlib рисует только их (и ограниченное число выбросов)
+    stats = [
+        box_stats(subset, label=str(levels[code]))
+        for code, subset in _groups(columns, spec.feature) if len(subset)
+    ]
+    ax.bxp(stats, patch_artist=True,
+           boxprops={"facecolor": "#4c72b0", "alpha": 0.8}, medianprops={"color": "black"})
+    ax.set_xlabel(spec.xlabel if spec.xlabel is not None else 'Группа')
+    ax.set_ylabel(spec.ylabel if spec.ylabel is not None else spec.feature)
+
+
+def _render_histogram(ax, spec: PlotSpec, columns: Dict[str, np.ndarray], levels: List[Any]) -> None:
+    groups = [(code, subset) for code, subset in _groups(columns, spec.feature) if len(subset)]
+    n_rows = sum(len(subset) for _, subset in groups)
+    if n_rows < LARGE_N_ROWS:
+        import seaborn as sns
+
+        for code, subset in groups:
+            sns.histplot(subset, kde=True, label=f'Группа {levels[code]}', alpha=0.6, ax=ax)
+    else:
+        # Большая выборка: общие бины и KDE на сетке (FFT), без передачи строк в seaborn
+        edges = histogram_edges(np.concatenate([subset for _, subset in groups]))
+        for code, subset in groups:
+            counts, _ = np.histogram(subset, bins=edges)
+            patches = ax.stairs(counts, edges, fill=True, alpha=0.6, label=f'Группа {levels[code]}')
+            kde = binned_kde(subset)
+            if kde is not None:
+                grid, density = kde
+                # KDE в масштабе счётчиков гистограммы, как у seaborn
+                ax.plot(grid, density * len(subset) * (edges[1] - edges[0]), color=patches.get_facecolor(), alpha=1.0)
+    ax.set_xlabel(spec.xlabel if spec.xlabel is not None else spec.feature)
+    ax.set_ylabel(spec.ylabel if spec.ylabel is not None else 'Плотность')
+    ax.legend()
+
+
+def _render_scatter(ax, spec: PlotSpec, columns: Dict[str, np.ndarray], levels: List[Any]) -> None:
+    codes = columns[TARGET_CODES]
+    values = columns[spec.feature]
+    observed = codes >= 0
+    if observed.sum() < LARGE_N_ROWS:
+        # Для бинарной переменной jitter может помочь
+        rng = np.random.default_rng(0)
+        jitter = rng.normal(0, 0.05, size=int(observed.sum()))
+        ax.scatter(values[observed], codes[observed] + jitter, alpha=0.5, s=10)
+    else:
+        # Большая выборка: плотность строк по бинам признака в полосе каждой группы
+        edges, counts = group_density(values, codes, len(levels))
+        norm = LogNorm(vmin=1, vmax=max(int(counts.max()), 1))
+        mesh = None
+        for code in range(len(levels)):
+            strip = np.ma.masked_equal(counts[code][None, :], 0)
+            mesh = ax.pcolormesh(edges, [code - 0.3, code + 0.3], strip, norm=norm, cmap="viridis")
+        if mesh is not None:
+            ax.figure.colorbar(mesh, ax=ax, label='Число строк')
+    ax.set_yticks(range(len(levels)), [str(level) for level in levels])
+    ax.set_xlabel(spec.xlabel if spec.xlabel is not None else spec.feature)
+    ax.set_ylabel(spec.ylabel if spec.ylabel is not None else spec.params.get("target_column", ""))
+
+
+def _render_stacked_bar(ax, spec: PlotSpec, columns: Dict[str, np.ndarray], levels: List[Any]) -> None:
+    crosstab: pd.DataFrame = spec.params["crosstab"]
+    crosstab.plot(kind='bar', stacked=True, ax=ax)
+    ax.set_xlabel(spec.xlabel if spec.xlabel is not None else spec.feature)
+    ax.set_ylabel(spec.ylabel if spec.ylabel is not None else 'Доля')
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    ax.legend(title=spec.params.get("target_column"))
+
+
+def _render_feature_importance(ax, spec: PlotSpec, columns: Dict[str, np.ndarray], levels: List[Any]) -> None:
+    importances: Dict[str, float] = spec.params["importances"]
+    features, scores = zip(*sorted(importances.items(), key=lambda item: item[1], reverse=True))
+    bars = ax.barh(features, scores, color='skyblue')
+    ax.set_xlabel(spec.xlabel if spec.xlabel is not None else 'Важность')
+    ax.invert_yaxis()  # Наиболее важные сверху
+    # Добавление значений на бары
+    for bar, value in zip(bars, scores):
+        ax.text(bar.get_width() + max(scores) * 0.01, bar.get_y() + bar.get_height() / 2,
+                f'{value:.4f}', va='center', ha='left')
+
+
+def _render_outlier_summary(ax, spec: PlotSpec, columns: Dict[str, np.ndarray], levels: List[Any]) -> None:
+    outliers_info: Dict[str, Any] = spec.params["outliers"]
+    features = list(outliers_info.keys())
+    counts = [info.get('count', 0) for info in outliers_info.values()]
+    if all('count_group_0' in info for info in outliers_info.values()):
+        # OutlierDetector посчитал выбросы по группам таргета — показываем разбивку
+        counts_0 = [info['count_group_0'] for info in outliers_info.values()]
+        ax.barh(features, counts_0, color='salmon', label='Группа 0')
+        bars = ax.barh(features, counts, left=0, color='none')
+        ax.barh(features, [c - c0 for c, c0 in zip(counts, counts_0)], left=counts_0,
+                color='steelblue', label='Группа 1')
+        ax.legend()
+    else:
+        bars = ax.barh(features, counts, color='salmon')
+    ax.set_xlabel(spec.xlabel if spec.xlabel is not None else 'Количество выбросов')
+    ax.invert_yaxis()
+    # Добавление значений на бары
+    for bar, value in zip(bars, counts):
+        ax.text(bar.get_width() + max(counts) * 0.01, bar.get_y() + bar.get_height() / 2,
+                f'{value}', va='center', ha='left')
+
+
+RENDERERS: Dict[str, Callable[..., None]] = {
+    "boxplot": _render_boxplot,
+    "histogram": _render_histogram,
+    "scatter": _render_scatter,
+    "stacked_bar": _render_stacked_bar,
+    "feature_importance": _render_feature_importance,
+    "outlier_summary": _render_outlier_summary,
+}
+
+
+def render_plot(spec: PlotSpec, columns: Dict[str, np.ndarray], levels: List[Any], dpi: Optional[int] = None) -> Optional[str]:
+    """
+    Рисует один график и сохраняет его в spec.output_path.
+
+    Формат файла определяется расширением пути, dpi=None — DPI текущей
+    политики изображений.
+
+    Returns:
+        Путь файла или None, если график построить не удалось.
+    """
+    try:
+        fig = Figure(figsize=spec.figsize)
+        ax = fig.add_subplot()
+        RENDERERS[spec.kind](ax, spec, columns, levels)
+        ax.set_title(spec.title)
+        # Старый файл удаляется, а не перезаписывается: он может быть ссылкой на файл кэша
+        if os.path.lexists(spec.output_path):
+            os.remove(spec.output_path)
+        fig.savefig(spec.output_path, bbox_inches='tight', dpi=dpi or get_image_policy().dpi)
+        return spec.output_path
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось построить график {spec.output_path}: {e}")
+        return None
+
+
+def _init_worker(shm_name: str, layout: Tuple[List[str], int], levels: List[Any], dpi: int) -> None:
+    shm, columns = SharedColumns.attach(shm_name, layout)
+    _WORKER_STATE.update(shm=shm, columns=columns, levels=levels, dpi=dpi)
+
+
+def _worker_render(spec: PlotSpec) -> Optional[str]:
+    state = _WORKER_STATE
+    return render_plot(spec, state["columns"], state["levels"], state["dpi"])
+
+
+def _render_batch(
+    specs: Sequence[PlotSpec], columns: Dict[str, np.ndarray], levels: List[Any], n_jobs: Optional[int], dpi: int
+) -> List[Optional[str]]:
+    """Рисует графики последовательно или в пуле процессов (столбцы — через общую память)."""
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(specs), 1))
+    if n_jobs <= 1 or len(specs) < PARALLEL_MIN_PLOTS:
+        return [render_plot(spec, columns, levels, dpi) for spec in specs]
+
+    shared = SharedColumns(columns)
+    try:
+        with process_pool(n_jobs, _init_worker, (shared.name, shared.layout, levels, dpi)) as pool:
+            return list(pool.map(_worker_render, specs))
+    finally:
+        shared.close(unlink=True)
+
+
+def plot_key(spec: PlotSpec, fingerprint: str, target_column: str, dpi: int) -> str:
+    """
+    Ключ содержимого графика: отпечаток датасета, вид, признак и оформление.
+
+    Префикс и путь файла в ключ не входят — одинаковые графики под разными
+    префиксами имеют один ключ. Формат файла (расширение) входит.
+    """
+    from core.dataset_cache import make_cache_key
+
+    params = {
+        name: value.to_json() if isinstance(value, pd.DataFrame) else value
+        for name, value in spec.params.items()
+    }
+    return make_cache_key(
+        fingerprint, stage="plot", kind=spec.kind, feature=spec.feature, target_column=target_column,
+        title=spec.title, xlabel=spec.xlabel, ylabel=spec.ylabel, figsize=list(spec.figsize),
+        params=params, dpi=dpi, format=Path(spec.output_path).suffix.lower(),
+    )
+
+
+def _plot_cache_dir() -> Path:
+    from core import dataset_cache
+
+    return dataset_cache.CACHE_DIR / "plots"
+
+
+def _place_file(source: str, destination: str) -> str:
+    """Кладёт копию готового изображения по пути destination: жёсткой ссылкой или копированием."""
+    if os.path.abspath(source) == os.path.abspath(destination):
+        return destination
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    # Старый файл удаляется, а не перезаписывается: он может быть ссылкой на файл кэша
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+    return destination
+
+
+def render_plots(
+    specs: Sequence[PlotSpec],
+    df: pd.DataFrame,
+    target_column: str,
+    n_jobs: Optional[int] = None,
+    dpi: Optional[int] = None,
+    use_cache: bool = True,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[Optional[str]]:
+    """
+    Рисует графики, при нескольких ядрах — в пуле процессов.
+
+    Одинаковые графики (один ключ plot_key) рисуются один раз, остальные
+    пути получают ссылку на тот же файл. Если у датасета есть отпечаток
+    (`df.attrs["fingerprint"]`), готовые изображения сохраняются в кэш
+    рядом с кэшем датасетов, и при следующих запусках берутся оттуда.
+
+    Args:
+        specs: Описания графиков.
+        df: Входной DataFrame (берутся только нужные столбцы).
+        target_column: Имя целевой переменной.
+        n_jobs: Число процессов (None — по числу ядер; 1 — без пула).
+        dpi: Разрешение изображений (None — из текущей политики изображений).
+        use_cache: Использовать ли дисковый кэш изображений.
+        stats: Если передан, заполняется счётчиками requested, rendered,
+            deduplicated, from_cache.
+
+    Returns:
+        Пути файлов в порядке specs (None для графиков, которые не удалось построить).
+    """
+    dpi = dpi or get_image_policy().dpi
+    counters = {"requested": len(specs), "rendered": 0, "deduplicated": 0, "from_cache": 0}
+    if stats is not None:
+        stats.update(counters)
+    if not specs:
+        return []
+    for spec in specs:
+        os.makedirs(os.path.dirname(spec.output_path) or ".", exist_ok=True)
+
+    from core.dataset_cache import FINGERPRINT_ATTR
+
+    fingerprint = df.attrs.get(FINGERPRINT_ATTR)
+    cache_dir = _plot_cache_dir() if use_cache and fingerprint is not None else None
+    keys = [plot_key(spec, fingerprint or "", target_column, dpi) for spec in specs]
+
+    # Первый spec с каждым ключом — представитель, остальные получат ссылку на его файл
+    representative: Dict[str, int] = {}
+    for i, key in enumerate(keys):
+        representative.setdefault(key, i)
+    paths: List[Optional[str]] = [None] * len(specs)
+
+    to_render = []
+    for key, i in representative.items():
+        cached = cache_dir / f"{key}{Path(specs[i].output_path).suffix}" if cache_dir is not None else None
+        if cached is not None and cached.exists():
+            paths[i] = _place_file(str(cached), specs[i].output_path)
+            counters["from_cache"] += 1
+        else:
+            to_render.append(i)
+
+    if to_render:
+        columns, levels = plot_data(df, target_column, [specs[i] for i in to_render])
+        rendered = _render_batch([specs[i] for i in to_render], columns, levels, n_jobs, dpi)
+        for i, path in zip(to_render, rendered):
+            paths[i] = path
+            if path is not None:
+                counters["rendered"] += 1
+                if cache_dir is not None:
+                    cache_dir.mkdir(parents=True, exist_ok=True)
+                    _place_file(path, str(cache_dir / f"{keys[i]}{Path(path).suffix}"))
+
+    for i, key in enumerate(keys):
+        source = paths[representative[key]]
+        if i != representative[key] and source is not None:
+            paths[i] = _place_file(source, specs[i].output_path)
+            counters["deduplicated"] += 1
+
+    if stats is not None:
+        stats.update(counters)
+    return paths
+
+
+# Ссылки на изображения в Markdown: ![подпись](путь)
+MARKDOWN_IMAGE_PATTERN = r'!\[.*?\]\(([^)]+)\)'
+
+
+class PlotRegistry:
+    """
+    Отложенная отрисовка: графики регистрируются описаниями и рисуются
+    только когда нужны — на них сослался итоговый отчёт или их запросил UI.
+
+    Графики опознаются по имени файла (в отчёте ссылки вида images/<файл>).
+    """
+
+    def __init__(self, df: pd.DataFrame, target_column: str, n_jobs: Optional[int] = None, dpi: Optional[int] = None):
+        self.df = df
+        self.target_column = target_column
+        self.n_jobs = n_jobs
+        self.dpi = dpi
+        self._specs: Dict[str, PlotSpec] = {}
+        self._results: Dict[str, Optional[str]] = {}
+        self.stats = {"registered": 0, "requested": 0, "rendered": 0, "deduplicated": 0, "from_cache": 0}
+
+    def register(self, spec: PlotSpec) -> str:
+        """Регистрирует график без отрисовки и возвращает путь, по которому он появится."""
+        name = os.path.basename(spec.output_path)
+        if name not in self._specs:
+            self.stats["registered"] += 1
+        self._specs[name] = spec
+        self._results.pop(name, None)
+        return spec.output_path
+
+    def names(self) -> List[str]:
+        """Имена файлов всех зарегистрированных графиков."""
+        return list(self._specs)
+
+    def pending(self) -> List[str]:
+        """Имена файлов зарегистрированных, но ещё не нарисованных графиков."""
+        return [name for name in self._specs if name not in self._results]
+
+    def render(self, names: Optional[Sequence[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        Рисует графики по именам файлов (None — все ещё не нарисованные).
+
+        Returns:
+            Словарь имя файла → путь (None, если построить не удалось).
+            Незарегистрированные имена пропускаются.
+        """
+        names = self.pending() if names is None else [os.path.basename(name) for name in names]
+        todo = [name for name in dict.fromkeys(names) if name in self._specs and name not in self._results]
+        if todo:
+            batch_stats: Dict[str, int] = {}
+            paths = render_plots(
+                [self._specs[name] for name in todo], self.df, self.target_column,
+                n_jobs=self.n_jobs, dpi=self.dpi, stats=batch_stats,
+            )
+            self._results.update(zip(todo, paths))
+            for key, value in batch_stats.items():
+                self.stats[key] += value
+        return {name: self._results[name] for name in names if name in self._results}
+
+    def render_referenced(self, markdown: str) -> Dict[str, Optional[str]]:
+        """Рисует графики, на которые есть ссылки-изображения в Markdown."""
+        return self.render(re.findall(MARKDOWN_IMAGE_PATTERN, markdown))
+
+    def release_data(self) -> None:
+        """
+        Оставляет в реестре только столбцы, нужные ещё не нарисованным графикам.
+
+        Реестр может жить дольше запуска (например, в состоянии сессии UI для
+        архива всех графиков) и не должен удерживать весь датасет.
+        """
+        needed = {
+            spec.feature for name, spec in self._specs.items()
+            if name not in self._results and spec.kind in DATA_KINDS
+        }
+        columns = [column for column in self.df.columns if column in needed or column == self.target_column]
+        attrs = dict(self.df.attrs)
+        self.df = self.df[columns].copy()
+        # Отпечаток датасета нужен ключам кэша графиков
+        self.df.attrs.update(attrs)
+
+
+# Реестр текущего запуска — в ContextVar, чтобы параллельные анализы (задачи asyncio)
+# не использовали реестры друг друга
+_CURRENT_REGISTRY: ContextVar[Optional[PlotRegistry]] = ContextVar("insightfinder_plot_registry", default=None)
+
+
+def set_current_registry(registry: Optional[PlotRegistry]) -> None:
+    """Задаёт реестр графиков текущего запуска (для инструментов, экспорта HTML и UI)."""
+    _CURRENT_REGISTRY.set(registry)
+
+
+def get_current_registry() -> Optional[PlotRegistry]:
+    """Реестр графиков текущего запуска или None."""
+    return _CURRENT_REGISTRY.get()
@@ -0,0 +1,179 @@
+# core/scheduler.py
+"""
+Планировщик-граф: параллельный запуск независимых инструментов анализа.
+
+Каждая задача объявляет свои входы и выходы (имена артефактов). Задача
+готова к запуску, когда готовы все её входы, произведённые другими
+задачами; входы, которые никто не производит (например, общий DataFrame),
+считаются доступными сразу. Готовые задачи отправляются в пул потоков,
+так что время запуска близко к времени самой долгой цепочки, а не к сумме.
+
+Используются потоки, а не процессы: инструменты читают общие DataFrame и
+AnalysisContext в памяти (ленивые артефакты контекста вычисляются под
+замком ключа), а тяжёлые участки NumPy/scikit-learn отпускают GIL или
+сами распараллеливаются пулом процессов.
+
+Результаты возвращаются в порядке объявления задач, независимо от порядка
+завершения, поэтому история запуска детерминирована.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.logger import get_logger
+
+logger = get_logger(__name__, "orchestrator.log")
+
+
+@dataclass
+class Task:
+    """
+    Задача планировщика.
+
+    Attributes:
+        name: Имя задачи (имя инструмента).
+        run: Функция запуска. Получает словарь {вход: результат задачи,
+            которая его произвела} и возвращает результат инструмента.
+        inputs: Имена нужных артефактов.
+        outputs: Имена производимых артефактов (по умолчанию — имя задачи).
+    """
+
+    name: str
+    run: Callable[[Dict[str, Any]], Dict[str, Any]]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = field(default=())
+
+    def __post_init__(self):
+        self.inputs = tuple(self.inputs)
+        self.outputs = tuple(self.outputs) or (self.name,)
+
+
+def dependency_graph(tasks: Sequence[Task]) -> Dict[str, List[str]]:
+    """
+    Зависимости задач: имя задачи → имена задач, производящих её входы.
+
+    Raises:
+        ValueError: Повторяющиеся имена задач или артефактов, либо цикл в графе.
+    """
+    names = [task.name for task in tasks]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate task names: {names}")
+    producers: Dict[str, str] = {}
+    for task in tasks:
+        for output in task.outputs:
+            if output in producers:
+                raise ValueError(f"Artifact '{output}' is produced by both '{producers[output]}' and '{task.name}'")
+            producers[output] = task.name
+    graph = {
+        task.name: list(dict.fromkeys(producers[item] for item in task.inputs if item in producers))
+        for task in tasks
+    }
+
+    # Проверка на циклы (алгоритм Кана)
+    remaining = {name: len(deps) for name, deps in graph.items()}
+    dependents: Dict[str, List[str]] = {name: [] for name in graph}
+    for name, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(name)
+    ready = [name for name, count in remaining.items() if count == 0]
+    visited = 0
+    while ready:
+        name = ready.pop()
+        visited += 1
+        for child in dependents[name]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+    if visited != len(graph):
+        cyclic = [name for name, count in remaining.items() if count > 0]
+        raise ValueError(f"Dependency cycle between tasks: {cyclic}")
+    return graph
+
+
+def _error_result(name: str, error: Exception) -> Dict[str, Any]:
+    return {
+        "tool_name": name,
+        "status": "error",
+        "summary": "",
+        "details": {},
+        "error_message": str(error),
+    }
+
+
+def run_tasks(
+    tasks: Sequence[Task],
+    n_jobs: Optional[int] = None,
+    stats: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Запускает задачи с учётом зависимостей, независимые — параллельно.
+
+    Ошибка задачи не останавливает остальные: вместо результата
+    возвращается словарь со статусом error, а зависимые задачи получают его
+    как обычный результат.
+
+    Args:
+        tasks: Задачи.
+        n_jobs: Число потоков (None — по числу ядер; 1 — последовательно).
+        stats: Если передан, заполняется: n_tasks, n_jobs, wall_time,
+            task_time (сумма времени задач), durations (по задачам).
+
+    Returns:
+        Результаты в порядке tasks.
+    """
+    graph = dependency_graph(tasks)
+    by_name = {task.name: task for task in tasks}
+    produced_by = {output: task.name for task in tasks for output in task.outputs}
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(tasks) or 1))
+
+    results: Dict[str, Dict[str, Any]] = {}
+    durations: Dict[str, float] = {}
+    waiting = {name: set(deps) for name, deps in graph.items()}
+    started = time.perf_counter()
+
+    def execute(task: Task) -> Dict[str, Any]:
+        inputs = {item: results[produced_by[item]] for item in task.inputs if item in produced_by}
+        begin = time.perf_counter()
+        try:
+            return task.run(inputs)
+        except Exception as e:
+            logger.error(f"❌ Исключение в задаче {task.name}: {e}")
+            return _error_result(task.name, e)
+        finally:
+            durations[task.name] = time.perf_counter() - begin
+
+    with ThreadPoolExecutor(max_workers=n_jobs, thread_name_prefix="tool") as pool:
+        running: Dict[Future, str] = {}
+
+        def submit_ready() -> None:
+            # Задачи отправляются в порядке объявления — при нехватке потоков раньше стартуют первые
+            for name in [name for name, deps in waiting.items() if not deps]:
+                del waiting[name]
+                logger.info(f"🚀 Планировщик: запуск {name}")
+                # Потоки получают копию контекста: данные текущего запуска хранятся в ContextVar
+                running[pool.submit(copy_context().run, execute, by_name[name])] = name
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                logger.info(f"✅ Планировщик: {name} завершён за {durations.get(name, 0.0):.2f} с")
+                for deps in waiting.values():
+                    deps.discard(name)
+            submit_ready()
+
+    wall_time = time.perf_counter() - started
+    if stats is not None:
+        stats.update(
+            n_tasks=len(tasks),
+            n_jobs=n_jobs,
+            wall_time=wall_time,
+            task_time=sum(durations.values()),
+            durations=dict(durations),
+        )
+    return [results[task.name] for task in tasks]
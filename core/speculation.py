@@ -0,0 +1,150 @@
+# core/speculation.py
+"""
+Спекулятивный запуск инструментов, пока Analyst LLM выбирает следующий шаг.
+
+Пока идёт запрос к LLM, процессор простаивает, а пока работает инструмент —
+простаивает LLM. Перед каждым запросом к Analyst в фоне запускаются
+инструменты, которые он вероятнее всего выберет: первые ещё не выполненные
+по порядку плана из промпта. Когда Analyst отвечает, результат выбранного
+инструмента берётся из фона (попадание), а если его не угадали — инструмент
+запускается как обычно (промах). Невостребованные результаты отбрасываются.
+
+Статистика показывает долю попаданий и сколько времени работы инструментов
+удалось спрятать за ожиданием LLM.
+"""
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.logger import get_logger
+
+logger = get_logger(__name__, "orchestrator.log")
+
+# Сколько инструментов запускать наперёд (0 — без спекуляции)
+DEFAULT_DEPTH = int(os.getenv("INSIGHTFINDER_SPECULATION_DEPTH", "2"))
+
+
+class ToolPrefetcher:
+    """
+    Фоновый запуск инструментов, которые вероятно понадобятся следующими.
+
+    Args:
+        run_tool: Функция запуска инструмента по имени (возвращает результат).
+        plan: Порядок инструментов, по которому угадывается следующий выбор.
+        depth: Сколько ещё не выполненных инструментов плана держать в работе
+            (0 — спекуляция отключена, take просто запускает инструмент).
+    """
+
+    def __init__(self, run_tool: Callable[[str], Dict[str, Any]], plan: List[str], depth: int = DEFAULT_DEPTH):
+        self.run_tool = run_tool
+        self.plan = list(plan)
+        self.depth = max(0, depth)
+        self._pool = ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix="prefetch") if self.depth else None
+        # Имя инструмента → future спекулятивного запуска
+        self._pending: Dict[str, Future] = {}
+        self._committed: set = set()
+        self.stats = {
+            "launched": 0,
+            "hits": 0,
+            "misses": 0,
+            "discarded": 0,
+            "cancelled": 0,
+            "hidden_time": 0.0,
+            "wasted_time": 0.0,
+            "wait_time": 0.0,
+            "miss_time": 0.0,
+        }
+
+    def _timed_run(self, tool_name: str) -> Tuple[Dict[str, Any], float]:
+        begin = time.perf_counter()
+        result = self.run_tool(tool_name)
+        return result, time.perf_counter() - begin
+
+    def prefetch(self, done: Iterable[str]) -> List[str]:
+        """
+        Запускает в фоне следующие по плану инструменты, которых нет среди done
+        и которые ещё не запущены.
+
+        Returns:
+            Имена инструментов, запущенных этим вызовом.
+        """
+        if self._pool is None:
+            return []
+        excluded = set(done) | self._committed
+        candidates = [name for name in self.plan if name not in excluded]
+        started = []
+        for tool_name in candidates[:self.depth]:
+            if tool_name in self._pending:
+                continue
+            # Копия контекста: данные текущего запуска хранятся в ContextVar
+            self._pending[tool_name] = self._pool.submit(copy_context().run, self._timed_run, tool_name)
+            self.stats["launched"] += 1
+            started.append(tool_name)
+        if started:
+            logger.info(f"🔮 Спекулятивно запущены: {started}")
+        return started
+
+    def take(self, tool_name: str) -> Dict[str, Any]:
+        """
+        Результат выбранного инструмента: из фона (попадание) или новым запуском (промах).
+        """
+        self._committed.add(tool_name)
+        future = self._pending.pop(tool_name, None)
+        if future is None:
+            self.stats["misses"] += 1
+            result, duration = self._timed_run(tool_name)
+            self.stats["miss_time"] += duration
+            logger.info(f"🔮 Промах спекуляции: {tool_name} выполнен синхронно за {duration:.2f} с")
+            return result
+
+        begin = time.perf_counter()
+        result, duration = future.result()
+        waited = time.perf_counter() - begin
+        self.stats["hits"] += 1
+        self.stats["wait_time"] += waited
+        self.stats["hidden_time"] += max(duration - waited, 0.0)
+        logger.info(
+            f"🔮 Попадание спекуляции: {tool_name} (работал {duration:.2f} с, ожидание {waited:.2f} с)"
+        )
+        return result
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        """Доля выборов Analyst, угаданных спекуляцией (None, если выборов не было)."""
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else None
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Отбрасывает невостребованные результаты и останавливает пул.
+
+        Ещё не начатые инструменты отменяются (cancelled), уже работающие
+        дожидаются: иначе они продолжали бы занимать процессор после
+        возврата отчёта и мешали следующему анализу. Их время работы
+        учитывается как потраченное впустую (wasted_time).
+
+        Returns:
+            Итоговая статистика (stats и hit_rate).
+        """
+        running = []
+        for future in self._pending.values():
+            self.stats["discarded"] += 1
+            if future.cancel():
+                self.stats["cancelled"] += 1
+            else:
+                running.append(future)
+        if self._pending:
+            logger.info(f"🔮 Отброшены невостребованные результаты: {list(self._pending)}")
+        self._pending.clear()
+        for future in running:
+            try:
+                _, duration = future.result()
+            except Exception as e:
+                logger.warning(f"⚠️ Спекулятивный запуск завершился ошибкой: {e}")
+                continue
+            self.stats["wasted_time"] += duration
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        return {**self.stats, "hit_rate": self.hit_rate}
@@ -0,0 +1,202 @@
+# core/split_search.py
+"""
+Поиск лучшего разбиения глубины 1 (решающий пень) по всем признакам сразу.
+
+Признаки берутся из общей бинированной матрицы (core/binning.py), для
+всех признаков строятся гистограммы классов (np.bincount по uint8-кодам
+каждого столбца). Gini-выигрыш каждого порога считается из накопленных сумм
+гистограмм, так что время работы линейно по строкам × признакам.
+
+- Числовые признаки: бины — уникальные значения (точный поиск), если их
+  не больше max_bins, иначе квантильные бины. Во втором случае порог
+  выбирается только среди границ бинов и приближён: результат помечается
+  флагом approximate.
+- Категориальные признаки: уровни упорядочиваются по доле положительного
+  класса — для бинарного таргета и Gini оптимальное разбиение множества
+  категорий всегда является префиксом этого порядка.
+- Пропуски: отдельный бин, который пробуется и слева, и справа от порога.
+"""
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from core.analysis_context import AnalysisContext
+from core.binning import MAX_BINS, get_binned_matrix
+
+def class_histograms(
+    codes: np.ndarray,
+    n_bins: np.ndarray,
+    y_binary: np.ndarray,
+    missing_code: int = -1,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Гистограммы классов по бинам для всех столбцов.
+
+    Счётчики каждого столбца пишутся в свой срез общего массива (смещение
+    признака), столбец кодов передаётся в np.bincount как есть — без
+    расширения блока uint8-кодов до int64. Счётчики класса 1 считаются по
+    заранее отобранным строкам с y = 1.
+
+    Args:
+        codes: Коды бинов (n_rows, n_features).
+        n_bins: Число бинов каждого столбца.
+        y_binary: Таргет 0/1.
+        missing_code: Код пропуска (отрицательные коды тоже считаются пропуском).
+
+    Returns:
+        Кортеж (hist, missing): hist — (n_features, max(n_bins), 2) счётчики
+        классов 0/1 по бинам (дополнено нулями), missing — (n_features, 2)
+        счётчики классов среди пропусков.
+    """
+    n_features = codes.shape[1]
+    width = int(max(n_bins.max(initial=0), 1))
+    positive_rows = np.flatnonzero(np.asarray(y_binary) == 1)
+    signed = np.issubdtype(codes.dtype, np.signedinteger)
+    # Беззнаковый код пропуска — максимальное значение типа, он получает свой счётчик
+    length = max(width, missing_code + 1) if missing_code >= 0 else width
+    hist = np.zeros((n_features, width, 2), dtype=np.int64)
+    missing = np.zeros((n_features, 2), dtype=np.int64)
+    for j in range(n_features):
+        column = codes[:, j]
+        if signed:
+            column = np.where(column < 0, width, column)
+        total = np.bincount(column, minlength=length)
+        positive = np.bincount(column[positive_rows], minlength=length)
+        hist[j, :, 1] = positive[:width]
+        hist[j, :, 0] = total[:width] - positive[:width]
+        missing[j, 1] = positive[width:].sum()
+        missing[j, 0] = total[width:].sum() - missing[j, 1]
+    return hist, missing
+
+
+def _gini(counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Gini-неоднородность и размер узлов для счётчиков классов (..., 2)."""
+    n = counts.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = counts / n[..., None]
+        gini = 1.0 - (p * p).sum(axis=-1)
+    return np.where(n > 0, gini, 0.0), n
+
+
+def scan_splits(hist: np.ndarray, missing: np.ndarray, n_candidates: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Лучший порог каждого признака по гистограммам классов.
+
+    Порог k отправляет бины 0..k влево; пропуски пробуются слева и справа.
+
+    Args:
+        hist: (n_features, n_bins, 2) счётчики классов по упорядоченным бинам.
+        missing: (n_features, 2) счётчики классов среди пропусков.
+        n_candidates: Число допустимых порогов каждого признака (n_bins - 1).
+
+    Returns:
+        Словарь массивов длины n_features: gain, split_bin, missing_left,
+        n_left, n_right, parent_impurity. Для признаков без допустимого
+        разбиения gain = -inf.
+    """
+    hist = hist.astype(np.float64)
+    missing = missing.astype(np.float64)
+    cumulative = np.cumsum(hist, axis=1)[:, :-1, :]          # (F, B-1, 2)
+    total = hist.sum(axis=1) + missing                        # (F, 2)
+    parent_gini, n_total = _gini(total)
+
+    options = []
+    for missing_left in (False, True):
+        left = cumulative + (missing[:, None, :] if missing_left else 0.0)
+        right = total[:, None, :] - left
+        gini_left, n_left = _gini(left)
+        gini_right, n_right = _gini(right)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weighted = (n_left * gini_left + n_right * gini_right) / n_total[:, None]
+        gain = parent_gini[:, None] - weighted
+        valid = (n_left > 0) & (n_right > 0)
+        valid &= np.arange(cumulative.shape[1])[None, :] < n_candidates[:, None]
+        options.append((np.where(valid, gain, -np.inf), n_left))
+
+    gains = np.stack([opt[0] for opt in options], axis=1)     # (F, 2, B-1)
+    lefts = np.stack([opt[1] for opt in options], axis=1)
+    flat = gains.reshape(len(gains), -1)
+    best = np.argmax(flat, axis=1) if flat.shape[1] else np.zeros(len(gains), dtype=np.intp)
+    rows = np.arange(len(gains))
+    best_gain = flat[rows, best] if flat.shape[1] else np.full(len(gains), -np.inf)
+    missing_left, split_bin = np.divmod(best, max(cumulative.shape[1], 1))
+    n_left = lefts.reshape(len(gains), -1)[rows, best] if flat.shape[1] else np.zeros(len(gains))
+    return {
+        "gain": best_gain,
+        "split_bin": split_bin,
+        "missing_left": missing_left.astype(bool),
+        "n_left": n_left.astype(np.int64),
+        "n_right": (n_total - n_left).astype(np.int64),
+        "parent_impurity": parent_gini,
+    }
+
+
+def find_best_splits(ctx: AnalysisContext, max_bins: int = MAX_BINS) -> List[Dict[str, Any]]:
+    """
+    Лучшее разбиение глубины 1 для каждого признака контекста, по убыванию выигрыша.
+
+    Результат кэшируется в `ctx.cache`.
+
+    Args:
+        ctx: Контекст анализа с бинарным таргетом.
+        max_bins: Максимум бинов на числовой признак.
+
+    Returns:
+        Список словарей (по одному на признак с допустимым разбиением):
+        feature, kind ("numeric" / "categorical"), information_gain,
+        threshold, left_categories (для категориальных), missing_left,
+        n_left, n_right, parent_impurity, approximate (порог выбран по
+        квантильным бинам, а не по всем уникальным значениям).
+    """
+    return ctx.cached(("best_splits", max_bins), lambda: _find_best_splits(ctx, max_bins))
+
+
+def _find_best_splits(ctx: AnalysisContext, max_bins: int) -> List[Dict[str, Any]]:
+    """Расчёт для find_best_splits (без кэша)."""
+    binned = get_binned_matrix(ctx, max_bins)
+    hist, missing = class_histograms(binned.codes, binned.n_bins, ctx.y_binary, binned.missing_code)
+    categorical = binned.is_categorical
+
+    # Категориальные уровни упорядочиваются по доле класса 1, числовые бины — по значению
+    sizes = hist.sum(axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(sizes > 0, hist[:, :, 1] / sizes, np.inf)
+    order = np.tile(np.arange(hist.shape[1]), (len(hist), 1))
+    if categorical.any():
+        order[categorical] = np.argsort(rate[categorical], axis=1, kind="stable")
+    ordered = np.take_along_axis(hist, order[:, :, None], axis=1)
+    n_candidates = np.where(categorical, (sizes > 0).sum(axis=1), binned.n_bins) - 1
+    splits = scan_splits(ordered, missing, n_candidates)
+
+    categorical_index = {name: j for j, name in enumerate(ctx.categorical_names)}
+    results: List[Dict[str, Any]] = []
+    for j, name in enumerate(binned.feature_names):
+        if not np.isfinite(splits["gain"][j]):
+            continue
+        k = splits["split_bin"][j]
+        if categorical[j]:
+            left = order[j, :k + 1]
+            levels = ctx.cat_levels[categorical_index[name]]
+            # Порог по доле класса 1: уровни с долей <= порога уходят влево
+            threshold = (rate[j, order[j, k]] + rate[j, order[j, k + 1]]) / 2.0
+            left_categories = [str(level) for level in levels[left]]
+        else:
+            threshold = binned.thresholds[j][k]
+            left_categories = None
+        results.append({
+            "feature": name,
+            "kind": "categorical" if categorical[j] else "numeric",
+            "information_gain": float(splits["gain"][j]),
+            "threshold": float(threshold),
+            "left_categories": left_categories,
+            "missing_left": bool(splits["missing_left"][j]),
+            "n_left": int(splits["n_left"][j]),
+            "n_right": int(splits["n_right"][j]),
+            "parent_impurity": float(splits["parent_impurity"][j]),
+            "approximate": bool(binned.is_quantized[j]),
+        })
+
+    # Стабильная сортировка: при равном выигрыше — порядок столбцов DataFrame
+    position = {name: i for i, name in enumerate(ctx.feature_names)}
+    results.sort(key=lambda item: (-item["information_gain"], position[item["feature"]]))
+    return results
@@ -1,4 +1,8 @@
 # core/utils.py
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional, Sequence
+
 import pandas as pd
 import numpy as np
 
@@ -54,7 +58,27 @@ def find_binary_target(df: pd.DataFrame) -> str:
     raise ValueError("Бинарная целевая переменная не найдена")
 
 
-def make_target_binary(df: pd.DataFrame, target_column: str) -> pd.DataFrame:
+def binary_target_codes(series: pd.Series) -> np.ndarray:
+    """
+    Коды 0/1 значений бинарного таргета ('yes'/'no', 'true'/'false', '1'/'0' и т.д.).
+
+    Args:
+        series: Столбец таргета.
+
+    Returns:
+        Массив int8: 0/1, -1 — нераспознанное значение.
+    """
+    y = series.astype(str).str.strip().str.lower()
+    mapping = {
+        'yes': 1, 'no': 0,
+        'true': 1, 'false': 0,
+        '1': 1, '0': 0,
+        '1.0': 1, '0.0': 0
+    }
+    return y.map(mapping).fillna(-1).to_numpy(dtype=np.int8)
+
+
+def make_target_binary(df: pd.DataFrame, target_column: str, codes: Optional[np.ndarray] = None) -> pd.DataFrame:
     """
     Преобразует указанный столбец в бинарный формат (0/1).
 
@@ -64,6 +88,8 @@ def make_target_binary(df: pd.DataFrame, target_column: str) -> pd.DataFrame:
     Args:
         df: Входной DataFrame.
         target_column: Название столбца для преобразования.
+        codes: Готовые коды binary_target_codes (например, из кэша);
+            None — посчитать по столбцу.
 
     Returns:
         DataFrame с преобразованным target_column и отфильтрованными строками.
@@ -74,21 +100,103 @@ def make_target_binary(df: pd.DataFrame, target_column: str) -> pd.DataFrame:
     if target_column not in df.columns:
         raise ValueError(f"Столбец '{target_column}' не найден.")
 
-    y = df[target_column].astype(str).str.strip().str.lower()
-    mapping = {
-        'yes': 1, 'no': 0,
-        'true': 1, 'false': 0,
-        '1': 1, '0': 0,
-        '1.0': 1, '0.0': 0
-    }
-    y_mapped = y.map(mapping)
+    if codes is None:
+        codes = binary_target_codes(df[target_column])
 
-    if y_mapped.isnull().all():
+    valid_mask = codes >= 0
+    if not valid_mask.any():
         raise ValueError(f"Не удалось распознать значения в '{target_column}'.")
 
-    valid_mask = y_mapped.notna()
     # Создаем копию, чтобы избежать SettingWithCopyWarning, если применимо
     df_filtered = df[valid_mask].copy()
-    df_filtered[target_column] = y_mapped[valid_mask].astype(int)
+    df_filtered[target_column] = codes[valid_mask].astype(int)
 
     return df_filtered
+
+
+def select_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Возвращает числовые столбцы DataFrame (включая Arrow-типы).
+
+    Args:
+        df: Входной DataFrame.
+
+    Returns:
+        DataFrame только с числовыми столбцами (без копирования данных).
+    """
+    return df.select_dtypes(include=["number"])
+
+
+def select_categorical(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Возвращает категориальные столбцы DataFrame: object, category и строковые
+    (в том числе Arrow-строки `string[pyarrow]`).
+
+    Args:
+        df: Входной DataFrame.
+
+    Returns:
+        DataFrame только с категориальными столбцами (без копирования данных).
+    """
+    return df.select_dtypes(include=["object", "category", "string"])
+
+
+def to_float_array(series: pd.Series) -> np.ndarray:
+    """
+    Преобразует числовой столбец в массив float64, пропуски — в NaN.
+
+    В отличие от np.asarray, не порождает object-массив для nullable
+    и Arrow-типов с пропусками.
+
+    Args:
+        series: Числовой столбец.
+
+    Returns:
+        Массив float64.
+    """
+    return series.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def to_float_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Преобразует числовые столбцы DataFrame в float64 (пропуски — NaN).
+
+    Args:
+        df: DataFrame с числовыми столбцами.
+
+    Returns:
+        Новый DataFrame с тем же индексом и столбцами типа float64.
+    """
+    return pd.DataFrame(
+        {col: to_float_array(df[col]) for col in df.columns},
+        index=df.index,
+        columns=df.columns,
+    )
+
+
+def process_pool(
+    max_workers: int,
+    initializer: Optional[Callable[..., None]] = None,
+    initargs: Sequence[Any] = (),
+) -> ProcessPoolExecutor:
+    """
+    Пул процессов для тяжёлых вычислений инструментов.
+
+    Процессы запускаются через forkserver (где он недоступен — spawn), а не
+    fork: пулы создаются из потоков планировщика, спекуляции и
+    asyncio.to_thread, а fork многопоточного процесса может унаследовать
+    захваченные другими потоками замки и зависнуть.
+
+    Args:
+        max_workers: Число процессов.
+        initializer: Функция инициализации процесса.
+        initargs: Её аргументы (передаются через pickle).
+
+    Returns:
+        ProcessPoolExecutor.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=context, initializer=initializer, initargs=tuple(initargs)
+    )
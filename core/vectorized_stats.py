@@ -0,0 +1,520 @@
+# core/vectorized_stats.py
+"""
+Векторизованные статистики по целому блоку признаков сразу.
+
+Функции принимают матрицу признаков (n_rows, n_features) и бинарный таргет
+и считают результат для всех столбцов одним проходом numpy — без цикла
+по столбцам на Python. Пропуски (NaN) учитываются попарно: для каждого
+признака используются только строки, где он наблюдается.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from core.analysis_context import AnalysisContext
+
+# Сколько столбцов обрабатывается за раз (не больше)
+COLUMN_BLOCK_SIZE = 256
+# Бюджет памяти на один временный массив блока (n_rows × block, 8 байт на ячейку)
+BLOCK_MEMORY_BYTES = 256 * 1024 ** 2
+
+
+def column_block_size(n_rows: int, block_size: Optional[int] = None) -> int:
+    """
+    Число столбцов в блоке, при котором временный массив float64/int64
+    блока укладывается в BLOCK_MEMORY_BYTES.
+
+    Args:
+        n_rows: Число строк.
+        block_size: Явно заданный размер блока (возвращается как есть).
+
+    Returns:
+        min(COLUMN_BLOCK_SIZE, BLOCK_MEMORY_BYTES // (8 * n_rows)), не меньше 1.
+    """
+    if block_size is not None:
+        return block_size
+    return max(1, min(COLUMN_BLOCK_SIZE, BLOCK_MEMORY_BYTES // (8 * max(n_rows, 1))))
+
+
+def point_biserial_block(
+    values: np.ndarray, y_binary: np.ndarray, block_size: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Point-biserial корреляция каждого столбца матрицы с бинарным таргетом.
+
+    Корреляция считается через групповые средние, размеры групп и общее
+    стандартное отклонение: r = (m1 - m0) / s * sqrt(n1 * n0) / n.
+    Для признаков без вариации (или с одной группой) r = NaN.
+
+    Args:
+        values: Матрица признаков (n_rows, n_features), float, NaN — пропуск.
+        y_binary: Таргет 0/1 длины n_rows.
+        block_size: Число столбцов, обрабатываемых за один шаг (None —
+            по бюджету памяти, см. column_block_size).
+
+    Returns:
+        Словарь массивов длины n_features: correlation, p_value, n (число
+        наблюдений), n_0, n_1, mean_0, mean_1, std_0, std_1 (ddof=1).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    group_1 = np.asarray(y_binary).astype(bool)
+    # Индикатор группы как float: для умножения матриц (bool @ bool — логическое «или»)
+    weights_1 = group_1.astype(np.float64)
+    n_features = values.shape[1]
+    block_size = column_block_size(values.shape[0], block_size)
+
+    keys = ["n", "n_0", "n_1", "mean_0", "mean_1", "std_0", "std_1", "std"]
+    result = {key: np.empty(n_features, dtype=np.float64) for key in keys}
+
+    for start in range(0, n_features, block_size):
+        block = values[:, start:start + block_size]
+        cols = slice(start, start + block.shape[1])
+        observed = ~np.isnan(block)
+        filled = np.where(observed, block, 0.0)
+
+        # Размеры групп и суммы — матричным умножением на индикатор группы
+        n_1 = weights_1 @ observed
+        n = observed.sum(axis=0)
+        n_0 = n - n_1
+        sum_1 = weights_1 @ filled
+        sum_all = filled.sum(axis=0)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_1 = sum_1 / n_1
+            mean_0 = (sum_all - sum_1) / n_0
+            mean_all = sum_all / n
+
+            # Центрированные суммы квадратов (второй проход — для точности)
+            centered = np.where(observed, block - np.where(group_1[:, None], mean_1, mean_0), 0.0)
+            ss_within_1 = weights_1 @ (centered * centered)
+            ss_within_0 = (centered * centered).sum(axis=0) - ss_within_1
+            # Общая сумма квадратов = внутригрупповая + межгрупповая
+            ss_total = (
+                ss_within_0 + ss_within_1
+                + n_0 * (mean_0 - mean_all) ** 2 + n_1 * (mean_1 - mean_all) ** 2
+            )
+
+            result["n"][cols] = n
+            result["n_0"][cols] = n_0
+            result["n_1"][cols] = n_1
+            result["mean_0"][cols] = mean_0
+            result["mean_1"][cols] = mean_1
+            result["std_0"][cols] = np.sqrt(ss_within_0 / (n_0 - 1))
+            result["std_1"][cols] = np.sqrt(ss_within_1 / (n_1 - 1))
+            result["std"][cols] = np.sqrt(ss_total / n)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n = result["n"]
+        std = result["std"]
+        r = (result["mean_1"] - result["mean_0"]) / std * np.sqrt(result["n_0"] * result["n_1"]) / n
+        # Нулевая дисперсия даёт бесконечности/NaN — такие признаки не оцениваются
+        r[~np.isfinite(r) | (std <= 1e-12 * np.maximum(np.abs(result["mean_0"]), 1.0))] = np.nan
+        r = np.clip(r, -1.0, 1.0)
+
+        # Двусторонний t-тест для r с n - 2 степенями свободы (как в scipy.stats.pearsonr)
+        dof = n - 2
+        t = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p_value = 2.0 * stats.t.sf(np.abs(t), dof)
+    p_value[np.isnan(r) | (dof < 1)] = np.nan
+    p_value[np.abs(r) == 1.0] = 0.0
+
+    result["correlation"] = r
+    result["p_value"] = p_value
+    del result["std"]
+    return result
+
+
+def context_point_biserial(
+    ctx: AnalysisContext, n_columns: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Point-biserial корреляции числового блока контекста с таргетом.
+
+    Результат для всего блока кэшируется в `ctx.cache` и переиспользуется
+    инструментами (CorrelationAnalysis, InteractionAnalyzer).
+
+    Args:
+        ctx: Контекст анализа с бинарным таргетом.
+        n_columns: Если задано и полного результата ещё нет в кэше,
+            считаются только первые n_columns признаков (без кэширования).
+
+    Returns:
+        Словарь массивов, как у point_biserial_block.
+    """
+    cached = ctx.cache.get("point_biserial")
+    if cached is None and n_columns is not None and n_columns < len(ctx.numeric_names):
+        return point_biserial_block(ctx.numeric[:, :n_columns], ctx.y_binary)
+    result = ctx.cached("point_biserial", lambda: point_biserial_block(ctx.numeric, ctx.y_binary))
+    if n_columns is None:
+        return result
+    return {key: arr[:n_columns] for key, arr in result.items()}
+
+
+# Статистики, которые считает grouped_stats_block (в порядке столбцов результата)
+GROUP_STATS = ("mean", "median", "std", "min", "max")
+
+
+def _block_stats(block: np.ndarray) -> np.ndarray:
+    """mean/median/std/min/max по столбцам блока без учёта NaN, форма (n_cols, 5)."""
+    out = np.full((block.shape[1], len(GROUP_STATS)), np.nan)
+    if block.shape[0] == 0:
+        return out
+    observed = ~np.isnan(block)
+    count = observed.sum(axis=0)
+    has_values = count > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = np.where(observed, block, 0.0).sum(axis=0)
+        mean = total / count
+        centered = np.where(observed, block - mean, 0.0)
+        out[:, 0] = mean
+        std = np.sqrt((centered * centered).sum(axis=0) / (count - 1))
+        out[:, 2] = np.where(count > 1, std, np.nan)
+    out[:, 3] = np.where(has_values, np.where(observed, block, np.inf).min(axis=0), np.nan)
+    out[:, 4] = np.where(has_values, np.where(observed, block, -np.inf).max(axis=0), np.nan)
+    if has_values.all() and observed.all():
+        out[:, 1] = np.median(block, axis=0)
+    elif has_values.any():
+        # nanmedian предупреждает о полностью пустых столбцах — их медиана и так NaN
+        out[has_values, 1] = np.nanmedian(block[:, has_values], axis=0)
+    return out
+
+
+def grouped_stats_block(
+    values: np.ndarray, groups: np.ndarray, block_size: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    mean, median, std (ddof=1), min, max каждого столбца для двух групп.
+
+    Строки каждой группы один раз копируются в непрерывный блок, после чего
+    все пять статистик считаются по нему для всех столбцов блока сразу.
+
+    Args:
+        values: Матрица признаков (n_rows, n_features), float, NaN — пропуск.
+        groups: Метки групп длины n_rows; группы — значения 0 и 1.
+        block_size: Число столбцов, обрабатываемых за один шаг (None —
+            по бюджету памяти, см. column_block_size).
+
+    Returns:
+        Кортеж (stats_0, stats_1) массивов формы (n_features, 5), столбцы в
+        порядке GROUP_STATS. Для пустой группы значения — NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    groups = np.asarray(groups)
+    n_features = values.shape[1]
+    block_size = column_block_size(values.shape[0], block_size)
+    results = []
+    for label in (0, 1):
+        rows = np.flatnonzero(groups == label)
+        stats_g = np.empty((n_features, len(GROUP_STATS)))
+        for start in range(0, n_features, block_size):
+            # Fancy-индексация строк даёт непрерывную копию только нужной группы
+            block = values[rows, start:start + block_size]
+            stats_g[start:start + block.shape[1]] = _block_stats(block)
+        results.append(stats_g)
+    return results[0], results[1]
+
+
+def relative_differences(
+    stats_0: np.ndarray, stats_1: np.ndarray, threshold_ratio: float, top_k: int
+) -> Dict[str, np.ndarray]:
+    """
+    Относительные различия статистик групп, фильтр по порогу и отбор топ-k.
+
+    rel = |v1 - v0| / (max(|v0|, |v1|) + 1e-8); пары, где обе статистики
+    равны нулю, и NaN не учитываются.
+
+    Args:
+        stats_0: Статистики группы 0, форма (n_features, n_stats).
+        stats_1: Статистики группы 1, той же формы.
+        threshold_ratio: Порог относительного различия.
+        top_k: Сколько наибольших различий вернуть.
+
+    Returns:
+        Словарь: feature_index, stat_index, group_0, group_1,
+        relative_difference — для топ-k различий по убыванию; n_significant —
+        число различий выше порога.
+    """
+    with np.errstate(invalid="ignore"):
+        rel = np.abs(stats_1 - stats_0) / (np.maximum(np.abs(stats_0), np.abs(stats_1)) + 1e-8)
+        significant = (rel > threshold_ratio) & ~((stats_0 == 0) & (stats_1 == 0))
+    # Плоские индексы в порядке «признак, затем статистика»
+    flat = np.flatnonzero(significant.ravel())
+    order = np.argsort(-rel.ravel()[flat], kind="stable")[:max(top_k, 0)]
+    top = flat[order]
+    feature_index, stat_index = np.unravel_index(top, rel.shape)
+    return {
+        "feature_index": feature_index,
+        "stat_index": stat_index,
+        "group_0": stats_0.ravel()[top],
+        "group_1": stats_1.ravel()[top],
+        "relative_difference": rel.ravel()[top],
+        "n_significant": np.int64(flat.size),
+    }
+
+
+def contingency_tables(
+    codes: np.ndarray,
+    n_levels: List[int],
+    y_index: np.ndarray,
+    n_classes: int,
+    block_size: Optional[int] = None,
+) -> List[np.ndarray]:
+    """
+    Таблицы сопряжённости (уровень признака × класс таргета) для всех столбцов.
+
+    Для блока столбцов коды признака и класса объединяются в один индекс
+    со смещением столбца, и все таблицы блока считаются одним np.bincount.
+
+    Таблицы плотные, а не разреженные: в контексте анализа у категориального
+    признака не больше MAX_CATEGORY_LEVELS + 1 уровней (редкие свёрнуты,
+    идентификаторы исключены), так что таблица — не больше 51 × n_classes
+    счётчиков, и разреженный формат не дал бы выигрыша по памяти.
+
+    Args:
+        codes: Коды категорий (n_rows, n_columns), -1 — пропуск (не учитывается).
+        n_levels: Число уровней каждого столбца.
+        y_index: Индекс класса таргета (0..n_classes-1) для каждой строки.
+        n_classes: Число классов таргета.
+        block_size: Число столбцов, обрабатываемых за один шаг (None —
+            по бюджету памяти, см. column_block_size).
+
+    Returns:
+        Список таблиц формы (n_levels[j], n_classes), int64.
+    """
+    y_index = np.asarray(y_index, dtype=np.int64)
+    sizes = np.asarray(n_levels, dtype=np.int64) * n_classes
+    block_size = column_block_size(codes.shape[0], block_size)
+    tables: List[np.ndarray] = []
+    for start in range(0, codes.shape[1], block_size):
+        block = codes[:, start:start + block_size]
+        block_sizes = sizes[start:start + block.shape[1]]
+        offsets = np.concatenate(([0], np.cumsum(block_sizes)[:-1]))
+        observed = block >= 0
+        combined = block.astype(np.int64) * n_classes + y_index[:, None] + offsets
+        counts = np.bincount(combined[observed], minlength=int(block_sizes.sum()))
+        for offset, size in zip(offsets, block_sizes):
+            tables.append(counts[offset:offset + size].reshape(-1, n_classes))
+    return tables
+
+
+def chi2_tables(tables: List[np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Хи-квадрат тест независимости для набора таблиц сопряжённости сразу.
+
+    Нулевые строки и столбцы таблиц отбрасываются (как у pd.crosstab).
+    Все таблицы складываются в один массив, суммы по таблицам считаются
+    через np.add.reduceat. Для таблиц с одной степенью свободы применяется
+    поправка Йейтса — результат совпадает с scipy.stats.chi2_contingency.
+
+    Args:
+        tables: Таблицы сопряжённости с одинаковым числом столбцов (классов).
+
+    Returns:
+        Словарь массивов длины len(tables): chi2, p_value, dof,
+        n_levels (число непустых строк). Для таблиц меньше 2×2 — NaN / dof = 0.
+    """
+    n_tables = len(tables)
+    result = {
+        "chi2": np.full(n_tables, np.nan),
+        "p_value": np.full(n_tables, np.nan),
+        "dof": np.zeros(n_tables, dtype=np.int64),
+        "n_levels": np.zeros(n_tables, dtype=np.int64),
+    }
+    if n_tables == 0:
+        return result
+
+    # Непустые строки всех таблиц, уложенные подряд
+    trimmed = [table[table.sum(axis=1) > 0] for table in tables]
+    rows_per_table = np.array([len(t) for t in trimmed], dtype=np.int64)
+    result["n_levels"] = rows_per_table
+    present = rows_per_table > 0
+    if not present.any():
+        return result
+    stacked = np.concatenate([t for t in trimmed if len(t)]).astype(np.float64)
+    starts = np.concatenate(([0], np.cumsum(rows_per_table[present])[:-1]))
+    table_id = np.repeat(np.arange(present.sum()), rows_per_table[present])
+
+    col_sums = np.add.reduceat(stacked, starts, axis=0)
+    totals = col_sums.sum(axis=1)
+    row_sums = stacked.sum(axis=1)
+    expected = row_sums[:, None] * col_sums[table_id] / totals[table_id][:, None]
+
+    n_cols = (col_sums > 0).sum(axis=1)
+    dof = (rows_per_table[present] - 1) * (n_cols - 1)
+
+    # Поправка Йейтса для таблиц с dof == 1
+    observed = stacked
+    yates = (dof == 1)[table_id][:, None]
+    diff = expected - observed
+    observed = np.where(yates, observed + np.sign(diff) * np.minimum(0.5, np.abs(diff)), observed)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        terms = np.where(expected > 0, (observed - expected) ** 2 / expected, 0.0)
+    chi2 = np.add.reduceat(terms.sum(axis=1), starts)
+
+    valid = dof > 0
+    p_value = np.full(len(dof), np.nan)
+    p_value[valid] = stats.chi2.sf(chi2[valid], dof[valid])
+
+    result["chi2"][present] = np.where(valid, chi2, np.nan)
+    result["p_value"][present] = p_value
+    result["dof"][present] = dof
+    return result
+
+
+def context_contingency(ctx: AnalysisContext) -> Dict[str, Any]:
+    """
+    Таблицы сопряжённости и хи-квадрат для всех категориальных признаков контекста.
+
+    Результат кэшируется в `ctx.cache` и переиспользуется инструментами
+    (CategoricalFeatureAnalysis, InteractionAnalyzer, InsightDrivenVisualizer).
+
+    Args:
+        ctx: Контекст анализа.
+
+    Returns:
+        Словарь: tables (список таблиц уровень × класс, строки в порядке
+        ctx.cat_levels, столбцы — ctx.classes), chi2, p_value, dof, n_levels.
+    """
+    def compute() -> Dict[str, Any]:
+        tables = contingency_tables(
+            ctx.cat_codes,
+            [len(levels) for levels in ctx.cat_levels],
+            ctx.y_index,
+            len(ctx.classes),
+        )
+        return {"tables": tables, **chi2_tables(tables)}
+
+    return ctx.cached("contingency", compute)
+
+
+def contingency_frame(ctx: AnalysisContext, feature: str, normalize: bool = False) -> pd.DataFrame:
+    """
+    Таблица сопряжённости признака с таргетом как DataFrame (аналог pd.crosstab).
+
+    Args:
+        ctx: Контекст анализа.
+        feature: Имя категориального признака.
+        normalize: Нормировать ли строки на сумму (normalize='index').
+
+    Returns:
+        DataFrame: индекс — уровни признака, столбцы — классы таргета.
+    """
+    j = ctx.categorical_names.index(feature)
+    table = context_contingency(ctx)["tables"][j]
+    frame = pd.DataFrame(
+        table,
+        index=pd.Index(ctx.cat_levels[j], name=feature),
+        columns=pd.Index(ctx.classes, name=ctx.target_column),
+    )
+    frame = frame.loc[frame.sum(axis=1) > 0, frame.sum(axis=0) > 0]
+    if normalize:
+        frame = frame.div(frame.sum(axis=1), axis=0)
+    return frame
+
+
+def outlier_masks(
+    values: np.ndarray,
+    method: str = "iqr",
+    threshold: float = 1.5,
+    groups: Optional[np.ndarray] = None,
+    block_size: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Выбросы во всех столбцах матрицы: границы, счётчики и упакованные маски.
+
+    Для метода "iqr" квартили всех столбцов считаются одним вызовом
+    np.nanquantile; для "zscore" используется |x - mean| / std (ddof=0).
+    Маска выбросов по строкам хранится как битовое поле (np.packbits по
+    строкам): ceil(n_rows / 8) байт на столбец.
+
+    Args:
+        values: Матрица признаков (n_rows, n_features), float, NaN — пропуск.
+        method: "iqr" или "zscore".
+        threshold: Множитель IQR или порог z-score.
+        groups: Метки групп 0/1 — для подсчёта выбросов по группам.
+        block_size: Число столбцов, обрабатываемых за один шаг (None —
+            по бюджету памяти, см. column_block_size).
+
+    Returns:
+        Словарь: bits (uint8, (ceil(n_rows/8), n_features)), count, lower,
+        upper (границы нормальных значений), count_0 и count_1 (если
+        переданы groups).
+
+    Raises:
+        ValueError: Если метод неизвестен.
+    """
+    if method not in ("iqr", "zscore"):
+        raise ValueError(f"Unknown outlier method: {method}")
+    values = np.asarray(values, dtype=np.float64)
+    n_rows, n_features = values.shape
+    block_size = column_block_size(n_rows, block_size)
+    weights_1 = None if groups is None else (np.asarray(groups) == 1).astype(np.float64)
+
+    result = {
+        "bits": np.empty(((n_rows + 7) // 8, n_features), dtype=np.uint8),
+        "count": np.zeros(n_features, dtype=np.int64),
+        "lower": np.full(n_features, np.nan),
+        "upper": np.full(n_features, np.nan),
+    }
+    if weights_1 is not None:
+        result["count_0"] = np.zeros(n_features, dtype=np.int64)
+        result["count_1"] = np.zeros(n_features, dtype=np.int64)
+
+    for start in range(0, n_features, block_size):
+        block = values[:, start:start + block_size]
+        cols = slice(start, start + block.shape[1])
+        observed = ~np.isnan(block)
+        has_values = observed.any(axis=0)
+        lower = np.full(block.shape[1], np.nan)
+        upper = np.full(block.shape[1], np.nan)
+
+        if has_values.any():
+            sub = block[:, has_values]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                if method == "iqr":
+                    q1, q3 = np.nanquantile(sub, [0.25, 0.75], axis=0)
+                    iqr = q3 - q1
+                    lower[has_values] = q1 - threshold * iqr
+                    upper[has_values] = q3 + threshold * iqr
+                else:
+                    count = observed[:, has_values].sum(axis=0)
+                    mean = np.where(observed[:, has_values], sub, 0.0).sum(axis=0) / count
+                    centered = np.where(observed[:, has_values], sub - mean, 0.0)
+                    std = np.sqrt((centered * centered).sum(axis=0) / count)
+                    # Нулевая дисперсия — z-score не определён, выбросов нет
+                    std[std == 0] = np.nan
+                    lower[has_values] = mean - threshold * std
+                    upper[has_values] = mean + threshold * std
+
+        with np.errstate(invalid="ignore"):
+            mask = (block < lower) | (block > upper)
+        result["lower"][cols] = lower
+        result["upper"][cols] = upper
+        result["count"][cols] = mask.sum(axis=0)
+        if weights_1 is not None:
+            result["count_1"][cols] = np.rint(weights_1 @ mask).astype(np.int64)
+            result["count_0"][cols] = result["count"][cols] - result["count_1"][cols]
+        result["bits"][:, cols] = np.packbits(mask, axis=0)
+    return result
+
+
+def unpack_mask(bits: np.ndarray, column: int, n_rows: int) -> np.ndarray:
+    """Распаковывает битовую маску столбца (из outlier_masks) в bool-массив длины n_rows."""
+    return np.unpackbits(bits[:, column], count=n_rows).astype(bool)
+
+
+def context_outliers(ctx: AnalysisContext, method: str = "iqr", threshold: float = 1.5) -> Dict[str, np.ndarray]:
+    """
+    Выбросы числового блока контекста (см. outlier_masks), с кэшем в `ctx.cache`.
+
+    Кэш хранится по ключу ("outliers", method, threshold), так что визуализатор
+    и отчёт могут получить построчные маски без повторного расчёта.
+    """
+    key = ("outliers", method, float(threshold))
+    groups = ctx.y_binary if ctx.is_binary else None
+    return ctx.cached(key, lambda: outlier_masks(ctx.numeric, method, threshold, groups=groups))
@@ -6,70 +6,108 @@ import re
 import base64
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 from markdown_it import MarkdownIt
 
+from core.image_policy import ImagePolicy, fit_to_budget, get_image_policy, mime_type
+from core.plotting import get_current_registry
+
 # Настройка логгера для этого модуля
 logger = logging.getLogger(__name__)
 
 # парсерр markdown
 md_parser = MarkdownIt("commonmark", {"breaks": True}).enable("table")
 
-def _image_to_base64(image_path: Path) -> Optional[str]:
+def _image_to_base64(image_path: Path, data: Optional[bytes] = None) -> Optional[str]:
     """
     Читает изображение и возвращает его в виде строки base64.
 
     Args:
         image_path: Путь к файлу изображения.
+        data: Уже подготовленные байты изображения (например, ужатые под
+            бюджет отчёта). Если не переданы, читается файл.
 
     Returns:
         Строка данных изображения в формате base64 или None в случае ошибки.
     """
     try:
-        if not image_path.exists():
+        if data is None and not image_path.exists():
             logger.warning(f"Файл изображения не найден при конвертации в HTML: {image_path}")
             return None
         
-        suffix = image_path.suffix.lower()
-        if suffix == ".png":
-            mime_type = "image/png"
-        elif suffix in [".jpg", ".jpeg"]:
-            mime_type = "image/jpeg"
-        else:
-            logger.warning(f"Неподдерживаемый формат изображения: {suffix} в файле {image_path}")
+        image_mime_type = mime_type(image_path)
+        if image_mime_type is None:
+            logger.warning(f"Неподдерживаемый формат изображения: {image_path.suffix.lower()} в файле {image_path}")
             return None
 
-        with open(image_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
-        return f"data:{mime_type};base64,{encoded_string}"
+        if data is None:
+            data = image_path.read_bytes()
+        encoded_string = base64.b64encode(data).decode("utf-8")
+        return f"data:{image_mime_type};base64,{encoded_string}"
 
     except Exception as e:
         logger.error(f"Ошибка кодирования изображения {image_path}: {e}")
         return None
 
 
+def _image_full_path(images_dir_path: Path, img_path_str: str) -> Path:
+    """Путь файла изображения по ссылке из Markdown (ссылки вида images/<файл>)."""
+    if 'images/' in img_path_str:
+        clean_path_str = img_path_str.split('images/')[-1]
+    else:
+        clean_path_str = Path(img_path_str).name
+    return images_dir_path / clean_path_str
+
+
 def markdown_to_html_with_images(
-    markdown_content: str, base_images_dir: str = "report/output/images"
+    markdown_content: str,
+    base_images_dir: str = "report/output/images",
+    image_policy: Optional[ImagePolicy] = None,
 ) -> str:
     """
     Конвертирует Markdown в HTML, встраивая локальные изображения как base64.
     Использует markdown-it-py для парсинга (поддержка GitHub-style таблиц).
+
+    Суммарный размер встроенных изображений ограничен бюджетом политики
+    изображений: при превышении растровые изображения квантуются и
+    уменьшаются (файлы на диске не меняются).
     """
     images_dir_path = Path(base_images_dir).resolve()
     logger.info(f"Начало конвертации Markdown в HTML. Папка с изображениями: {images_dir_path}")
 
-    # 1. Подмена изображений на base64
+    # Отложенные графики текущего запуска, на которые ссылается отчёт, рисуются сейчас
+    registry = get_current_registry()
+    if registry is not None:
+        try:
+            registry.render_referenced(markdown_content)
+        except Exception as e:
+            logger.error(f"Ошибка отрисовки графиков отчёта: {e}")
+
+    md_image_pattern = r'!\[(.*?)\]\(([^)]+)\)'
+
+    # 1. Изображения отчёта ужимаются под общий бюджет
+    policy = image_policy or get_image_policy()
+    referenced = [
+        _image_full_path(images_dir_path, match.group(2).strip())
+        for match in re.finditer(md_image_pattern, markdown_content)
+    ]
+    embedded = [path for path in referenced if mime_type(path) is not None and path.exists()]
+    image_data: Dict[Path, bytes] = {}
+    if embedded:
+        image_data, budget_stats = fit_to_budget(embedded, policy)
+        if budget_stats["final_bytes"] != budget_stats["original_bytes"]:
+            logger.info(
+                f"Изображения ужаты под бюджет отчёта: {budget_stats['original_bytes']} → "
+                f"{budget_stats['final_bytes']} байт (масштаб {budget_stats['scale']}%)"
+            )
+
+    # 2. Подмена изображений на base64
     def replace_markdown_image_tag(match):
         alt_text = match.group(1).strip()
         img_path_str = match.group(2).strip()
 
-        if 'images/' in img_path_str:
-            clean_path_str = img_path_str.split('images/')[-1]
-        else:
-            clean_path_str = Path(img_path_str).name
-            
-        img_full_path = images_dir_path / clean_path_str
-        data_url = _image_to_base64(img_full_path)
+        img_full_path = _image_full_path(images_dir_path, img_path_str)
+        data_url = _image_to_base64(img_full_path, image_data.get(img_full_path))
         
         if data_url:
             return f'<img src="{data_url}" alt="{alt_text}" class="insightfinder-report-image" data-original-alt="{alt_text}">'
@@ -77,13 +115,12 @@ def markdown_to_html_with_images(
             logger.warning(f"Не удалось встроить изображение: {img_path_str}")
             return f'[Изображение не найдено: {alt_text}]'
 
-    md_image_pattern = r'!\[(.*?)\]\(([^)]+)\)'
     processed_md = re.sub(md_image_pattern, replace_markdown_image_tag, markdown_content)
 
-    # 2. Рендерим HTML с помощью markdown-it-py
+    # 3. Рендерим HTML с помощью markdown-it-py
     html_body = md_parser.render(processed_md)
 
-    # 3. Оборачиваем <img> в <figure>
+    # 4. Оборачиваем <img> в <figure>
     def wrap_images(match):
         img_tag = match.group(0)
         alt_match = re.search(r'data-original-alt="([^"]*)"', img_tag)
@@ -95,7 +132,7 @@ def markdown_to_html_with_images(
     
     html_body = re.sub(r'<img[^>]+class="insightfinder-report-image"[^>]*>', wrap_images, html_body)
     
-    # 4. Добавляем стили
+    # 5. Добавляем стили
     styled_html = f"""
     <style>
       #insightfinder-report-container {{
@@ -0,0 +1,175 @@
+# tests/test_analysis_context.py
+"""
+Тесты для общего контекста анализа (core/analysis_context.py).
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import core.analysis_context as analysis_context
+from core.analysis_context import build_analysis_context, get_analysis_context
+from tools.correlation_analysis import correlation_analysis
+from tools.categorical_feature_analysis import categorical_feature_analysis
+from tools.descriptive_stats_comparator import descriptive_stats_comparator
+from tools.full_model_importance import full_model_importance
+from tools.primary_feature_finder import primary_feature_finder
+
+
+@pytest.fixture
+def sample_df():
+    np.random.seed(42)
+    n = 400
+    df = pd.DataFrame({
+        "age": np.random.randint(18, 70, n).astype(float),
+        "income": np.random.normal(50000, 15000, n),
+        "plan": np.random.choice(["Basic", "Gold", "Premium"], n),
+        "region": np.random.choice(["North", "South"], n),
+        "churn": np.random.choice([0, 1], n),
+    })
+    df.loc[::17, "income"] = np.nan
+    df.loc[::23, "plan"] = np.nan
+    return df
+
+
+def test_build_context_encodes_blocks(sample_df):
+    ctx = build_analysis_context(sample_df, "churn")
+
+    assert ctx.feature_names == ["age", "income", "plan", "region"]
+    assert ctx.numeric_names == ["age", "income"]
+    assert ctx.categorical_names == ["plan", "region"]
+    assert ctx.numeric.shape == (400, 2) and ctx.numeric.flags.f_contiguous
+    assert np.isnan(ctx.numeric[0, 1])
+    assert ctx.cat_codes[0, 0] == -1
+    assert list(ctx.cat_levels[0]) == ["Basic", "Gold", "Premium"]
+    assert ctx.is_binary
+
+    encoded = ctx.encoded_features()
+    assert encoded.shape == (400, 4)
+    assert not np.isnan(encoded).any()
+    assert encoded[0, 2] == 3  # пропуск категории — отдельный код
+    assert ctx.encoded_features() is encoded
+    print("✅ Контекст кодирует числовой и категориальный блоки")
+
+
+def test_string_target_encoding():
+    df = pd.DataFrame({"x": [1.0, 2.0, 3.0, 4.0], "target": ["Yes", "No", "Yes", "No"]})
+    ctx = build_analysis_context(df, "target")
+    assert list(ctx.classes) == ["No", "Yes"]
+    assert ctx.y.tolist() == [1, 0, 1, 0]
+    with pytest.raises(ValueError):
+        build_analysis_context(df, "missing")
+    print("✅ Строковый таргет кодируется как в LabelEncoder")
+
+
+def test_tools_share_context(sample_df, monkeypatch):
+    ctx = build_analysis_context(sample_df, "churn")
+    expected = [
+        primary_feature_finder(sample_df, "churn"),
+        correlation_analysis(sample_df, "churn"),
+        descriptive_stats_comparator(sample_df, "churn"),
+        categorical_feature_analysis(sample_df, "churn"),
+        full_model_importance(sample_df, "churn"),
+    ]
+
+    # С переданным контекстом инструменты не должны строить его заново
+    def _fail(*args, **kwargs):
+        raise AssertionError("контекст не должен строиться повторно")
+
+    monkeypatch.setattr(analysis_context, "build_analysis_context", _fail)
+    assert get_analysis_context(sample_df, "churn", ctx) is ctx
+    shared = [
+        primary_feature_finder(sample_df, "churn", context=ctx),
+        correlation_analysis(sample_df, "churn", context=ctx),
+        descriptive_stats_comparator(sample_df, "churn", context=ctx),
+        categorical_feature_analysis(sample_df, "churn", context=ctx),
+        full_model_importance(sample_df, "churn", context=ctx),
+    ]
+
+    for before, after in zip(expected, shared):
+        assert after["status"] == "success", after["error_message"]
+        assert after["details"] == before["details"]
+    print("✅ Инструменты дают одинаковый результат с общим контекстом")
+
+
+def test_high_cardinality_columns(sample_df):
+    df = sample_df.copy()
+    n = len(df)
+    df["customer_id"] = [f"C{i:05d}" for i in range(n)]
+    df["zip"] = np.random.choice([f"Z{i}" for i in range(120)], n)
+
+    ctx = build_analysis_context(df, "churn", max_levels=50)
+    report = ctx.cardinality_report
+
+    # Идентификатор исключён из признаков, у ZIP редкие уровни свёрнуты
+    assert "customer_id" in report["skipped_columns"]
+    assert "customer_id" not in ctx.feature_names
+    assert report["folded_columns"]["zip"]["kept_levels"] == 50
+    zip_levels = ctx.cat_levels[ctx.categorical_names.index("zip")]
+    assert len(zip_levels) == 51 and zip_levels[-1] == "__other__"
+
+    result = categorical_feature_analysis(df, "churn", context=ctx)
+    assert result["status"] == "success"
+    assert "customer_id" in result["details"]["skipped_columns"]
+    assert "customer_id" not in result["details"]["significant_features"]
+    print("✅ Столбцы-идентификаторы пропускаются, редкие уровни сворачиваются")
+
+
+def test_numeric_id_columns(sample_df):
+    df = sample_df.copy()
+    n = len(df)
+    df["account_no"] = np.arange(10_000, 10_000 + n)
+    # Почти уникальные, но разреженные целые суммы — это признак, а не идентификатор
+    df["amount_cents"] = np.random.default_rng(0).integers(0, 10**9, n)
+
+    ctx = build_analysis_context(df, "churn", max_levels=50)
+    assert "account_no" in ctx.cardinality_report["skipped_columns"]
+    assert "account_no" not in ctx.numeric_names and "account_no" not in ctx.feature_names
+    assert "amount_cents" in ctx.numeric_names
+    assert ctx.numeric.shape[1] == len(ctx.numeric_names)
+    print("✅ Целочисленные идентификаторы исключаются из числовых признаков")
+
+
+def test_context_not_reused_for_other_frame(sample_df):
+    ctx = build_analysis_context(sample_df, "churn")
+    assert get_analysis_context(sample_df, "churn", ctx) is ctx
+
+    # Те же размеры, другие данные — контекст строится заново
+    other = sample_df.sample(frac=1.0, random_state=0).reset_index(drop=True)
+    assert get_analysis_context(other, "churn", ctx) is not ctx
+
+    # Отпечаток переходит на производные таблицы через attrs: нужен ещё и тот же набор столбцов
+    sample_df.attrs["fingerprint"] = "abc"
+    ctx = build_analysis_context(sample_df, "churn")
+    assert get_analysis_context(sample_df.copy(), "churn", ctx) is ctx
+    subset = sample_df[["churn", sample_df.columns[0]]]
+    assert subset.attrs["fingerprint"] == "abc"
+    assert get_analysis_context(subset, "churn", ctx) is not ctx
+    print("✅ Контекст переиспользуется только для тех же данных")
+
+
+def test_cached_computes_once_across_threads(sample_df):
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+    import time
+
+    ctx = build_analysis_context(sample_df, "churn")
+    calls = []
+    lock = threading.Lock()
+
+    def compute():
+        with lock:
+            calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        values = list(pool.map(lambda _: ctx.cached("artifact", compute), range(8)))
+    assert values == ["value"] * 8
+    assert len(calls) == 1
+    print("✅ Ленивый артефакт контекста считается один раз при параллельных запросах")
@@ -0,0 +1,110 @@
+# tests/test_data_loader.py
+"""
+Тесты для загрузчика данных (core/data_loader.py).
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.data_loader import load_data
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    """CSV с целыми, дробными, низко- и высококардинальными строковыми столбцами."""
+    np.random.seed(0)
+    n = 3000
+    df = pd.DataFrame({
+        "age": np.random.randint(18, 90, n),
+        "income": np.round(np.random.normal(50000, 10000, n), 2),
+        "region": np.random.choice(["North", "South", "East", "West"], n),
+        "customer_id": [f"id_{i}" for i in range(n)],
+        "churn": np.random.choice(["Yes", "No"], n),
+    })
+    path = tmp_path / "data.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_load_data_streaming_matches_default(csv_path):
+    default_df = load_data(str(csv_path))
+    streamed_df = load_data(str(csv_path), streaming=True, chunksize=700, sample_rows=500)
+
+    assert streamed_df.shape == default_df.shape
+    assert streamed_df["age"].dtype == np.int8
+    assert isinstance(streamed_df["region"].dtype, pd.CategoricalDtype)
+    assert streamed_df["customer_id"].dtype == object
+    assert streamed_df["region"].astype(str).tolist() == default_df["region"].tolist()
+    assert np.allclose(streamed_df["income"], default_df["income"], rtol=1e-6)
+
+    stats = streamed_df.attrs["load_stats"]
+    assert stats["n_chunks"] == 5
+    assert stats["bytes_saved"] > 0
+    assert stats["memory_bytes"] < default_df.memory_usage(deep=True, index=False).sum()
+    print("✅ load_data: потоковый режим")
+
+
+def test_load_data_streaming_memory_limit(csv_path):
+    with pytest.raises(MemoryError):
+        load_data(str(csv_path), streaming=True, chunksize=500, max_memory_mb=0.01)
+    print("✅ load_data: лимит памяти")
+
+
+def test_load_data_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_data(str(tmp_path / "missing.csv"), streaming=True)
+    print("✅ load_data: файл не найден")
+
+
+def test_load_data_columnar_formats(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({
+        "income": [10.5, None, 30.0, 40.0],
+        "region": ["N", "S", None, "N"],
+        "churn": ["Yes", "No", "Yes", "No"],
+    })
+    parquet_path = tmp_path / "data.parquet"
+    feather_path = tmp_path / "data.feather"
+    df.to_parquet(parquet_path)
+    df.to_feather(feather_path)
+
+    for path in (parquet_path, feather_path):
+        loaded = load_data(str(path))
+        assert loaded.shape == df.shape
+        assert all(isinstance(dtype, pd.ArrowDtype) for dtype in loaded.dtypes)
+
+    projected = load_data(str(parquet_path), columns=["income", "churn"])
+    assert projected.columns.tolist() == ["income", "churn"]
+    print("✅ load_data: Parquet / Feather с проекцией столбцов")
+
+
+def test_arrow_backed_frame_flows_through_tools(tmp_path):
+    pytest.importorskip("pyarrow")
+    from core.utils import make_target_binary
+    from tools.correlation_analysis import correlation_analysis
+    from tools.categorical_feature_analysis import categorical_feature_analysis
+    from tools.outlier_detector import outlier_detector
+
+    np.random.seed(1)
+    n = 200
+    target = np.random.choice([0, 1], n)
+    df = pd.DataFrame({
+        "score": np.random.normal(0, 1, n) + target,
+        "plan": np.where(target == 1, "Gold", np.random.choice(["Basic", "Gold"], n)),
+        "churn": np.where(target == 1, "Yes", "No"),
+    })
+    path = tmp_path / "data.parquet"
+    df.to_parquet(path)
+
+    loaded = make_target_binary(load_data(str(path)), "churn")
+    for tool in (correlation_analysis, categorical_feature_analysis, outlier_detector):
+        result = tool(loaded, "churn")
+        assert result["status"] == "success", result["error_message"]
+    assert "plan" in categorical_feature_analysis(loaded, "churn")["details"]["significant_features"]
+    print("✅ Arrow-backed DataFrame проходит через инструменты")
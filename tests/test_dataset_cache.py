@@ -0,0 +1,123 @@
+# tests/test_dataset_cache.py
+"""
+Тесты для кэша датасетов (core/dataset_cache.py).
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import core.dataset_cache as dataset_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / "cache"
+    monkeypatch.setattr(dataset_cache, "CACHE_DIR", path)
+    return path
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    np.random.seed(0)
+    n = 300
+    df = pd.DataFrame({
+        "tenure": np.random.randint(1, 72, n),
+        "plan": np.random.choice(["Basic", "Gold"], n),
+        "churn": np.random.choice(["Yes", "No"], n),
+    })
+    path = tmp_path / "data.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_fingerprint_depends_on_content(cache_dir, tmp_path):
+    a = tmp_path / "a.csv"
+    b = tmp_path / "b.csv"
+    a.write_text("x,y\n1,2\n")
+    b.write_text("x,y\n1,3\n")
+    assert dataset_cache.fingerprint_file(str(a)) == dataset_cache.fingerprint_file(str(a))
+    assert dataset_cache.fingerprint_file(str(a)) != dataset_cache.fingerprint_file(str(b))
+
+    df = pd.DataFrame({"x": [1, 2], "y": ["a", "b"]})
+    assert dataset_cache.fingerprint_dataframe(df) == dataset_cache.fingerprint_dataframe(df.copy())
+    assert dataset_cache.fingerprint_dataframe(df) != dataset_cache.fingerprint_dataframe(df.iloc[::-1])
+    print("✅ Отпечаток зависит от содержимого")
+
+
+def test_fingerprint_index_skips_full_hash(cache_dir, csv_path, monkeypatch):
+    first = dataset_cache.fingerprint_file(str(csv_path))
+
+    # Неизменённый файл: отпечаток берётся из индекса, файл целиком не читается
+    def _fail(filepath):
+        raise AssertionError("полный хэш не должен считаться повторно")
+
+    monkeypatch.setattr(dataset_cache, "_hash_file", _fail)
+    assert dataset_cache.fingerprint_file(str(csv_path)) == first
+
+    # Изменённый файл получает новый быстрый ключ и хэшируется заново
+    monkeypatch.undo()
+    monkeypatch.setattr(dataset_cache, "CACHE_DIR", cache_dir)
+    with open(csv_path, "a") as f:
+        f.write("5,Gold,Yes\n")
+    assert dataset_cache.fingerprint_file(str(csv_path)) != first
+    print("✅ Отпечаток неизменённого файла берётся из индекса")
+
+
+def test_load_data_cached_repeat_upload(cache_dir, csv_path, tmp_path, monkeypatch):
+    first = dataset_cache.load_data_cached(str(csv_path), streaming=True)
+    dataset_cache.flush_cache_writes()  # запись в кэш идёт в фоне
+    assert len(list(cache_dir.glob("*.arrow"))) == 1
+
+    # Повторная «загрузка» той же копии файла не должна разбирать CSV
+    copy_path = tmp_path / "upload_copy.csv"
+    copy_path.write_bytes(csv_path.read_bytes())
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("load_data не должен вызываться при попадании в кэш")
+
+    monkeypatch.setattr(dataset_cache, "load_data", _fail)
+    second = dataset_cache.load_data_cached(str(copy_path), streaming=True)
+
+    assert second.attrs["fingerprint"] == first.attrs["fingerprint"]
+    assert second["tenure"].tolist() == first["tenure"].tolist()
+    assert second["plan"].astype(str).tolist() == first["plan"].astype(str).tolist()
+    print("✅ Повторная загрузка читается из кэша")
+
+
+def test_make_target_binary_cached(cache_dir, csv_path):
+    df = dataset_cache.load_data_cached(str(csv_path))
+    dataset_cache.flush_cache_writes()
+    binary = dataset_cache.make_target_binary_cached(df, "churn")
+    cached = dataset_cache.make_target_binary_cached(df, "churn")
+
+    # В кэше только коды таргета, а не вторая копия датасета
+    assert len(list(cache_dir.glob("*.arrow"))) == 1
+    assert len(list(cache_dir.glob("*.target.npy"))) == 1
+    assert set(binary["churn"].unique()) <= {0, 1}
+    assert cached["churn"].tolist() == binary["churn"].tolist()
+    assert cached.attrs["fingerprint"] == binary.attrs["fingerprint"]
+    assert cached.attrs["fingerprint"] != df.attrs["fingerprint"]
+    print("✅ Бинаризация таргета кэшируется")
+
+
+def test_evict_cache_removes_least_recently_used(cache_dir):
+    cache_dir.mkdir(parents=True)
+    for i, name in enumerate(["old.arrow", "used.arrow", "new.arrow"]):
+        path = cache_dir / name
+        path.write_bytes(b"x" * 1000)
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+    # Чтение записи обновляет её mtime — она становится самой свежей
+    dataset_cache._touch(cache_dir / "used.arrow")
+
+    assert dataset_cache.evict_cache(max_bytes=2000) == 1
+    assert sorted(path.name for path in cache_dir.iterdir()) == ["new.arrow", "used.arrow"]
+    assert dataset_cache.evict_cache(max_bytes=2000) == 0
+    print("✅ Кэш вытесняет давно не использованные записи")
@@ -0,0 +1,61 @@
+# tests/test_history_compaction.py
+"""
+Тесты для компактной истории в промпте Analyst (core/history_compaction.py).
+"""
+
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.history_compaction import compact_result, encode_history, estimate_tokens
+
+
+def _correlation_result(n_features):
+    correlations = [(f"f{i}", 0.5 - i * 0.001) for i in range(n_features)]
+    return {
+        "tool_name": "CorrelationAnalysis",
+        "status": "success",
+        "summary": "Найдены корреляции",
+        "details": {
+            "top_positive": dict(correlations[:5]),
+            "all_correlations_sorted": correlations,
+            "n_features_analyzed": n_features,
+        },
+    }
+
+
+def test_compact_result_keeps_top_facts():
+    compact = compact_result(_correlation_result(300), top_k=3)
+    facts = compact["facts"]
+    assert facts["n_features_analyzed"] == 300
+    assert facts["all_correlations_sorted"][:3] == [["f0", 0.5], ["f1", 0.499], ["f2", 0.498]]
+    assert facts["all_correlations_sorted"][-1] == "…+297"
+    assert list(compact_result(_correlation_result(300), top_k=0)) == ["tool_name", "status", "summary"]
+    print("✅ В промпт попадают краткий вывод и первые top_k фактов")
+
+
+def test_encode_history_respects_budget():
+    history = [_correlation_result(300) for _ in range(6)]
+    full = json.dumps(history, ensure_ascii=False, indent=2)
+
+    text, stats = encode_history(history, token_budget=400, measure_full=True)
+    assert stats["tokens"] <= 400 and estimate_tokens(text) == stats["tokens"]
+    assert stats["full_bytes"] == len(full.encode("utf-8"))
+    assert stats["saved_bytes"] == stats["full_bytes"] - stats["bytes"]
+    # Сокращаются старые шаги, свежий шаг сохраняет больше фактов
+    entries = json.loads(text)
+    assert [entry["tool_name"] for entry in entries] == ["CorrelationAnalysis"] * 6
+    assert len(json.dumps(entries[0])) <= len(json.dumps(entries[-1]))
+
+    # Полная история не меняется
+    assert len(history[0]["details"]["all_correlations_sorted"]) == 300
+
+    # Размер промпта ограничен бюджетом, а не растёт с длиной истории
+    _, long_stats = encode_history(history * 3, token_budget=2000)
+    _, short_stats = encode_history(history, token_budget=2000)
+    assert long_stats["tokens"] <= 2000 and short_stats["tokens"] <= 2000
+    # Без measure_full полная история не сериализуется
+    assert "full_bytes" not in short_stats
+    print("✅ История в промпте укладывается в бюджет токенов")
@@ -0,0 +1,150 @@
+# tests/test_orchestrator.py
+"""
+Тесты для оркестратора (core/orchestrator.py).
+LLM не вызывается: Analyst Agent и генерация отчёта подменяются.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import core.orchestrator as orchestrator
+from agents.analyst_agent import ANALYST_PLAN, ANALYST_SYSTEM_PROMPT
+
+
+@pytest.fixture
+def churn_df():
+    rng = np.random.default_rng(0)
+    n = 400
+    df = pd.DataFrame({
+        "MonthlyRevenue": rng.gamma(2.0, 30.0, n),
+        "MonthsInService": rng.integers(1, 60, n).astype(float),
+        "Calls": rng.poisson(5, n).astype(float),
+        "CreditRating": rng.choice(["1-High", "2-Medium", "3-Low"], n),
+    })
+    df["Churn"] = (df["MonthlyRevenue"] + rng.normal(0, 20, n) > 60).astype(int)
+    return df
+
+
+@pytest.fixture
+def offline_llm(monkeypatch, tmp_path):
+    """Запрещает вызовы Analyst и подменяет генерацию отчёта, запоминая переданную историю."""
+    calls = {}
+
+    def _no_analyst(tools):
+        raise AssertionError("Analyst Agent не должен вызываться")
+
+    def _fake_summary(insights, tool_results, filename):
+        calls["tool_results"] = tool_results
+        return "# Отчёт"
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(orchestrator, "create_analyst_agent", _no_analyst)
+    monkeypatch.setattr(orchestrator, "generate_summary", _fake_summary)
+    return calls
+
+
+def test_plan_matches_prompt_order():
+    positions = [ANALYST_SYSTEM_PROMPT.index(f" {tool_name}") for tool_name in ANALYST_PLAN]
+    assert positions == sorted(positions)
+    print("✅ Фиксированный план совпадает с планом в промпте Analyst")
+
+
+def test_fixed_planner_skips_analyst(churn_df, offline_llm):
+    history, report = orchestrator.run_simple_orchestration(churn_df, "Churn", planner="fixed")
+
+    assert report == "# Отчёт"
+    assert [item["tool_name"] for item in history] == ANALYST_PLAN + ["InsightDrivenVisualizer"]
+    assert all(item["status"] == "success" for item in history)
+    assert offline_llm["tool_results"] is history
+    with pytest.raises(ValueError):
+        orchestrator.run_simple_orchestration(churn_df, "Churn", planner="random")
+    print("✅ Фиксированный план выполняется без обращений к Analyst LLM")
+
+
+def test_parallel_planner_matches_fixed(churn_df, offline_llm):
+    fixed_history, _ = orchestrator.run_simple_orchestration(churn_df, "Churn", planner="fixed")
+    parallel_history, _ = orchestrator.run_simple_orchestration(churn_df, "Churn", planner="parallel")
+
+    assert [item["tool_name"] for item in parallel_history] == [item["tool_name"] for item in fixed_history]
+    assert [item["summary"] for item in parallel_history] == [item["summary"] for item in fixed_history]
+    print("✅ Параллельный план даёт ту же историю, что и последовательный")
+
+
+def test_llm_planner_uses_prefetched_results(churn_df, offline_llm, monkeypatch):
+    # Analyst идёт по плану, затем выбирает инструмент не по порядку и останавливается
+    choices = ["PrimaryFeatureFinder", "CorrelationAnalysis", "OutlierDetector", "STOP"]
+
+    class FakeAnalyst:
+        def __init__(self):
+            self.step = 0
+
+        def invoke(self, payload):
+            tool = choices[self.step]
+            self.step += 1
+            return {"logic": "", "next_step": {"tool": tool, "reason": ""}}
+
+    monkeypatch.setattr(orchestrator, "create_analyst_agent", lambda tools: FakeAnalyst())
+    history, _ = orchestrator.run_simple_orchestration(churn_df, "Churn", planner="llm")
+
+    assert [item["tool_name"] for item in history] == choices[:-1] + ["InsightDrivenVisualizer"]
+    assert all(item["status"] == "success" for item in history)
+    print("✅ LLM-планировщик берёт спекулятивные результаты только для выбранных инструментов")
+
+
+def test_async_runs_are_isolated(churn_df, offline_llm, monkeypatch):
+    import asyncio
+
+    other_df = churn_df.rename(columns={"Churn": "Left"}).drop(columns=["Calls"])
+    other_df["Left"] = 1 - other_df["Left"]
+    expected = {
+        "Churn": orchestrator.run_simple_orchestration(churn_df, "Churn", planner="fixed")[0],
+        "Left": orchestrator.run_simple_orchestration(other_df, "Left", planner="fixed")[0],
+    }
+
+    class AsyncAnalyst:
+        # Идёт по плану; паузы заставляют два анализа чередоваться в цикле событий
+        def __init__(self):
+            self.step = 0
+
+        async def ainvoke(self, payload):
+            await asyncio.sleep(0.01)
+            tool = (ANALYST_PLAN + ["STOP"])[self.step]
+            self.step += 1
+            return {"logic": "", "next_step": {"tool": tool, "reason": ""}}
+
+    async def _fake_asummary(insights, tool_results, filename):
+        await asyncio.sleep(0.01)
+        return f"# Отчёт {filename}"
+
+    monkeypatch.setattr(orchestrator, "create_analyst_agent", lambda tools: AsyncAnalyst())
+    monkeypatch.setattr(orchestrator, "agenerate_summary", _fake_asummary)
+
+    async def _main():
+        return await asyncio.gather(
+            orchestrator.run_orchestration_async(churn_df, "Churn", filename="a.csv", planner="llm"),
+            orchestrator.run_orchestration_async(other_df, "Left", filename="b.csv", planner="llm"),
+        )
+
+    (history_a, report_a), (history_b, report_b) = asyncio.run(_main())
+
+    assert (report_a, report_b) == ("# Отчёт a.csv", "# Отчёт b.csv")
+    for target, history in (("Churn", history_a), ("Left", history_b)):
+        assert [item["tool_name"] for item in history] == [item["tool_name"] for item in expected[target]]
+        assert [item["summary"] for item in history] == [item["summary"] for item in expected[target]]
+    print("✅ Одновременные асинхронные анализы не смешивают данные друг друга")
+
+
+def test_plot_render_error_keeps_report(churn_df, offline_llm, monkeypatch):
+    def _broken(self, markdown):
+        raise RuntimeError("отрисовка недоступна")
+
+    monkeypatch.setattr(orchestrator.PlotRegistry, "render_referenced", _broken)
+    history, report = orchestrator.run_simple_orchestration(churn_df, "Churn", planner="fixed")
+    assert report == "# Отчёт" and history
+    print("✅ Ошибка отрисовки графиков не отменяет текстовый отчёт")
@@ -0,0 +1,34 @@
+# tests/test_permutation_importance.py
+"""
+Тесты для permutation importance (core/permutation_importance.py).
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from core.permutation_importance import permutation_importance, split_holdout
+
+
+def test_permutation_importance_parallel_matches_serial():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 4))
+    y = (X[:, 0] + 0.3 * X[:, 2] + rng.normal(scale=0.5, size=600) > 0).astype(int)
+    split = split_holdout(len(X), holdout_rows=200)
+    assert len(split["holdout"]) == 120
+    assert not np.intersect1d(split["train"], split["holdout"]).size
+
+    model = RandomForestClassifier(n_estimators=30, random_state=0).fit(X[split["train"]], y[split["train"]])
+    X_holdout, y_holdout = X[split["holdout"]], y[split["holdout"]]
+    serial = permutation_importance(model, X_holdout, y_holdout, n_repeats=3, n_jobs=1)
+    parallel = permutation_importance(model, X_holdout, y_holdout, n_repeats=3, n_jobs=2)
+
+    assert parallel["n_jobs"] == 2
+    np.testing.assert_allclose(serial["importances_mean"], parallel["importances_mean"])
+    assert np.argmax(serial["importances_mean"]) == 0
+    assert abs(serial["importances_mean"][1]) < serial["importances_mean"][0]
+    print("✅ Permutation importance: пул процессов совпадает с последовательным расчётом")
@@ -0,0 +1,60 @@
+# tests/test_pipeline.py
+"""
+Тесты для точек входа пайплайна (core/pipeline.py).
+Оркестратор подменяется заглушкой, поэтому LLM не вызывается.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+import pytest
+
+import core.pipeline as pipeline
+
+
+@pytest.fixture
+def fake_orchestration(monkeypatch, tmp_path):
+    """Подменяет оркестратор и сохранение отчёта, запоминая переданные данные."""
+    calls = {}
+
+    def _fake_run(df, target_column, filename, **kwargs):
+        calls["df"] = df
+        calls["target_column"] = target_column
+        calls["filename"] = filename
+        calls["kwargs"] = kwargs
+        return [], "# Отчёт"
+
+    def _fake_save(content):
+        path = tmp_path / "report.md"
+        path.write_text(content, encoding="utf-8")
+        return str(path)
+
+    monkeypatch.setattr(pipeline, "run_simple_orchestration", _fake_run)
+    monkeypatch.setattr(pipeline, "save_report", _fake_save)
+    return calls
+
+
+def test_analyze_dataframe_in_memory(fake_orchestration, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame({"x": [1, 2, 3, 4], "target": ["Yes", "No", "Yes", "No"]})
+
+    report_path, history, report_text = pipeline.analyze_dataframe(df, "target", "upload.csv")
+
+    assert report_text == "# Отчёт"
+    assert fake_orchestration["filename"] == "upload.csv"
+    assert fake_orchestration["df"]["target"].tolist() == [1, 0, 1, 0]
+    # Без явного export_path на диск пишется только отчёт
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["report.md"]
+
+
+def test_analyze_dataframe_explicit_export(fake_orchestration, tmp_path):
+    df = pd.DataFrame({"x": [1, 2, 3, 4], "target": [0, 1, 0, 1]})
+    export_path = tmp_path / "copy.csv"
+
+    pipeline.analyze_dataframe(df, "target", export_path=str(export_path))
+
+    assert export_path.exists()
+    assert pd.read_csv(export_path).shape == (4, 2)
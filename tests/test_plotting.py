@@ -0,0 +1,195 @@
+# tests/test_plotting.py
+"""
+Тесты для декларативной отрисовки графиков (core/plotting.py).
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.plotting import PlotSpec, render_plots
+
+
+def test_render_plots_in_process_pool(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "a": rng.normal(size=300),
+        "b": rng.normal(size=300),
+        "target": rng.choice(["No", "Yes"], 300),
+    })
+    df.loc[::10, "a"] = np.nan
+    specs = [
+        PlotSpec("boxplot", str(tmp_path / "a_boxplot.png"), "a", title="a"),
+        PlotSpec("histogram", str(tmp_path / "a_hist.png"), "a", title="a"),
+        PlotSpec("scatter", str(tmp_path / "b_scatter.png"), "b", title="b"),
+        PlotSpec("feature_importance", str(tmp_path / "imp.png"), params={"importances": {"a": 0.7, "b": 0.3}}),
+        # Нет данных для графика — вместо пути возвращается None
+        PlotSpec("outlier_summary", str(tmp_path / "out.png"), params={}),
+    ]
+    paths = render_plots(specs, df, "target", n_jobs=2)
+    assert paths[:4] == [spec.output_path for spec in specs[:4]]
+    assert paths[4] is None
+    assert all(os.path.getsize(path) > 0 for path in paths[:4])
+    assert render_plots([], df, "target") == []
+    print("✅ Графики рисуются в пуле процессов по описаниям PlotSpec")
+
+
+def test_render_plots_deduplicates_and_caches(tmp_path, monkeypatch):
+    from core import dataset_cache
+    import core.plotting as plotting
+
+    monkeypatch.setattr(dataset_cache, "CACHE_DIR", tmp_path / "cache")
+    df = pd.DataFrame({"a": np.arange(100.0), "target": [0, 1] * 50})
+    df.attrs["fingerprint"] = "plots123"
+    specs = [
+        PlotSpec("boxplot", str(tmp_path / "out" / f"{prefix}a_boxplot.png"), "a", prefix, title="a")
+        for prefix in ("desc_", "corr_", "pf_")
+    ]
+
+    stats = {}
+    paths = render_plots(specs, df, "target", n_jobs=1, stats=stats)
+    assert all(os.path.exists(path) for path in paths)
+    assert stats == {"requested": 3, "rendered": 1, "deduplicated": 2, "from_cache": 0}
+
+    # Следующий запуск того же датасета не вызывает matplotlib
+    def _fail(*args, **kwargs):
+        raise AssertionError("график должен браться из кэша")
+
+    monkeypatch.setattr(plotting, "render_plot", _fail)
+    stats = {}
+    paths = render_plots(specs, df, "target", n_jobs=1, stats=stats)
+    assert stats["from_cache"] == 1 and stats["rendered"] == 0
+    assert all(os.path.getsize(path) > 0 for path in paths)
+    print("✅ Одинаковые графики рисуются один раз и берутся из кэша")
+
+
+def test_plot_registry_renders_only_referenced(tmp_path):
+    from core.plotting import PlotRegistry
+    from tools.distribution_visualizer import distribution_visualizer
+
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({name: rng.normal(size=200) for name in ("a", "b", "c")})
+    df["target"] = rng.choice([0, 1], 200)
+    registry = PlotRegistry(df, "target", n_jobs=1)
+
+    result = distribution_visualizer(df, "target", output_dir=str(tmp_path), plot_registry=registry)
+    assert result["status"] == "success"
+    images = result["details"]["saved_images"]
+    assert len(images) == 3
+    # Ничего не нарисовано до ссылки из отчёта
+    assert not any(os.path.exists(image["file_path"]) for image in images.values())
+
+    report = f"# Отчёт\n\n![a]({images['a']['relative_path']})\n"
+    rendered = registry.render_referenced(report)
+    assert list(rendered) == [os.path.basename(images["a"]["file_path"])]
+    assert os.path.exists(images["a"]["file_path"])
+    assert not os.path.exists(images["b"]["file_path"])
+    assert sorted(registry.pending()) == sorted(
+        os.path.basename(images[name]["file_path"]) for name in ("b", "c")
+    )
+    assert registry.stats["registered"] == 3 and registry.stats["rendered"] == 1
+
+    # После release_data реестр держит только столбцы ненарисованных графиков
+    df["unused"] = 0.0
+    registry.release_data()
+    assert list(registry.df.columns) == ["b", "c", "target"]
+    assert all(path for path in registry.render().values())
+    print("✅ Рисуются только графики, на которые сослался отчёт")
+
+
+def test_categorical_primary_feature(tmp_path):
+    from core.plotting import PlotRegistry
+    from tools.insight_driven_visualizer import insight_driven_visualizer
+
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({
+        "plan": rng.choice(["Basic", "Gold"], 200),
+        "x": rng.normal(size=200),
+        "target": rng.choice([0, 1], 200),
+    })
+    history = [{"tool_name": "PrimaryFeatureFinder", "status": "success", "details": {"best_feature": "plan"}}]
+
+    result = insight_driven_visualizer(df, "target", history, output_dir=str(tmp_path), n_jobs=1)
+    assert result["status"] == "success", result["error_message"]
+    assert list(result["details"]["saved_plots"]["pf_plan"]) == ["stacked_bar", "description"]
+
+    # Ошибочное описание (boxplot по строковому признаку) не прерывает отрисовку остальных
+    registry = PlotRegistry(df, "target", n_jobs=1)
+    bad = registry.register(PlotSpec("boxplot", str(tmp_path / "plan_boxplot.png"), "plan"))
+    good = registry.register(PlotSpec("boxplot", str(tmp_path / "x_boxplot.png"), "x"))
+    rendered = registry.render_referenced(f"![a]({bad}) ![b]({good})")
+    assert rendered == {"plan_boxplot.png": None, "x_boxplot.png": good}
+    print("✅ Категориальный главный признак не ломает визуализацию")
+
+
+def test_plot_aggregation_matches_reference():
+    from matplotlib import cbook
+    from scipy.stats import gaussian_kde
+    from core.plot_aggregation import binned_kde, box_stats, group_density
+
+    rng = np.random.default_rng(2)
+    values = np.r_[rng.normal(size=5000), rng.normal(8, 0.5, size=20)]
+
+    stats = box_stats(values, max_fliers=10)
+    reference = cbook.boxplot_stats(values)[0]
+    for key in ("med", "q1", "q3", "whislo", "whishi", "mean"):
+        assert stats[key] == pytest.approx(reference[key])
+    assert len(stats["fliers"]) == 10
+    assert stats["fliers"].max() == values.max()
+
+    grid, density = binned_kde(values)
+    exact = gaussian_kde(values)(grid)
+    assert np.max(np.abs(density - exact)) < 0.01 * exact.max()
+    assert binned_kde(np.ones(10)) is None
+
+    codes = (np.arange(len(values)) % 2).astype(float)
+    edges, counts = group_density(values, codes, 2, n_bins=50)
+    assert counts.shape == (2, 50) and counts.sum() == len(values)
+    assert edges[0] == values.min() and edges[-1] == values.max()
+    print("✅ Агрегаты для графиков совпадают с matplotlib/scipy")
+
+
+def test_image_policy_formats(tmp_path):
+    from core.image_policy import ImagePolicy, set_image_policy
+    from tools.distribution_visualizer import distribution_visualizer
+
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({"a": rng.normal(size=200), "target": rng.choice([0, 1], 200)})
+    with pytest.raises(ValueError):
+        ImagePolicy(format="gif")
+
+    result = distribution_visualizer(df, "target", output_dir=str(tmp_path / "webp"),
+                                     image_policy=ImagePolicy(format="webp", dpi=60))
+    path = result["details"]["saved_images"]["a"]["file_path"]
+    assert path.endswith(".webp") and open(path, "rb").read(12)[8:] == b"WEBP"
+
+    # Политика по умолчанию задаётся один раз для всех визуализаторов
+    set_image_policy(ImagePolicy(format="svg"))
+    try:
+        paths = render_plots([PlotSpec("boxplot", str(tmp_path / "a.svg"), "a", title="a")], df, "target")
+    finally:
+        set_image_policy(None)
+    assert b"<svg" in open(paths[0], "rb").read()
+    print("✅ Формат и DPI графиков задаются политикой изображений")
+
+
+def test_image_policy_is_context_local():
+    import asyncio
+    from core.image_policy import ImagePolicy, get_image_policy, set_image_policy
+
+    async def _run(policy):
+        set_image_policy(policy)
+        await asyncio.sleep(0.01)  # другой анализ успевает задать свою политику
+        return await asyncio.to_thread(lambda: get_image_policy().format)
+
+    async def _main():
+        return await asyncio.gather(_run(ImagePolicy(format="svg")), _run(ImagePolicy(format="webp")))
+
+    assert asyncio.run(_main()) == ["svg", "webp"]
+    assert get_image_policy() == ImagePolicy.from_env()
+    print("✅ Политика изображений не переходит между параллельными анализами")
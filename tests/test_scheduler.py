@@ -0,0 +1,49 @@
+# tests/test_scheduler.py
+"""
+Тесты для планировщика-графа (core/scheduler.py).
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from core.scheduler import Task, dependency_graph, run_tasks
+
+
+def _sleeper(name, delay):
+    def run(inputs):
+        time.sleep(delay)
+        return {"tool_name": name, "status": "success", "summary": name, "details": {"inputs": sorted(inputs)}}
+    return run
+
+
+def test_run_tasks_parallel_and_ordered():
+    # Первая задача самая долгая: завершится последней, но в результатах останется первой
+    tasks = [Task(f"T{i}", _sleeper(f"T{i}", 0.3 if i == 0 else 0.1), inputs=["data"]) for i in range(4)]
+    tasks.append(Task("Visualizer", _sleeper("Visualizer", 0.0), inputs=["data", "T0", "T1", "T2", "T3"]))
+
+    stats = {}
+    results = run_tasks(tasks, n_jobs=4, stats=stats)
+    assert [r["tool_name"] for r in results] == ["T0", "T1", "T2", "T3", "Visualizer"]
+    assert results[-1]["details"]["inputs"] == ["T0", "T1", "T2", "T3"]
+    assert stats["wall_time"] < stats["task_time"] - 0.15
+    print("✅ Независимые задачи идут параллельно, результаты — в порядке объявления")
+
+
+def test_run_tasks_errors_and_cycles():
+    def failing(inputs):
+        raise RuntimeError("boom")
+
+    results = run_tasks([Task("Bad", failing), Task("After", _sleeper("After", 0.0), inputs=["Bad"])], n_jobs=1)
+    assert results[0]["status"] == "error" and results[0]["error_message"] == "boom"
+    assert results[1]["status"] == "success"
+
+    with pytest.raises(ValueError):
+        dependency_graph([Task("A", failing, inputs=["B"]), Task("B", failing, inputs=["A"])])
+    with pytest.raises(ValueError):
+        dependency_graph([Task("A", failing), Task("A", failing)])
+    print("✅ Ошибки задач не останавливают граф, циклы обнаруживаются")
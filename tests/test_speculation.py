@@ -0,0 +1,57 @@
+# tests/test_speculation.py
+"""
+Тесты для спекулятивного запуска инструментов (core/speculation.py).
+"""
+
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.speculation import ToolPrefetcher
+
+
+def _recording_runner(calls, delay=0.05):
+    lock = threading.Lock()
+
+    def run_tool(tool_name):
+        time.sleep(delay)
+        with lock:
+            calls.append(tool_name)
+        return {"tool_name": tool_name, "status": "success", "summary": tool_name, "details": {}}
+    return run_tool
+
+
+def test_prefetch_hits_misses_and_discards():
+    calls = []
+    prefetcher = ToolPrefetcher(_recording_runner(calls), plan=["A", "B", "C", "D"], depth=2)
+
+    assert prefetcher.prefetch(done=[]) == ["A", "B"]
+    time.sleep(0.15)  # «LLM думает» — инструменты успевают отработать в фоне
+    assert prefetcher.take("A")["tool_name"] == "A"
+
+    # Уже запущенный B не перезапускается, добавляется C
+    assert prefetcher.prefetch(done=["A"]) == ["C"]
+    assert prefetcher.take("D")["tool_name"] == "D"  # выбор не угадан
+
+    stats = prefetcher.close()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["launched"] == 3 and stats["discarded"] == 2
+    assert stats["hit_rate"] == 0.5
+    assert stats["hidden_time"] > 0
+    # Отброшенные B и C уже работали: close дожидается их, время учтено как потраченное
+    assert stats["cancelled"] == 0 and stats["wasted_time"] > 0
+    assert sorted(calls) == ["A", "B", "C", "D"]
+    print("✅ Спекуляция считает попадания, промахи и отброшенные результаты")
+
+
+def test_prefetch_disabled():
+    calls = []
+    prefetcher = ToolPrefetcher(_recording_runner(calls, delay=0.0), plan=["A", "B"], depth=0)
+    assert prefetcher.prefetch(done=[]) == []
+    assert prefetcher.take("A")["tool_name"] == "A"
+    assert calls == ["A"]
+    assert prefetcher.close()["misses"] == 1
+    print("✅ При depth=0 инструменты запускаются только по выбору Analyst")
@@ -0,0 +1,162 @@
+# tests/test_split_search.py
+"""
+Тесты для поиска лучшего разбиения глубины 1 (core/split_search.py).
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from core.analysis_context import build_analysis_context
+import core.binning as binning
+import core.dataset_cache as dataset_cache
+from core.binning import bin_numeric_column, get_binned_matrix
+from core.split_search import find_best_splits
+from tools.primary_feature_finder import primary_feature_finder
+
+
+def _gini(y):
+    if len(y) == 0:
+        return 0.0
+    p = y.mean()
+    return 1.0 - p * p - (1.0 - p) ** 2
+
+
+@pytest.fixture
+def numeric_df():
+    rng = np.random.default_rng(0)
+    n = 2000
+    df = pd.DataFrame({
+        "a": rng.integers(0, 50, n).astype(float),
+        "b": rng.normal(size=n).round(1),
+        "c": rng.integers(0, 5, n),
+    })
+    df["target"] = ((df["a"] + rng.normal(0, 20, n) > 30) ^ (rng.random(n) < 0.1)).astype(int)
+    return df
+
+
+def test_numeric_splits_match_decision_tree(numeric_df):
+    ctx = build_analysis_context(numeric_df, "target")
+    splits = {item["feature"]: item for item in find_best_splits(ctx)}
+    n = len(numeric_df)
+
+    for feature in ["a", "b", "c"]:
+        tree = DecisionTreeClassifier(max_depth=1).fit(numeric_df[[feature]].values, numeric_df["target"]).tree_
+        gain = tree.impurity[0] - (
+            tree.impurity[1] * tree.n_node_samples[1] + tree.impurity[2] * tree.n_node_samples[2]
+        ) / n
+        assert splits[feature]["information_gain"] == pytest.approx(gain)
+        assert splits[feature]["threshold"] == pytest.approx(tree.threshold[0], abs=1e-6)
+        assert splits[feature]["n_left"] == tree.n_node_samples[1]
+    print("✅ Разбиения числовых признаков совпадают с DecisionTreeClassifier")
+
+
+def test_categorical_split_is_optimal():
+    rng = np.random.default_rng(1)
+    n = 2000
+    levels = list("abcdef")
+    rates = dict(zip(levels, [0.1, 0.8, 0.3, 0.6, 0.5, 0.2]))
+    cat = rng.choice(levels, n)
+    y = (rng.random(n) < np.vectorize(rates.get)(cat)).astype(int)
+    df = pd.DataFrame({"plan": cat, "target": y})
+
+    best = find_best_splits(build_analysis_context(df, "target"))[0]
+
+    # Полный перебор подмножеств категорий
+    brute = max(
+        _gini(y) - (mask.sum() * _gini(y[mask]) + (~mask).sum() * _gini(y[~mask])) / n
+        for k in range(1, len(levels))
+        for subset in itertools.combinations(levels, k)
+        for mask in [np.isin(cat, subset)]
+    )
+    assert best["kind"] == "categorical"
+    assert best["information_gain"] == pytest.approx(brute)
+    assert set(best["left_categories"]) in ({"a", "c", "f"}, {"b", "d", "e"})
+    print("✅ Разбиение категорий по упорядочиванию долей оптимально")
+
+
+def test_binning_and_missing_values():
+    values = np.array([1.0, np.nan, 3.0, 2.0, np.nan])
+    codes, thresholds = bin_numeric_column(values)
+    assert codes.tolist() == [0, -1, 2, 1, -1]
+    assert thresholds.tolist() == [1.5, 2.5]
+
+    many = np.arange(10000, dtype=float)
+    codes, thresholds = bin_numeric_column(many, max_bins=255)
+    assert codes.max() < 255 and len(thresholds) == codes.max()
+    print("✅ Бинирование числовых признаков и пропуски")
+
+
+def test_class_histograms_and_approximate_thresholds():
+    from core.split_search import class_histograms
+
+    rng = np.random.default_rng(3)
+    codes = rng.integers(0, 6, (500, 3)).astype(np.uint8)
+    codes[::7, 1] = 255
+    y = rng.integers(0, 2, 500)
+    hist, missing = class_histograms(codes, np.array([6, 6, 4]), y, missing_code=255)
+    for j in range(3):
+        for cls in (0, 1):
+            column = codes[y == cls, j]
+            assert hist[j, :, cls].tolist() == [int((column == k).sum()) for k in range(6)]
+            assert missing[j, cls] == (column == 255).sum()
+    signed = np.where(codes == 255, -1, codes).astype(np.int32)
+    assert all(np.array_equal(a, b) for a, b in zip(class_histograms(signed, np.array([6, 6, 4]), y), (hist, missing)))
+
+    # Больше MAX_BINS уникальных значений — порог ищется по квантильным бинам и помечается приближённым
+    df = pd.DataFrame({"x": rng.normal(size=3000), "c": rng.integers(0, 5, 3000)})
+    df["target"] = (df["x"] > 0.3).astype(int)
+    result = primary_feature_finder(df, "target")
+    assert result["details"]["best_feature"] == "x"
+    assert result["details"]["approximate_threshold"] is True
+    assert "приближённый" in result["summary"]
+    assert result["details"]["runner_ups"][0]["approximate_threshold"] is False
+    print("✅ Гистограммы классов по uint8-кодам; приближённый порог помечается")
+
+
+def test_primary_feature_finder_runner_ups(numeric_df):
+    df = numeric_df.copy()
+    df.loc[::10, "a"] = np.nan
+    result = primary_feature_finder(df, "target", top_n=2)
+    assert result["status"] == "success"
+    d = result["details"]
+    assert d["best_feature"] == "a"
+    assert len(d["runner_ups"]) == 2
+    gains = [d["information_gain"]] + [item["information_gain"] for item in d["runner_ups"]]
+    assert gains == sorted(gains, reverse=True)
+    assert d["n_left"] + d["n_right"] == len(df)
+    print("✅ PrimaryFeatureFinder возвращает ранжированный список признаков")
+
+
+def test_binned_matrix_cached_on_disk(numeric_df, tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_cache, "CACHE_DIR", tmp_path)
+    df = numeric_df.copy()
+    df["plan"] = np.random.default_rng(3).choice(["Basic", "Gold", None], len(df))
+    df.attrs["fingerprint"] = "abc123"
+
+    ctx = build_analysis_context(df, "target")
+    binned = get_binned_matrix(ctx)
+    assert binned.codes.dtype == np.uint8
+    assert binned.nbytes == ctx.n_rows * len(ctx.feature_names)  # 1 байт на значение
+    assert binned.codes[:, 3].max() == binned.missing_code  # пропуск категории
+    assert get_binned_matrix(ctx) is binned
+    assert len(list(tmp_path.glob("*.binned.npz"))) == 1
+
+    # Новый контекст того же датасета читает матрицу с диска
+    def _fail(*args, **kwargs):
+        raise AssertionError("матрица должна читаться из кэша")
+
+    monkeypatch.setattr(binning, "build_binned_matrix", _fail)
+    cached = get_binned_matrix(build_analysis_context(df, "target"))
+    np.testing.assert_array_equal(cached.codes, binned.codes)
+    for a, b in zip(cached.thresholds, binned.thresholds):
+        np.testing.assert_array_equal(a, b)
+    print("✅ Бинированная матрица строится один раз и кэшируется на диске")
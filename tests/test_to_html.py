@@ -1,6 +1,7 @@
 # tests/test_to_html.py
 
 import base64
+import re
 import tempfile
 from pathlib import Path
 
@@ -28,3 +29,31 @@ def test_markdown_to_html_with_images(tmp_path: Path):
     # 4. проверяем, что в html встроилось data:image/png;base64
     assert "data:image/png;base64," in html, "Картинка не встроилась в HTML"
     assert "<img" in html and "AltText" in html
+
+
+def test_markdown_to_html_respects_byte_budget(tmp_path: Path):
+    import numpy as np
+    from PIL import Image
+
+    from core.image_policy import ImagePolicy
+
+    # Шумные изображения плохо сжимаются и вместе не влезают в бюджет
+    rng = np.random.default_rng(0)
+    names = []
+    for i in range(3):
+        name = f"noise_{i}.png"
+        Image.fromarray(rng.integers(0, 255, (300, 300, 3), dtype=np.uint8)).save(tmp_path / name)
+        names.append(name)
+    total = sum((tmp_path / name).stat().st_size for name in names)
+    md_content = "\n\n".join(f"![{name}](images/{name})" for name in names)
+
+    policy = ImagePolicy(byte_budget=total // 4)
+    html = markdown_to_html_with_images(md_content, base_images_dir=tmp_path, image_policy=policy)
+    embedded = re.findall(r"data:image/png;base64,([^\"]+)", html)
+    assert len(embedded) == 3
+    assert sum(len(base64.b64decode(item)) for item in embedded) <= policy.byte_budget
+    # Файлы на диске не меняются
+    assert sum((tmp_path / name).stat().st_size for name in names) == total
+
+    html = markdown_to_html_with_images(md_content, base_images_dir=tmp_path, image_policy=ImagePolicy(byte_budget=None))
+    assert sum(len(base64.b64decode(item)) for item in re.findall(r"data:image/png;base64,([^\"]+)", html)) == total
@@ -8,9 +8,9 @@
 2. CorrelationAnalysis (2 теста)
 3. DescriptiveStatsComparator (2 теста)
 4. CategoricalFeatureAnalysis (2 теста)
-5. FullModelFeatureImportance (2 теста)
+5. FullModelFeatureImportance (5 тестов)
 6. OutlierDetector (5 тестов)
-7. InteractionAnalyzer (4 теста)
+7. InteractionAnalyzer (5 тестов)
 8. DistributionVisualizer (4 теста)
 """
 
@@ -218,6 +218,90 @@ def test_full_model_importance_top_k(sample_df):
     print("✅ FullModelFeatureImportance: custom top_k")
 
 
+@pytest.mark.parametrize("backend", ["subsampled_forest", "hist_gradient_boosting"])
+def test_full_model_importance_backends(sample_df, backend):
+    result = full_model_importance(sample_df, target_column="is_premium", backend=backend, sample_size=500)
+    check_tool_output(result, "FullModelFeatureImportance")
+    assert result["status"] == "success", result["error_message"]
+    d = result["details"]
+    assert d["backend"] == backend
+    assert d["sample_size"] == min(500, len(sample_df))
+    assert 0 < d["n_estimators_used"] <= 100
+    assert isinstance(d["converged"], bool)
+    print(f"✅ FullModelFeatureImportance: backend {backend}")
+
+
+def test_boosting_importances_sklearn_internals():
+    # _boosting_importances читает внутренние атрибуты HistGradientBoostingClassifier
+    # (_preprocessor, _predictors, predictor.nodes); тест падает, если обновление
+    # scikit-learn их изменит
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from tools.full_model_importance import _boosting_importances
+
+    rng = np.random.default_rng(0)
+    n = 2000
+    noise = rng.normal(size=n)
+    signal = rng.normal(size=n)
+    category = rng.integers(0, 4, n).astype(float)
+    y = ((signal > 0) ^ (category == 3)).astype(int)
+    X = np.column_stack([noise, signal, category])
+
+    clf = HistGradientBoostingClassifier(
+        max_iter=20, categorical_features=[False, False, True], random_state=0
+    ).fit(X, y)
+    assert hasattr(clf, "_predictors") and hasattr(clf, "_preprocessor")
+    assert {"feature_idx", "gain", "is_leaf"} <= set(clf._predictors[0][0].nodes.dtype.names)
+
+    importances = _boosting_importances(clf, X.shape[1])
+    assert importances.sum() == pytest.approx(1.0)
+    # Категориальный признак переставлен бустингом вперёд — номера должны быть восстановлены
+    assert importances[0] < importances[1] and importances[0] < importances[2]
+    print("✅ Важности бустинга по внутренним атрибутам scikit-learn")
+
+
+def test_full_model_importance_unknown_backend(sample_df):
+    result = full_model_importance(sample_df, target_column="is_premium", backend="xgboost")
+    assert result["status"] == "error"
+    assert "Unknown backend" in result["error_message"]
+    print("✅ FullModelFeatureImportance: unknown backend")
+
+
+def test_full_model_importance_permutation_cached(sample_df, tmp_path, monkeypatch):
+    from core import dataset_cache
+
+    monkeypatch.setattr(dataset_cache, "CACHE_DIR", tmp_path)
+    df = sample_df.copy()
+    df.attrs["fingerprint"] = "perm123"
+    result = full_model_importance(df, target_column="is_premium", importance_type="permutation", n_repeats=2, n_jobs=1)
+    assert result["status"] == "success", result["error_message"]
+    perm = result["details"]["permutation"]
+    assert perm["cached"] is False
+    assert perm["holdout_size"] == 100
+    assert 0.5 <= perm["baseline_roc_auc"] <= 1.0
+    assert set(perm["importances_std"]) == set(result["details"]["feature_importances"])
+    assert len(list(tmp_path.glob("*.importance.json"))) == 1
+
+    # Инструмент Analyst вызывается без аргументов — вид важностей берётся из настройки
+    from agents.tools_wrapper import FullModelFeatureImportanceTool, set_current_data
+
+    monkeypatch.setattr("tools.full_model_importance.DEFAULT_IMPORTANCE_TYPE", "permutation")
+    set_current_data(df, "is_premium")
+    via_tool = FullModelFeatureImportanceTool().run("")
+    assert via_tool["status"] == "success", via_tool["error_message"]
+    assert via_tool["details"]["importance_type"] == "permutation"
+
+    # Повторный запуск того же датасета берёт результат с диска без перемешиваний
+    def _fail(*args, **kwargs):
+        raise AssertionError("результат должен читаться из кэша")
+
+    monkeypatch.setattr("tools.full_model_importance.permutation_importance", _fail)
+    again = full_model_importance(df, target_column="is_premium", importance_type="permutation", n_repeats=2, n_jobs=1)
+    assert again["status"] == "success", again["error_message"]
+    assert again["details"]["permutation"]["cached"] is True
+    assert again["details"]["feature_importances"] == result["details"]["feature_importances"]
+    print("✅ FullModelFeatureImportance: permutation importance с кэшем")
+
+
 # --------------------------
 # Тесты: OutlierDetector
 # --------------------------
@@ -284,6 +368,28 @@ def test_interaction_analyzer_success(sample_df):
     print("✅ InteractionAnalyzer: success")
 
 
+def test_interaction_analyzer_pairwise():
+    rng = np.random.default_rng(0)
+    n = 4000
+    df = pd.DataFrame({f"x{i}": rng.normal(size=n) for i in range(12)})
+    df["plan"] = rng.choice(["Basic", "Gold", "Platinum"], n)
+    # Таргет зависит только от произведения знаков x3 и x7 (XOR), не от каждого по отдельности
+    logit = 2.0 * np.sign(df["x3"]) * np.sign(df["x7"])
+    df["target"] = (rng.random(n) < 1 / (1 + np.exp(-logit))).astype(int)
+
+    result = interaction_analyzer(df, target_column="target", max_candidates=5)
+    check_tool_output(result, "InteractionAnalyzer")
+    assert result["status"] == "success", result["error_message"]
+    d = result["details"]
+    screening = d["pair_screening"]
+    assert screening["n_pairs_evaluated"] == 13 * 12 // 2
+    assert screening["n_pairs_tested"] == 5
+    assert screening["n_pairs_pruned"] == screening["n_pairs_evaluated"] - 5
+    assert d["pairwise_interactions"][0]["features"] == ["x3", "x7"]
+    assert d["pairwise_interactions"][0]["p_value_adjusted"] < 1e-6
+    print("✅ InteractionAnalyzer: парные взаимодействия")
+
+
 def test_interaction_analyzer_target_not_found(sample_df):
     result = interaction_analyzer(sample_df, target_column="nonexistent")
     assert result["status"] == "error"
@@ -0,0 +1,227 @@
+# tests/test_vectorized_stats.py
+"""
+Тесты для векторизованных статистик (core/vectorized_stats.py).
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2_contingency, pointbiserialr
+
+from core.analysis_context import build_analysis_context
+from core.cardinality import OTHER_LEVEL, approx_distinct, fold_rare_levels
+from core.vectorized_stats import (
+    GROUP_STATS,
+    chi2_tables,
+    column_block_size,
+    contingency_frame,
+    contingency_tables,
+    grouped_stats_block,
+    outlier_masks,
+    point_biserial_block,
+    relative_differences,
+    unpack_mask,
+)
+from tools.categorical_feature_analysis import categorical_feature_analysis
+from tools.correlation_analysis import correlation_analysis
+from tools.interaction_analyzer import interaction_analyzer
+
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(0)
+    n = 500
+    y = rng.integers(0, 2, n)
+    X = rng.normal(size=(n, 5))
+    X[:, 1] += 0.5 * y
+    X[::5, 2] = np.nan          # пропуски
+    X[:, 3] = 7.0               # константа
+    X[:, 4] = rng.integers(0, 3, n)
+    return X, y
+
+
+def test_point_biserial_matches_scipy(matrix):
+    X, y = matrix
+    result = point_biserial_block(X, y, block_size=2)
+
+    for j in [0, 1, 2, 4]:
+        observed = ~np.isnan(X[:, j])
+        ref = pointbiserialr(y[observed], X[observed, j])
+        assert result["correlation"][j] == pytest.approx(ref.statistic, abs=1e-12)
+        assert result["p_value"][j] == pytest.approx(ref.pvalue, rel=1e-9)
+        assert result["n"][j] == observed.sum()
+        assert result["std_1"][j] == pytest.approx(np.std(X[observed & (y == 1), j], ddof=1))
+
+    assert np.isnan(result["correlation"][3])
+    assert np.isnan(result["p_value"][3])
+    print("✅ Векторизованная point-biserial совпадает со scipy")
+
+
+def test_correlation_tools_share_cached_result():
+    np.random.seed(1)
+    n = 300
+    df = pd.DataFrame({f"x{i}": np.random.randn(n) for i in range(12)})
+    df["target"] = np.random.choice([0, 1], n)
+    df.loc[::4, "x0"] = np.nan
+
+    ctx = build_analysis_context(df, "target")
+    corr = correlation_analysis(df, "target", context=ctx)
+    assert corr["status"] == "success"
+    assert "point_biserial" in ctx.cache
+    # Столбец с пропусками тоже оценивается (попарно полные наблюдения)
+    assert "x0" in corr["details"]["p_values"]
+
+    inter = interaction_analyzer(df, "target", top_k=20, context=ctx)
+    numeric = {item["feature"]: item["correlation"] for item in inter["details"]["interactions"]}
+    assert len(numeric) == 12  # все числовые признаки, без ограничения первыми 10
+    for name, value in numeric.items():
+        assert value == pytest.approx(dict(corr["details"]["all_correlations_sorted"])[name])
+    print("✅ CorrelationAnalysis и InteractionAnalyzer используют общий расчёт")
+
+
+def test_grouped_stats_match_pandas(matrix):
+    X, y = matrix
+    X = X.copy()
+    X[y == 1, 4] = np.nan  # группа 1 без наблюдений
+    stats_0, stats_1 = grouped_stats_block(X, y, block_size=2)
+
+    frame = pd.DataFrame(X)
+    frame["target"] = y
+    expected = frame.groupby("target").agg(list(GROUP_STATS))
+    for label, stats_g in [(0, stats_0), (1, stats_1)]:
+        reference = expected.loc[label].to_numpy().reshape(X.shape[1], len(GROUP_STATS))
+        np.testing.assert_allclose(stats_g, reference, rtol=1e-10, equal_nan=True)
+    print("✅ Групповые статистики совпадают с pandas groupby")
+
+
+def test_relative_differences_top_k():
+    stats_0 = np.array([[1.0, 0.0], [10.0, 5.0], [np.nan, 2.0]])
+    stats_1 = np.array([[2.0, 0.0], [11.0, 1.0], [3.0, 2.0]])
+    diff = relative_differences(stats_0, stats_1, threshold_ratio=0.05, top_k=2)
+
+    assert diff["n_significant"] == 3
+    assert list(zip(diff["feature_index"], diff["stat_index"])) == [(1, 1), (0, 0)]
+    assert diff["relative_difference"][0] == pytest.approx(0.8)
+    print("✅ Фильтр и топ-k различий считаются массивно")
+
+
+def test_chi2_tables_match_scipy():
+    rng = np.random.default_rng(0)
+    n = 1000
+    y = rng.integers(0, 2, n)
+    codes = np.stack([
+        rng.integers(-1, 2, n),                          # 2 уровня + пропуски (dof = 1, Йейтс)
+        rng.integers(0, 5, n),
+        np.where(y == 1, 0, rng.integers(0, 3, n)),      # сильная связь
+        np.zeros(n, dtype=int),                          # один уровень
+    ], axis=1).astype(np.int32)
+
+    tables = contingency_tables(codes, [2, 5, 3, 1], y, 2, block_size=3)
+    result = chi2_tables(tables)
+
+    for j in range(3):
+        observed = codes[:, j] >= 0
+        cross_tab = pd.crosstab(codes[observed, j], y[observed])
+        np.testing.assert_array_equal(tables[j], cross_tab.to_numpy())
+        chi2, p, dof, _ = chi2_contingency(cross_tab)
+        assert result["chi2"][j] == pytest.approx(chi2)
+        assert result["p_value"][j] == pytest.approx(p, rel=1e-9)
+        assert result["dof"][j] == dof
+    assert result["dof"][3] == 0 and np.isnan(result["p_value"][3])
+    print("✅ Пакетный хи-квадрат совпадает со scipy")
+
+
+def test_block_size_follows_memory_budget(matrix, monkeypatch):
+    import core.vectorized_stats as vectorized_stats
+
+    # 256 МБ / (8 байт × 1 млн строк) = 33 столбца на блок; мелкие таблицы — не больше 256
+    assert column_block_size(1_000_000) == 33
+    assert column_block_size(100) == 256
+    assert column_block_size(10**9) == 1
+    assert column_block_size(10**9, block_size=4) == 4
+
+    X, y = matrix
+    expected = point_biserial_block(X, y)
+    monkeypatch.setattr(vectorized_stats, "BLOCK_MEMORY_BYTES", 8 * len(X) * 2)
+    assert column_block_size(len(X)) == 2
+    result = point_biserial_block(X, y)
+    np.testing.assert_allclose(result["correlation"], expected["correlation"], rtol=1e-12)
+    print("✅ Размер блока столбцов выводится из бюджета памяти")
+
+
+def test_contingency_cached_for_tools():
+    np.random.seed(2)
+    n = 400
+    df = pd.DataFrame({
+        "plan": np.random.choice(["Basic", "Gold", "Premium"], n),
+        "region": np.random.choice(["North", "South"], n),
+        "target": np.random.choice(["Yes", "No"], n),
+    })
+    ctx = build_analysis_context(df, "target")
+    result = categorical_feature_analysis(df, "target", p_value_threshold=1.0, context=ctx)
+    assert result["status"] == "success"
+    assert "contingency" in ctx.cache
+
+    frame = contingency_frame(ctx, "plan", normalize=True)
+    expected = pd.crosstab(df["plan"], df["target"], normalize="index")
+    np.testing.assert_allclose(frame.to_numpy(), expected.to_numpy())
+    assert list(frame.index) == list(expected.index)
+    assert list(frame.columns) == list(expected.columns)
+    print("✅ Таблицы сопряжённости кэшируются для визуализатора")
+
+
+def test_approx_distinct_and_folding():
+    values = pd.Series([f"id{i}" for i in range(20000)] * 2 + [None])
+    assert approx_distinct(values) == pytest.approx(20000, rel=0.03)
+    assert approx_distinct(pd.Series(["a", "b", "a"])) == pytest.approx(2, abs=0.01)
+
+    codes, levels = pd.factorize(pd.Series(list("aaabbbbccd") + [None]), sort=True)
+    new_codes, new_levels, n_folded = fold_rare_levels(codes, np.asarray(levels, dtype=object), 2)
+    assert list(new_levels) == ["a", "b", OTHER_LEVEL]
+    assert new_codes.tolist() == [0, 0, 0, 1, 1, 1, 1, 2, 2, 2, -1]
+    assert n_folded == 2
+    print("✅ HyperLogLog и свёртка редких уровней")
+
+
+def test_outlier_masks_match_pandas(matrix):
+    X, y = matrix
+    result = outlier_masks(X, "iqr", 1.5, groups=y, block_size=2)
+
+    for j in range(X.shape[1]):
+        col = pd.Series(X[:, j])
+        q1, q3 = col.quantile(0.25), col.quantile(0.75)
+        expected = ((col < q1 - 1.5 * (q3 - q1)) | (col > q3 + 1.5 * (q3 - q1))).to_numpy()
+        mask = unpack_mask(result["bits"], j, len(y))
+        np.testing.assert_array_equal(mask, expected)
+        assert result["count"][j] == expected.sum()
+        assert result["count_1"][j] == (expected & (y == 1)).sum()
+
+    assert result["bits"].shape == ((len(y) + 7) // 8, X.shape[1])
+    zscore = outlier_masks(X, "zscore", 2.0)
+    assert zscore["count"][3] == 0  # константа — выбросов нет
+    with pytest.raises(ValueError):
+        outlier_masks(X, "unknown")
+    print("✅ Маски выбросов совпадают с поколоночным расчётом pandas")
+
+
+def test_pair_screening_parallel_matches_serial(monkeypatch):
+    import core.interaction_screening as screening
+
+    rng = np.random.default_rng(5)
+    codes = rng.integers(0, 9, size=(3000, 10)).astype(np.uint8)
+    y = (codes[:, 1] % 2 == codes[:, 4] % 2).astype(np.int8)
+    first, second, serial, n_jobs = screening.screen_pairs(codes, y, n_jobs=1)
+    assert n_jobs == 1 and len(serial) == 45
+
+    monkeypatch.setattr(screening, "PARALLEL_MIN_PAIRS", 0)
+    _, _, parallel, n_jobs = screening.screen_pairs(codes, y, n_jobs=2)
+    assert n_jobs == 2
+    np.testing.assert_allclose(serial, parallel)
+    best = np.argmax(serial)
+    assert (first[best], second[best]) == (1, 4)
+    print("✅ Отбор пар: пул процессов совпадает с последовательным расчётом")
@@ -1,12 +1,19 @@
 # tools/categorical_feature_analysis.py
+import numpy as np
 import pandas as pd
-from typing import Any, Dict, List
-from scipy.stats import chi2_contingency
-from sklearn.preprocessing import LabelEncoder
+from typing import Any, Dict, Optional
+
+from core.analysis_context import AnalysisContext, get_analysis_context
+from core.vectorized_stats import context_contingency
 
 
 def categorical_feature_analysis(
-    df: pd.DataFrame, target_column: str, p_value_threshold: float = 0.05, top_k: int = 15, **kwargs
+    df: pd.DataFrame,
+    target_column: str,
+    p_value_threshold: float = 0.05,
+    top_k: int = 15,
+    context: Optional[AnalysisContext] = None,
+    **kwargs
 ) -> Dict[str, Any]:
     """
     Проверяет связь категориальных признаков с целевой переменной через тест Хи-квадрат.
@@ -16,6 +23,7 @@ def categorical_feature_analysis(
         target_column: Имя бинарной целевой переменной.
         p_value_threshold: Порог p-value для значимости (по умолчанию 0.05).
         top_k: Количество топ признаков для возврата.
+        context: Общий контекст анализа. Если не передан, строится по df.
         **kwargs: Дополнительные параметры.
 
     Returns:
@@ -32,16 +40,9 @@ def categorical_feature_analysis(
                 "error_message": f"target_column '{target_column}' not found",
             }
 
-        y = df[target_column]
-        X = df.drop(columns=[target_column])
-
-        if y.dtype.kind not in "biufc":
-            y = LabelEncoder().fit_transform(y.astype(str))
-        else:
-            y = y.astype(int).values
+        ctx = get_analysis_context(df, target_column, context)
 
-        X_cat = X.select_dtypes(include=["object", "category"]).copy()
-        if X_cat.empty:
+        if not ctx.categorical_names or ctx.n_rows == 0:
             return {
                 "tool_name": tool_name,
                 "status": "error",
@@ -50,21 +51,15 @@ def categorical_feature_analysis(
                 "error_message": "No categorical features",
             }
 
+        # Таблицы сопряжённости и хи-квадрат для всех признаков сразу
+        tests = context_contingency(ctx)
         significant = {}
-        for col in X_cat.columns:
-            cross_tab = pd.crosstab(X_cat[col], y)
-            if cross_tab.shape[0] < 2 or cross_tab.shape[1] < 2:
-                continue
-            try:
-                chi2, p, dof, _ = chi2_contingency(cross_tab)
-                if p < p_value_threshold:
-                    significant[col] = {
-                        "p_value": float(p),
-                        "chi2": float(chi2),
-                        "dof": int(dof),
-                    }
-            except Exception:
-                continue
+        for j in np.flatnonzero((tests["dof"] > 0) & (tests["p_value"] < p_value_threshold)):
+            significant[ctx.categorical_names[j]] = {
+                "p_value": float(tests["p_value"][j]),
+                "chi2": float(tests["chi2"][j]),
+                "dof": int(tests["dof"][j]),
+            }
 
         # Сортировка по p-value
         sorted_significant = dict(sorted(significant.items(), key=lambda item: item[1]['p_value']))
@@ -84,6 +79,9 @@ def categorical_feature_analysis(
                 "p_value_threshold": p_value_threshold,
                 "significant_features": top_significant, # Возвращаем отсортированный список
                 "n_significant": len(significant),
+                # Столбцы-идентификаторы не тестируются, у высококардинальных — редкие уровни свёрнуты
+                "skipped_columns": ctx.cardinality_report.get("skipped_columns", {}),
+                "folded_columns": ctx.cardinality_report.get("folded_columns", {}),
             },
             "error_message": None,
         }
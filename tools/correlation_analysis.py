@@ -1,13 +1,18 @@
 # tools/correlation_analysis.py
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, List
-from scipy.stats import pointbiserialr
-from sklearn.preprocessing import LabelEncoder
+from typing import Dict, Any, Optional
+
+from core.analysis_context import AnalysisContext, get_analysis_context
+from core.vectorized_stats import context_point_biserial
 
 
 def correlation_analysis(
-    df: pd.DataFrame, target_column: str, top_k: int = 5, **kwargs
+    df: pd.DataFrame,
+    target_column: str,
+    top_k: int = 5,
+    context: Optional[AnalysisContext] = None,
+    **kwargs
 ) -> Dict[str, Any]:
     """
     Считает point-biserial корреляции между числовыми признаками и бинарной целью.
@@ -16,6 +21,7 @@ def correlation_analysis(
         df: Входной DataFrame.
         target_column: Имя бинарной целевой переменной.
         top_k: Количество топ признаков для возврата.
+        context: Общий контекст анализа. Если не передан, строится по df.
         **kwargs: Дополнительные параметры (не используются).
 
     Returns:
@@ -32,16 +38,9 @@ def correlation_analysis(
                 "error_message": f"target_column '{target_column}' not found",
             }
 
-        X = df.drop(columns=[target_column])
-        y = df[target_column]
-
-        # Кодируем целевую
-        if y.dtype.kind not in "biufc":
-            y = LabelEncoder().fit_transform(y.astype(str))
-        else:
-            y = y.astype(int).values
+        ctx = get_analysis_context(df, target_column, context)
 
-        if len(np.unique(y)) != 2:
+        if not ctx.is_binary:
             return {
                 "tool_name": tool_name,
                 "status": "error",
@@ -50,8 +49,7 @@ def correlation_analysis(
                 "error_message": "Target must be binary",
             }
 
-        X_num = X.select_dtypes(include=["number"]).copy()
-        if X_num.empty:
+        if not ctx.numeric_names or ctx.n_rows == 0:
             return {
                 "tool_name": tool_name,
                 "status": "error",
@@ -60,16 +58,13 @@ def correlation_analysis(
                 "error_message": "No numeric features",
             }
 
-        correlations = {}
-        for col in X_num.columns:
-            if X_num[col].nunique() <= 1:
-                continue
-            try:
-                corr, _ = pointbiserialr(y[: len(X_num[col])], X_num[col])
-                if not np.isnan(corr):
-                    correlations[col] = corr
-            except Exception:
-                continue
+        # Корреляции и p-value для всех столбцов сразу (пропуски — попарно)
+        stats = context_point_biserial(ctx)
+        valid = np.flatnonzero(~np.isnan(stats["correlation"]))
+        correlations = {
+            ctx.numeric_names[j]: float(stats["correlation"][j]) for j in valid
+        }
+        p_values = {ctx.numeric_names[j]: float(stats["p_value"][j]) for j in valid}
 
         if not correlations:
             return {
@@ -104,6 +99,7 @@ def correlation_analysis(
                 "top_positive": top_pos, # Словарь
                 "top_negative": top_neg, # Словарь
                 "all_correlations_sorted": sorted_items, # Полный список для отчета
+                "p_values": p_values,
                 "n_features_analyzed": len(correlations),
             },
             "error_message": None,
@@ -1,11 +1,19 @@
 # tools/descriptive_stats_comparator.py
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List
-from sklearn.preprocessing import LabelEncoder
+from typing import Dict, Any, List, Optional
+
+from core.analysis_context import AnalysisContext, get_analysis_context
+from core.vectorized_stats import GROUP_STATS, grouped_stats_block, relative_differences
 
 
 def descriptive_stats_comparator(
-    df: pd.DataFrame, target_column: str, threshold_ratio: float = 0.2, top_k: int = 10, **kwargs
+    df: pd.DataFrame,
+    target_column: str,
+    threshold_ratio: float = 0.2,
+    top_k: int = 10,
+    context: Optional[AnalysisContext] = None,
+    **kwargs
 ) -> Dict[str, Any]:
     """
     Сравнивает mean, median, std, min, max по группам (0 и 1).
@@ -15,6 +23,7 @@ def descriptive_stats_comparator(
         target_column: Имя бинарной целевой переменной.
         threshold_ratio: Порог относительного различия (по умолчанию 0.2).
         top_k: Количество топ различий для возврата.
+        context: Общий контекст анализа. Если не передан, строится по df.
         **kwargs: Дополнительные параметры.
 
     Returns:
@@ -31,16 +40,9 @@ def descriptive_stats_comparator(
                 "error_message": f"target_column '{target_column}' not found",
             }
 
-        X = df.drop(columns=[target_column])
-        y = df[target_column]
-
-        if y.dtype.kind not in "biufc":
-            y = LabelEncoder().fit_transform(y.astype(str))
-        else:
-            y = y.astype(int).values
+        ctx = get_analysis_context(df, target_column, context)
 
-        X_num = X.select_dtypes(include=["number"]).copy()
-        if X_num.empty:
+        if not ctx.numeric_names or ctx.n_rows == 0:
             return {
                 "tool_name": tool_name,
                 "status": "error",
@@ -49,14 +51,8 @@ def descriptive_stats_comparator(
                 "error_message": "No numeric features",
             }
 
-        X_num[target_column] = y
-        grouped = X_num.groupby(target_column).agg(["mean", "median", "std", "min", "max"])
-        grouped.columns = ["_".join(col) for col in grouped.columns]
-
-        try:
-            stats_0 = grouped.loc[0]
-            stats_1 = grouped.loc[1]
-        except KeyError:
+        group_sizes = [int(np.count_nonzero(ctx.y == label)) for label in (0, 1)]
+        if min(group_sizes) == 0:
             return {
                 "tool_name": tool_name,
                 "status": "error",
@@ -65,25 +61,22 @@ def descriptive_stats_comparator(
                 "error_message": "Target not binary",
             }
 
-        diffs: List[Dict[str, Any]] = []
-        for col in X_num.columns[:-1]:
-            for stat in ["mean", "median", "std", "min", "max"]:
-                val_0 = stats_0[f"{col}_{stat}"]
-                val_1 = stats_1[f"{col}_{stat}"]
-                if val_0 == 0 and val_1 == 0:
-                    continue
-                rel_diff = abs(val_1 - val_0) / (max(abs(val_0), abs(val_1)) + 1e-8)
-                if rel_diff > threshold_ratio:
-                    diffs.append({
-                        "feature_stat": f"{col}_{stat}",
-                        "group_0": float(val_0),
-                        "group_1": float(val_1),
-                        "relative_difference": float(rel_diff),
-                    })
+        # Все пять статистик для обеих групп — одним проходом по числовому блоку
+        stats_0, stats_1 = ctx.cached("grouped_stats", lambda: grouped_stats_block(ctx.numeric, ctx.y))
 
-        # Сортировка по относительной разнице
-        diffs.sort(key=lambda x: x['relative_difference'], reverse=True)
-        top_diffs = diffs[:top_k]
+        diff = relative_differences(stats_0, stats_1, threshold_ratio, top_k)
+        top_diffs: List[Dict[str, Any]] = [
+            {
+                "feature_stat": f"{ctx.numeric_names[f]}_{GROUP_STATS[s]}",
+                "group_0": float(v0),
+                "group_1": float(v1),
+                "relative_difference": float(rel),
+            }
+            for f, s, v0, v1, rel in zip(
+                diff["feature_index"], diff["stat_index"],
+                diff["group_0"], diff["group_1"], diff["relative_difference"],
+            )
+        ]
 
         if not top_diffs:
             summary = f"Нет значимых различий > {threshold_ratio*100:.0f}%"
@@ -99,7 +92,7 @@ def descriptive_stats_comparator(
             "details": {
                 "threshold_ratio": threshold_ratio,
                 "significant_differences": top_diffs, # Возвращаем список словарей, отсортированный
-                "n_features_with_diff": len(diffs),
+                "n_features_with_diff": int(diff["n_significant"]),
             },
             "error_message": None,
         }
@@ -2,17 +2,25 @@
 # Анализ распределений ключевых признаков между группами.
 
 import pandas as pd
-import numpy as np
-from typing import Dict, Any
-from sklearn.preprocessing import LabelEncoder
-import matplotlib.pyplot as plt
-import seaborn as sns
+from typing import Dict, Any, Optional
 import os
 from pathlib import Path
 
+from core.analysis_context import AnalysisContext, get_analysis_context
+from core.image_policy import ImagePolicy, get_image_policy
+from core.plotting import PlotRegistry, PlotSpec, render_plots
+
 
 def distribution_visualizer(
-    df: pd.DataFrame, target_column: str, top_k: int = 3, output_dir: str = "report/output/images", **kwargs
+    df: pd.DataFrame,
+    target_column: str,
+    top_k: int = 3,
+    output_dir: str = "report/output/images",
+    n_jobs: Optional[int] = None,
+    plot_registry: Optional[PlotRegistry] = None,
+    context: Optional[AnalysisContext] = None,
+    image_policy: Optional[ImagePolicy] = None,
+    **kwargs
 ) -> Dict[str, Any]:
     """
     Создаёт визуализации распределений для топ признаков и сохраняет их как файлы.
@@ -22,6 +30,11 @@ def distribution_visualizer(
         target_column: Имя бинарной целевой переменной.
         top_k: Количество топ признаков для визуализации.
         output_dir: Директория для сохранения изображений.
+        n_jobs: Число процессов для отрисовки (None — по числу ядер).
+        plot_registry: Реестр отложенной отрисовки. Если передан, графики
+            только регистрируются и рисуются, когда на них сошлётся отчёт.
+        context: Общий контекст анализа. Если не передан, строится по df.
+        image_policy: Формат и DPI изображений (None — текущая политика).
         **kwargs: Дополнительные параметры.
 
     Returns:
@@ -42,8 +55,9 @@ def distribution_visualizer(
         Path(output_dir).mkdir(parents=True, exist_ok=True)
 
         # Получаем числовые признаки
-        X_num = df.select_dtypes(include=["number"]).drop(columns=[target_column], errors='ignore')
-        
+        ctx = get_analysis_context(df, target_column, context)
+        X_num = pd.DataFrame(ctx.numeric, columns=ctx.numeric_names, copy=False)
+
         if X_num.empty:
             return {
                 "tool_name": tool_name,
@@ -57,35 +71,34 @@ def distribution_visualizer(
         variance_scores = X_num.var().sort_values(ascending=False)
         top_features = variance_scores.head(top_k).index.tolist()
 
-        saved_images = {}
+        policy = image_policy or get_image_policy()
+        specs = []
         for feature in top_features:
-            plt.figure(figsize=(10, 6))
-            
-            # Создаём boxplot для сравнения распределений
-            try:
-                sns.boxplot(data=df, x=target_column, y=feature)
-                plt.title(f'Распределение {feature} по группам')
-                plt.xlabel('Группа (0 - Отток, 1 - Удержание)')
-                plt.ylabel(feature)
-                
-                # Формируем имя файла
-                safe_feature_name = "".join(c for c in feature if c.isalnum() or c in (' ', '_')).rstrip()
-                filename = f"{safe_feature_name}.png"
-                filepath = os.path.join(output_dir, filename)
-                
-                # Сохраняем изображение
-                plt.savefig(filepath, format='png', bbox_inches='tight', dpi=150)
-                plt.close()
-                
-                saved_images[feature] = {
-                    "file_path": filepath,
-                    "relative_path": f"images/{filename}", # Путь относительно report/output
-                    "description": f"Boxplot распределения {feature} для групп 0 и 1"
-                }
-            except Exception as e:
-                plt.close() # Убедиться, что фигура закрыта в случае ошибки
-                # Просто пропускаем признак, если не удалось построить график
+            # Формируем имя файла
+            safe_feature_name = "".join(c for c in feature if c.isalnum() or c in (' ', '_')).rstrip()
+            filename = f"{safe_feature_name}{policy.extension}"
+            specs.append(PlotSpec(
+                "boxplot", os.path.join(output_dir, filename), feature,
+                title=f'Распределение {feature} по группам',
+                xlabel='Группа (0 - Отток, 1 - Удержание)', figsize=(10, 6),
+            ))
+
+        # Boxplot'ы для сравнения распределений рисуются пакетом в пуле процессов
+        # (или откладываются до ссылки из отчёта)
+        if plot_registry is not None:
+            filepaths = [plot_registry.register(spec) for spec in specs]
+        else:
+            filepaths = render_plots(specs, df, target_column, n_jobs=n_jobs, dpi=policy.dpi)
+        saved_images = {}
+        for spec, filepath in zip(specs, filepaths):
+            # Признаки, для которых не удалось построить график, пропускаются
+            if filepath is None:
                 continue
+            saved_images[spec.feature] = {
+                "file_path": filepath,
+                "relative_path": f"images/{os.path.basename(filepath)}", # Путь относительно report/output
+                "description": f"Boxplot распределения {spec.feature} для групп 0 и 1"
+            }
 
         if not saved_images:
             summary = "Не удалось создать визуализации"
@@ -1,21 +1,199 @@
 # tools/full_model_importance.py
+import os
+
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
+from typing import Dict, Any, Optional, Tuple
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+
+from core.analysis_context import AnalysisContext, get_analysis_context
+from core.binning import BinnedMatrix, get_binned_matrix
+from core.dataset_cache import make_cache_key
+from core.permutation_importance import (
+    load_cached_importance,
+    permutation_importance,
+    save_cached_importance,
+    split_holdout,
+)
+
+BACKENDS = ("auto", "random_forest", "subsampled_forest", "hist_gradient_boosting")
+IMPORTANCE_TYPES = ("impurity", "permutation")
+# Вид важностей в анализе (инструмент Analyst/планировщиков вызывается без аргументов)
+DEFAULT_IMPORTANCE_TYPE = os.getenv("INSIGHTFINDER_IMPORTANCE_TYPE", "impurity")
+# Выше этого числа строк backend="auto" выбирает лес на подвыборках строк
+AUTO_SUBSAMPLE_ROWS = 200_000
+# Размер подвыборки строк по умолчанию
+DEFAULT_SAMPLE_SIZE = 100_000
+# Деревья (итерации бустинга) добавляются партиями; максимум — n_estimators
+TREE_BATCH_SIZE = 20
+# Сколько партий подряд топ-k не должен меняться для остановки
+STABLE_BATCHES = 2
+
+
+def _top_ranking(importances: np.ndarray, top_k: int) -> Tuple[int, ...]:
+    return tuple(np.argsort(-importances, kind="stable")[:top_k].tolist())
+
+
+def _fit_forest(
+    X: np.ndarray, y: np.ndarray, top_k: int, n_estimators: int, max_samples: Optional[float]
+) -> Tuple[RandomForestClassifier, Dict[str, Any]]:
+    """
+    Обучает лес партиями деревьев (warm_start) до стабилизации топ-k важностей.
+
+    max_samples — доля строк, которую видит каждое дерево (None — все строки).
+    """
+    clf = RandomForestClassifier(
+        n_estimators=0, warm_start=True, max_samples=max_samples, random_state=42, n_jobs=-1
+    )
+    previous, stable, n_batches = None, 0, 0
+    while clf.n_estimators < n_estimators:
+        clf.n_estimators = min(clf.n_estimators + TREE_BATCH_SIZE, n_estimators)
+        clf.fit(X, y)
+        n_batches += 1
+        ranking = _top_ranking(clf.feature_importances_, top_k)
+        stable = stable + 1 if ranking == previous else 0
+        previous = ranking
+        if stable >= STABLE_BATCHES:
+            break
+    return clf, {
+        "n_estimators_used": int(clf.n_estimators),
+        "n_batches": n_batches,
+        "converged": stable >= STABLE_BATCHES,
+    }
+
+
+def _boosting_importances(clf: HistGradientBoostingClassifier, n_features: int) -> np.ndarray:
+    """Важности по сумме выигрышей разбиений всех деревьев бустинга (нормированные)."""
+    # С категориальными признаками бустинг переставляет столбцы (сначала
+    # категориальные) — восстанавливаем исходные номера признаков
+    original_index = np.arange(n_features)
+    preprocessor = getattr(clf, "_preprocessor", None)
+    if preprocessor is not None:
+        original_index = np.concatenate([
+            np.flatnonzero(columns) if np.asarray(columns).dtype == bool else np.asarray(columns)
+            for name, _, columns in preprocessor.transformers_
+            if name != "remainder"
+        ])
+
+    gains = np.zeros(n_features)
+    for predictors in clf._predictors:
+        for predictor in predictors:
+            nodes = predictor.nodes[~predictor.nodes["is_leaf"].astype(bool)]
+            np.add.at(gains, original_index[nodes["feature_idx"]], nodes["gain"])
+    total = gains.sum()
+    return gains / total if total > 0 else gains
+
+
+def _boosting_input(binned: BinnedMatrix, rows: np.ndarray) -> np.ndarray:
+    """Бинированные коды строк rows как float32, пропуски — NaN (вход бустинга)."""
+    codes = binned.codes[rows]
+    X = codes.astype(np.float32)
+    X[codes == binned.missing_code] = np.nan
+    return X
+
+
+def _fit_boosting(
+    binned: BinnedMatrix, rows: np.ndarray, y: np.ndarray, top_k: int, n_estimators: int
+) -> Tuple[HistGradientBoostingClassifier, np.ndarray, Dict[str, Any]]:
+    """
+    Обучает HistGradientBoostingClassifier партиями итераций до стабилизации топ-k.
+
+    Вход — бинированные коды (не больше 255 уникальных значений на признак),
+    поэтому внутреннее бинирование бустинга тривиально; категориальные
+    признаки передаются как категориальные, пропуски — как NaN.
+    """
+    X = _boosting_input(binned, rows)
+    categorical = binned.is_categorical if binned.is_categorical.any() else None
+    clf = HistGradientBoostingClassifier(
+        max_iter=0, warm_start=True, early_stopping=False,
+        categorical_features=categorical, random_state=42,
+    )
+    previous, stable, n_batches = None, 0, 0
+    importances = np.zeros(X.shape[1])
+    while clf.max_iter < n_estimators:
+        clf.max_iter = min(clf.max_iter + TREE_BATCH_SIZE, n_estimators)
+        clf.fit(X, y)
+        n_batches += 1
+        importances = _boosting_importances(clf, X.shape[1])
+        ranking = _top_ranking(importances, top_k)
+        stable = stable + 1 if ranking == previous else 0
+        previous = ranking
+        if stable >= STABLE_BATCHES:
+            break
+    return clf, importances, {
+        "n_estimators_used": int(clf.n_iter_),
+        "n_batches": n_batches,
+        "converged": stable >= STABLE_BATCHES,
+    }
+
+
+def _train_model(
+    backend: str,
+    binned: BinnedMatrix,
+    rows: np.ndarray,
+    y: np.ndarray,
+    top_k: int,
+    sample_size: int,
+    n_estimators: int,
+) -> Tuple[Any, np.ndarray, Dict[str, Any]]:
+    """
+    Обучает модель выбранного backend на строках rows.
+
+    Returns:
+        Кортеж (модель, impurity-важности, сведения об обучении: model,
+        sample_size, n_estimators_used, n_batches, converged).
+    """
+    n_rows_used = min(sample_size, len(rows)) if backend != "random_forest" else len(rows)
+    if backend == "hist_gradient_boosting":
+        rng = np.random.default_rng(42)
+        sample = np.sort(rng.choice(rows, n_rows_used, replace=False))
+        clf, importances, fit_info = _fit_boosting(binned, sample, y[sample], top_k, n_estimators)
+    else:
+        max_samples = n_rows_used / len(rows) if n_rows_used < len(rows) else None
+        X = binned.codes if len(rows) == len(binned.codes) else binned.codes[rows]
+        clf, fit_info = _fit_forest(X, y[rows], top_k, n_estimators, max_samples)
+        importances = clf.feature_importances_
+    return clf, importances, {"model": type(clf).__name__, "sample_size": n_rows_used, **fit_info}
 
 
 def full_model_importance(
-    df: pd.DataFrame, target_column: str, top_k: int = 10, **kwargs
+    df: pd.DataFrame,
+    target_column: str,
+    top_k: int = 10,
+    backend: str = "auto",
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    n_estimators: int = 100,
+    importance_type: Optional[str] = None,
+    n_repeats: int = 5,
+    n_jobs: Optional[int] = None,
+    context: Optional[AnalysisContext] = None,
+    **kwargs
 ) -> Dict[str, Any]:
     """
-    Обучает RandomForestClassifier и возвращает топ-K важных признаков.
+    Обучает модель по всем признакам и возвращает топ-K важных признаков.
+
+    Деревья добавляются партиями; обучение останавливается, когда топ-K
+    важностей не меняется несколько партий подряд.
 
     Args:
         df: Входной DataFrame.
         target_column: Имя бинарной целевой переменной.
         top_k: Количество топ-признаков для возврата (по умолчанию 10).
+        backend: "random_forest" — лес на всех строках; "subsampled_forest" —
+            каждое дерево видит sample_size строк; "hist_gradient_boosting" —
+            бустинг на подвыборке из sample_size строк; "auto" — лес на всех
+            строках для небольших данных, иначе лес на подвыборках.
+        sample_size: Размер подвыборки строк.
+        n_estimators: Максимум деревьев (итераций бустинга).
+        importance_type: "impurity" — важности модели (по уменьшению
+            неоднородности / выигрышу разбиений); "permutation" — падение
+            ROC AUC на отложенной подвыборке при перемешивании признака
+            (модель обучается без отложенных строк, результат кэшируется по
+            отпечатку датасета и параметрам модели). None — из переменной
+            окружения INSIGHTFINDER_IMPORTANCE_TYPE (по умолчанию "impurity").
+        n_repeats: Число перемешиваний признака (для permutation).
+        n_jobs: Число процессов для permutation (None — по числу ядер).
+        context: Общий контекст анализа. Если не передан, строится по df.
         **kwargs: Дополнительные параметры.
 
     Returns:
@@ -32,62 +210,134 @@ def full_model_importance(
                 "error_message": f"target_column '{target_column}' not found",
             }
 
-        X = df.drop(columns=[target_column])
-        y = df[target_column]
+        ctx = get_analysis_context(df, target_column, context)
 
-        if y.dtype.kind not in "biufc":
-            y = LabelEncoder().fit_transform(y.astype(str))
-        else:
-            y = y.astype(int).values
+        if not ctx.is_binary:
+            return {
+                "tool_name": tool_name,
+                "status": "error",
+                "summary": "",
+                "details": {},
+                "error_message": f"Target column must be binary. Found {len(ctx.classes)} classes: {ctx.classes.tolist()}",
+            }
 
-        if len(np.unique(y)) != 2:
+        if not ctx.feature_names or ctx.n_rows == 0:
             return {
                 "tool_name": tool_name,
                 "status": "error",
                 "summary": "",
                 "details": {},
-                "error_message": f"Target column must be binary. Found {len(np.unique(y))} classes: {np.unique(y).tolist()}",
+                "error_message": "No features after preprocessing",
             }
 
-        X_proc = X.copy()
-        for col in X_proc.columns:
-            if X_proc[col].dtype.kind not in "biufc":
-                X_proc[col] = LabelEncoder().fit_transform(X_proc[col].astype(str))
-            else:
-                X_proc[col] = X_proc[col].fillna(X_proc[col].median())
+        if backend not in BACKENDS:
+            return {
+                "tool_name": tool_name,
+                "status": "error",
+                "summary": "",
+                "details": {},
+                "error_message": f"Unknown backend '{backend}'. Available: {list(BACKENDS)}",
+            }
+        if backend == "auto":
+            backend = "random_forest" if ctx.n_rows <= AUTO_SUBSAMPLE_ROWS else "subsampled_forest"
 
-        if X_proc.empty:
+        importance_type = importance_type or DEFAULT_IMPORTANCE_TYPE
+        if importance_type not in IMPORTANCE_TYPES:
             return {
                 "tool_name": tool_name,
                 "status": "error",
                 "summary": "",
                 "details": {},
-                "error_message": "No features after preprocessing",
+                "error_message": f"Unknown importance_type '{importance_type}'",
             }
 
-        clf = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-        clf.fit(X_proc, y)
+        # Общая бинированная матрица (uint8) вместо float64-копии данных
+        binned = get_binned_matrix(ctx)
+        all_rows = np.arange(ctx.n_rows)
+
+        permutation_info: Optional[Dict[str, Any]] = None
+        if importance_type == "impurity":
+            _, importances, fit_info = _train_model(
+                backend, binned, all_rows, ctx.y, top_k, sample_size, n_estimators
+            )
+        else:
+            params = dict(
+                target_column=target_column, backend=backend, sample_size=sample_size,
+                n_estimators=n_estimators, top_k=top_k, n_repeats=n_repeats,
+            )
+            cache_key = make_cache_key(ctx.fingerprint, stage="permutation_importance", **params) \
+                if ctx.fingerprint is not None else None
+            cached = ctx.cache.get(("permutation_importance", tuple(sorted(params.items()))))
+            if cached is None and cache_key is not None:
+                cached = load_cached_importance(cache_key)
+
+            if cached is not None:
+                importances = np.asarray(cached["importances_mean"])
+                fit_info = cached["fit_info"]
+                permutation_info = {**cached["permutation"], "cached": True}
+            else:
+                split = split_holdout(ctx.n_rows)
+                model, _, fit_info = _train_model(
+                    backend, binned, split["train"], ctx.y, top_k, sample_size, n_estimators
+                )
+                holdout = split["holdout"]
+                X_holdout = _boosting_input(binned, holdout) \
+                    if backend == "hist_gradient_boosting" else binned.codes[holdout]
+                result = permutation_importance(model, X_holdout, ctx.y[holdout], n_repeats=n_repeats, n_jobs=n_jobs)
+                importances = result["importances_mean"]
+                permutation_info = {
+                    "n_repeats": n_repeats,
+                    "holdout_size": int(len(holdout)),
+                    "baseline_roc_auc": result["baseline_score"],
+                    "importances_std": dict(zip(ctx.feature_names, result["importances_std"].tolist())),
+                    "n_jobs": result["n_jobs"],
+                }
+                payload = {
+                    "importances_mean": importances.tolist(),
+                    "fit_info": fit_info,
+                    "permutation": permutation_info,
+                }
+                ctx.cache[("permutation_importance", tuple(sorted(params.items())))] = payload
+                if cache_key is not None:
+                    save_cached_importance(cache_key, payload)
+                permutation_info = {**permutation_info, "cached": False}
+
+        model_name = fit_info["model"]
 
-        importances = clf.feature_importances_
         importance_df = pd.DataFrame(
-            {"feature": X_proc.columns, "importance": importances}
+            {"feature": ctx.feature_names, "importance": importances}
         )
         top_features = importance_df.sort_values("importance", ascending=False).head(top_k)
         feat_dict = top_features.set_index("feature")["importance"].to_dict()
 
-        summary = f"Топ-важный признак по RandomForest — '{next(iter(feat_dict))}'"
+        model_label = "RandomForest" if model_name == "RandomForestClassifier" else "HistGradientBoosting"
+        if importance_type == "permutation":
+            model_label += " (permutation)"
+        summary = f"Топ-важный признак по {model_label} — '{next(iter(feat_dict))}'"
 
-        return {
+        result_dict = {
             "tool_name": tool_name,
             "status": "success",
             "summary": summary,
             "details": {
                 "top_k": top_k,
                 "feature_importances": feat_dict,
-                "model": "RandomForestClassifier",
+                "model": model_name,
+                "backend": backend,
+                "n_rows": ctx.n_rows,
+                **fit_info,
+                "importance_type": importance_type,
+                "skipped_columns": ctx.cardinality_report.get("skipped_columns", {}),
             },
             "error_message": None,
         }
+        if permutation_info is not None:
+            # Разброс по перемешиваниям — только для признаков из топа
+            permutation_info["importances_std"] = {
+                name: permutation_info["importances_std"][name] for name in feat_dict
+            }
+            result_dict["details"]["permutation"] = permutation_info
+        return result_dict
 
     except Exception as e:
         return {
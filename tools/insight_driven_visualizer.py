@@ -1,159 +1,61 @@
 # tools/insight_driven_visualizer.py
 import os
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
-from typing import Dict, Any, List
-from sklearn.preprocessing import LabelEncoder
+from typing import Dict, Any, List, Optional
+from core.analysis_context import AnalysisContext
+from core.image_policy import ImagePolicy, get_image_policy
 from core.logger import get_logger
+from core.plotting import PlotRegistry, PlotSpec, render_plots, safe_feature_name
+from core.vectorized_stats import contingency_frame
 
 logger = get_logger(__name__, "orchestrator.log")
 
-def _safe_feature_name(name: str) -> str:
-    """Создает безопасное имя файла из названия признака."""
-    return "".join(c for c in name if c.isalnum() or c in (' ', '_', '-')).rstrip()
+def _data_spec(kind: str, feature: str, target_column: str, output_dir: str, prefix: str, ext: str = ".png") -> PlotSpec:
+    """Описание графика по значениям признака в группах таргета."""
+    name = safe_feature_name(feature)
+    if kind == "boxplot":
+        return PlotSpec(kind, os.path.join(output_dir, f"{prefix}{name}_boxplot{ext}"), feature, prefix,
+                        title=f'Распределение {feature} по группам', xlabel='Группа')
+    if kind == "histogram":
+        return PlotSpec(kind, os.path.join(output_dir, f"{prefix}{name}_hist{ext}"), feature, prefix,
+                        title=f'Гистограмма {feature} по группам', figsize=(10, 5))
+    return PlotSpec(kind, os.path.join(output_dir, f"{prefix}{name}_scatter{ext}"), feature, prefix,
+                    title=f'Диаграмма рассеяния {feature} vs {target_column}', ylabel=target_column)
 
 
-def _plot_boxplot(df: pd.DataFrame, feature: str, target_column: str, output_dir: str, prefix: str = ""):
-    """Строит и сохраняет boxplot."""
-    try:
-        plt.figure(figsize=(8, 5))
-        sns.boxplot(data=df, x=target_column, y=feature)
-        plt.title(f'{prefix}Распределение {feature} по группам')
-        plt.xlabel('Группа')
-        plt.ylabel(feature)
-        filename = f"{prefix}{_safe_feature_name(feature)}_boxplot.png"
-        filepath = os.path.join(output_dir, filename)
-        plt.savefig(filepath, bbox_inches='tight', dpi=150)
-        plt.close()
-        return filepath
-    except Exception as e:
-        plt.close()
-        return None
-
-
-def _plot_histograms(df: pd.DataFrame, feature: str, target_column: str, output_dir: str, prefix: str = ""):
-    """Строит и сохраняет гистограммы для групп."""
-    try:
-        plt.figure(figsize=(10, 5))
-        for val in sorted(df[target_column].dropna().unique()):
-            subset = df[df[target_column] == val][feature].dropna()
-            if not subset.empty:
-                sns.histplot(subset, kde=True, label=f'Группа {val}', alpha=0.6)
-        plt.title(f'{prefix}Гистограмма {feature} по группам')
-        plt.xlabel(feature)
-        plt.ylabel('Плотность')
-        plt.legend()
-        filename = f"{prefix}{_safe_feature_name(feature)}_hist.png"
-        filepath = os.path.join(output_dir, filename)
-        plt.savefig(filepath, bbox_inches='tight', dpi=150)
-        plt.close()
-        return filepath
-    except Exception as e:
-        plt.close()
-        return None
-
-
-def _plot_scatter(df: pd.DataFrame, feature: str, target_column: str, output_dir: str, prefix: str = ""):
-    """Строит и сохраняет scatter plot."""
-    try:
-        plt.figure(figsize=(8, 5))
-        # Для бинарной переменной jitter может помочь
-        x = df[feature]
-        y = df[target_column] + np.random.normal(0, 0.05, size=len(df)) # небольшой jitter
-        plt.scatter(x, y, alpha=0.5, s=10)
-        plt.xlabel(feature)
-        plt.ylabel(target_column)
-        plt.title(f'{prefix}Диаграмма рассеяния {feature} vs {target_column}')
-        filename = f"{prefix}{_safe_feature_name(feature)}_scatter.png"
-        filepath = os.path.join(output_dir, filename)
-        plt.savefig(filepath, bbox_inches='tight', dpi=150)
-        plt.close()
-        return filepath
-    except Exception as e:
-        plt.close()
-        return None
+def _is_numeric(df: pd.DataFrame, feature: str) -> bool:
+    """Можно ли строить по признаку boxplot/гистограмму/scatter (числовой столбец)."""
+    return pd.api.types.is_numeric_dtype(df[feature])
 
 
-def _plot_stacked_bar(df: pd.DataFrame, feature: str, target_column: str, output_dir: str, prefix: str = ""):
-    """Строит и сохраняет stacked bar chart."""
-    try:
+def _stacked_bar_spec(
+    df: pd.DataFrame,
+    feature: str,
+    target_column: str,
+    output_dir: str,
+    prefix: str = "",
+    context: Optional[AnalysisContext] = None,
+    ext: str = ".png",
+) -> PlotSpec:
+    """Описание stacked bar chart.
+
+    Если передан контекст анализа, используется уже посчитанная таблица
+    сопряжённости из его кэша.
+    """
+    if context is not None and feature in context.categorical_names:
+        crosstab = contingency_frame(context, feature, normalize=True)
+    else:
         crosstab = pd.crosstab(df[feature], df[target_column], normalize='index')
-        ax = crosstab.plot(kind='bar', stacked=True, figsize=(10, 6))
-        plt.title(f'{prefix}Доля групп по {feature}')
-        plt.xlabel(feature)
-        plt.ylabel('Доля')
-        plt.xticks(rotation=45, ha='right')
-        plt.legend(title=target_column)
-        filename = f"{prefix}{_safe_feature_name(feature)}_stacked_bar.png"
-        filepath = os.path.join(output_dir, filename)
-        plt.savefig(filepath, bbox_inches='tight', dpi=150)
-        plt.close()
-        return filepath
-    except Exception as e:
-        plt.close()
-        return None
-
-
-def _plot_feature_importance(importances: Dict[str, float], output_dir: str, prefix: str = ""):
-    """Строит и сохраняет bar chart важности признаков."""
-    try:
-        if not importances:
-            return None
-        sorted_features = sorted(importances.items(), key=lambda item: item[1], reverse=True)
-        features, scores = zip(*sorted_features)
-        
-        plt.figure(figsize=(10, max(6, len(features) * 0.3)))
-        bars = plt.barh(features, scores, color='skyblue')
-        plt.xlabel('Важность')
-        plt.title(f'{prefix}Важность признаков (Random Forest)')
-        plt.gca().invert_yaxis() # Наиболее важные сверху
-
-        # Добавление значений на бары
-        for bar, value in zip(bars, scores):
-            plt.text(bar.get_width() + max(scores)*0.01, bar.get_y() + bar.get_height()/2,
-                     f'{value:.4f}', va='center', ha='left')
+    return PlotSpec(
+        "stacked_bar", os.path.join(output_dir, f"{prefix}{safe_feature_name(feature)}_stacked_bar{ext}"),
+        feature, prefix, title=f'Доля групп по {feature}', figsize=(10, 6),
+        params={"crosstab": crosstab, "target_column": target_column},
+    )
 
-        filename = f"{prefix}feature_importance.png"
-        filepath = os.path.join(output_dir, filename)
-        plt.savefig(filepath, bbox_inches='tight', dpi=150)
-        plt.close()
-        return filepath
-    except Exception as e:
-        plt.close()
-        return None
-
-
-def _plot_outlier_summary(outliers_info: Dict[str, Any], output_dir: str, prefix: str = ""):
-    """Строит и сохраняет bar chart количества выбросов."""
-    try:
-        if not outliers_info:
-            return None
-            
-        features = list(outliers_info.keys())
-        counts = [info.get('count', 0) for info in outliers_info.values()]
-        
-        plt.figure(figsize=(10, max(6, len(features) * 0.3)))
-        bars = plt.barh(features, counts, color='salmon')
-        plt.xlabel('Количество выбросов')
-        plt.title(f'{prefix}Количество выбросов по признакам')
-        plt.gca().invert_yaxis()
 
-        # Добавление значений на бары
-        for bar, value in zip(bars, counts):
-            plt.text(bar.get_width() + max(counts)*0.01, bar.get_y() + bar.get_height()/2,
-                     f'{value}', va='center', ha='left')
-
-        filename = f"{prefix}outlier_summary.png"
-        filepath = os.path.join(output_dir, filename)
-        plt.savefig(filepath, bbox_inches='tight', dpi=150)
-        plt.close()
-        return filepath
-    except Exception as e:
-        plt.close()
-        return None
+def _bar_figsize(n_bars: int) -> tuple:
+    return (10, max(6, n_bars * 0.3))
 
 
 def insight_driven_visualizer(
@@ -162,6 +64,10 @@ def insight_driven_visualizer(
     analysis_results: List[Dict[str, Any]], # Это будет history из orchestrator
     output_dir: str = "report/output/images",
     top_k: int = 3,
+    n_jobs: Optional[int] = None,
+    plot_registry: Optional[PlotRegistry] = None,
+    context: Optional[AnalysisContext] = None,
+    image_policy: Optional[ImagePolicy] = None,
     **kwargs
 ) -> Dict[str, Any]:
     """
@@ -173,6 +79,11 @@ def insight_driven_visualizer(
         analysis_results: Список результатов от предыдущих инструментов (history).
         output_dir: Директория для сохранения изображений.
         top_k: Количество топ признаков для визуализации из каждого анализа.
+        n_jobs: Число процессов для отрисовки (None — по числу ядер).
+        plot_registry: Реестр отложенной отрисовки. Если передан, графики
+            только регистрируются и рисуются, когда на них сошлётся отчёт.
+        context: Общий контекст анализа (кэш таблиц сопряжённости и т.д.).
+        image_policy: Формат и DPI изображений (None — текущая политика).
         **kwargs: Дополнительные параметры.
 
     Returns:
@@ -182,9 +93,20 @@ def insight_driven_visualizer(
     try:
         # Создаем директорию для изображений, если её нет
         Path(output_dir).mkdir(parents=True, exist_ok=True)
+        policy = image_policy or get_image_policy()
+        ext = policy.extension
 
-        saved_plots = {}
-        plot_count = 0
+        # Графики сначала описываются (PlotSpec), затем рисуются одним пакетом в пуле процессов
+        specs: List[PlotSpec] = []
+        # (ключ, {роль: индекс в specs}, описание)
+        entries = []
+
+        def add_entry(key: str, roles: Dict[str, PlotSpec], description: str) -> None:
+            indices = {}
+            for role, spec in roles.items():
+                indices[role] = len(specs)
+                specs.append(spec)
+            entries.append((key, indices, description))
 
         # 1. Визуализация результатов DescriptiveStatsComparator
         desc_results = [r for r in analysis_results if r["tool_name"] == "DescriptiveStatsComparator" and r["status"] == "success"]
@@ -200,16 +122,11 @@ def insight_driven_visualizer(
                 else:
                     feature = feature_stat
                     
-                if feature in df.columns and feature != target_column:
-                    bp_path = _plot_boxplot(df, feature, target_column, output_dir, prefix=f"desc_")
-                    hist_path = _plot_histograms(df, feature, target_column, output_dir, prefix=f"desc_")
-                    if bp_path or hist_path:
-                        saved_plots[f"desc_{feature}"] = {
-                            "boxplot": bp_path,
-                            "histogram": hist_path,
-                            "description": f"Визуализация для {feature} из DescriptiveStatsComparator"
-                        }
-                        plot_count += 1
+                if feature in df.columns and feature != target_column and _is_numeric(df, feature):
+                    add_entry(f"desc_{feature}", {
+                        "boxplot": _data_spec("boxplot", feature, target_column, output_dir, "desc_", ext),
+                        "histogram": _data_spec("histogram", feature, target_column, output_dir, "desc_", ext),
+                    }, f"Визуализация для {feature} из DescriptiveStatsComparator")
 
         # 2. Визуализация результатов CorrelationAnalysis
         corr_results = [r for r in analysis_results if r["tool_name"] == "CorrelationAnalysis" and r["status"] == "success"]
@@ -223,16 +140,11 @@ def insight_driven_visualizer(
             top_corr_features = [feat for feat, _ in sorted_corr[:top_k]]
             
             for feature in top_corr_features:
-                if feature in df.columns and feature != target_column:
-                    scat_path = _plot_scatter(df, feature, target_column, output_dir, prefix=f"corr_")
-                    bp_path = _plot_boxplot(df, feature, target_column, output_dir, prefix=f"corr_")
-                    if scat_path or bp_path:
-                        saved_plots[f"corr_{feature}"] = {
-                            "scatter": scat_path,
-                            "boxplot": bp_path,
-                            "description": f"Визуализация для {feature} из CorrelationAnalysis"
-                        }
-                        plot_count += 1
+                if feature in df.columns and feature != target_column and _is_numeric(df, feature):
+                    add_entry(f"corr_{feature}", {
+                        "scatter": _data_spec("scatter", feature, target_column, output_dir, "corr_", ext),
+                        "boxplot": _data_spec("boxplot", feature, target_column, output_dir, "corr_", ext),
+                    }, f"Визуализация для {feature} из CorrelationAnalysis")
 
         # 3. Визуализация результатов CategoricalFeatureAnalysis
         cat_results = [r for r in analysis_results if r["tool_name"] == "CategoricalFeatureAnalysis" and r["status"] == "success"]
@@ -245,13 +157,9 @@ def insight_driven_visualizer(
             
             for feature in top_cat_features:
                 if feature in df.columns and feature != target_column:
-                    sb_path = _plot_stacked_bar(df, feature, target_column, output_dir, prefix=f"cat_")
-                    if sb_path:
-                        saved_plots[f"cat_{feature}"] = {
-                            "stacked_bar": sb_path,
-                            "description": f"Визуализация для {feature} из CategoricalFeatureAnalysis"
-                        }
-                        plot_count += 1
+                    add_entry(f"cat_{feature}", {
+                        "stacked_bar": _stacked_bar_spec(df, feature, target_column, output_dir, prefix="cat_", context=context, ext=ext),
+                    }, f"Визуализация для {feature} из CategoricalFeatureAnalysis")
 
         # 4. Визуализация результатов OutlierDetector
         out_results = [r for r in analysis_results if r["tool_name"] == "OutlierDetector" and r["status"] == "success"]
@@ -259,13 +167,13 @@ def insight_driven_visualizer(
             out_result = out_results[0]
             outliers_info = out_result.get("details", {}).get("outliers", {})
             if outliers_info:
-                out_plot_path = _plot_outlier_summary(outliers_info, output_dir, prefix=f"out_")
-                if out_plot_path:
-                    saved_plots["outlier_summary"] = {
-                        "summary_plot": out_plot_path,
-                        "description": "Сводный график количества выбросов по признакам"
-                    }
-                    plot_count += 1
+                add_entry("outlier_summary", {
+                    "summary_plot": PlotSpec(
+                        "outlier_summary", os.path.join(output_dir, f"out_outlier_summary{ext}"), prefix="out_",
+                        title='Количество выбросов по признакам', figsize=_bar_figsize(len(outliers_info)),
+                        params={"outliers": outliers_info},
+                    ),
+                }, "Сводный график количества выбросов по признакам")
 
         # 5. Визуализация результатов FullModelFeatureImportance
         imp_results = [r for r in analysis_results if r["tool_name"] == "FullModelFeatureImportance" and r["status"] == "success"]
@@ -273,13 +181,13 @@ def insight_driven_visualizer(
             imp_result = imp_results[0]
             importances = imp_result.get("details", {}).get("feature_importances", {})
             if importances:
-                imp_plot_path = _plot_feature_importance(importances, output_dir, prefix=f"imp_")
-                if imp_plot_path:
-                    saved_plots["feature_importance"] = {
-                        "importance_plot": imp_plot_path,
-                        "description": "График важности признаков из RandomForest"
-                    }
-                    plot_count += 1
+                add_entry("feature_importance", {
+                    "importance_plot": PlotSpec(
+                        "feature_importance", os.path.join(output_dir, f"imp_feature_importance{ext}"), prefix="imp_",
+                        title='Важность признаков (Random Forest)', figsize=_bar_figsize(len(importances)),
+                        params={"importances": importances},
+                    ),
+                }, "График важности признаков из RandomForest")
 
         # 6. Визуализация главного признака из PrimaryFeatureFinder
         pf_results = [r for r in analysis_results if r["tool_name"] == "PrimaryFeatureFinder" and r["status"] == "success"]
@@ -287,15 +195,32 @@ def insight_driven_visualizer(
             pf_result = pf_results[0]
             best_feature = pf_result.get("details", {}).get("best_feature")
             if best_feature and best_feature in df.columns and best_feature != target_column:
-                bp_path = _plot_boxplot(df, best_feature, target_column, output_dir, prefix=f"pf_")
-                hist_path = _plot_histograms(df, best_feature, target_column, output_dir, prefix=f"pf_")
-                if bp_path or hist_path:
-                    saved_plots[f"pf_{best_feature}"] = {
-                        "boxplot": bp_path,
-                        "histogram": hist_path,
-                        "description": f"Визуализация главного признака: {best_feature}"
+                if _is_numeric(df, best_feature):
+                    roles = {
+                        "boxplot": _data_spec("boxplot", best_feature, target_column, output_dir, "pf_", ext),
+                        "histogram": _data_spec("histogram", best_feature, target_column, output_dir, "pf_", ext),
+                    }
+                else:
+                    # Категориальный главный признак: доли групп вместо распределения значений
+                    roles = {
+                        "stacked_bar": _stacked_bar_spec(df, best_feature, target_column, output_dir, prefix="pf_", context=context, ext=ext),
                     }
-                    plot_count += 1
+                add_entry(f"pf_{best_feature}", roles, f"Визуализация главного признака: {best_feature}")
+
+        # Одинаковые графики (например, boxplot признака под desc_, corr_ и pf_) рисуются один раз
+        if plot_registry is not None:
+            paths = [plot_registry.register(spec) for spec in specs]
+            render_stats = {"requested": len(specs), "deferred": len(specs)}
+        else:
+            render_stats = {}
+            paths = render_plots(specs, df, target_column, n_jobs=n_jobs, dpi=policy.dpi, stats=render_stats)
+
+        saved_plots = {}
+        for key, indices, description in entries:
+            plot_paths = {role: paths[i] for role, i in indices.items()}
+            if any(plot_paths.values()):
+                saved_plots[key] = {**plot_paths, "description": description}
+        plot_count = len(saved_plots)
 
         if plot_count == 0:
             summary = "Не удалось создать визуализации на основе результатов анализа"
@@ -308,7 +233,8 @@ def insight_driven_visualizer(
             "summary": summary,
             "details": {
                 "saved_plots": saved_plots,
-                "total_plots": plot_count
+                "total_plots": plot_count,
+                "render_stats": render_stats,
             },
             "error_message": None,
         }
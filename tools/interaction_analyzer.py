@@ -3,15 +3,41 @@
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
-from sklearn.preprocessing import LabelEncoder
-from scipy.stats import pointbiserialr
+from typing import Dict, Any, Optional
+
+from core.analysis_context import AnalysisContext, get_analysis_context
+from core.interaction_screening import MAX_CANDIDATES, context_pairwise_interactions
+from core.vectorized_stats import context_contingency, context_point_biserial
 
 def interaction_analyzer(
-    df: pd.DataFrame, target_column: str, top_k: int = 5, **kwargs
+    df: pd.DataFrame,
+    target_column: str,
+    top_k: int = 5,
+    max_candidates: int = MAX_CANDIDATES,
+    alpha: float = 0.05,
+    n_jobs: Optional[int] = None,
+    context: Optional[AnalysisContext] = None,
+    **kwargs
 ) -> Dict[str, Any]:
     """
-    Анализирует взаимодействия между признаками и целевой переменной.
+    Анализирует связи признаков с целевой переменной и парные взаимодействия признаков.
+
+    Все пары признаков оцениваются дешёвым проходом по бинированным кодам,
+    LR-тест выполняется только для max_candidates лучших пар
+    (см. core/interaction_screening.py).
+
+    Args:
+        df: Входной DataFrame.
+        target_column: Имя целевой переменной.
+        top_k: Количество возвращаемых признаков и пар.
+        max_candidates: Сколько пар проверять LR-тестом.
+        alpha: Уровень значимости для p-value с поправкой Бонферрони.
+        n_jobs: Число процессов для отбора пар (None — по числу ядер).
+        context: Общий контекст анализа. Если не передан, строится по df.
+        **kwargs: Дополнительные параметры.
+
+    Returns:
+        Словарь с результатами анализа.
     """
     tool_name = "InteractionAnalyzer"
     try:
@@ -24,55 +50,38 @@ def interaction_analyzer(
                 "error_message": f"target_column '{target_column}' not found",
             }
 
-        y = df[target_column]
-        X = df.drop(columns=[target_column])
-
-        # Кодируем целевую переменную если нужно
-        if y.dtype.kind not in "biufc":
-            y = LabelEncoder().fit_transform(y.astype(str))
-        else:
-            y = y.astype(int).values
-
-        # Разделяем числовые и категориальные признаки
-        X_num = X.select_dtypes(include=["number"])
-        X_cat = X.select_dtypes(include=["object", "category"])
+        # Целевая переменная и разделение признаков берутся из общего контекста
+        ctx = get_analysis_context(df, target_column, context)
 
         interactions = []
 
         # Анализ взаимодействий числовых признаков
-        if not X_num.empty:
-            for col in X_num.columns[:min(10, len(X_num.columns))]:  # Ограничиваем для скорости
-                if X_num[col].nunique() <= 1:
-                    continue
-                try:
-                    corr, _ = pointbiserialr(y[:len(X_num[col])], X_num[col])
-                    if not np.isnan(corr):
-                        interactions.append({
-                            "feature": col,
-                            "type": "numeric",
-                            "correlation": float(corr),
-                            "description": f"Числовой признак {col}"
-                        })
-                except Exception:
-                    continue
+        if ctx.numeric_names:
+            # Корреляции берутся из общего (кэшируемого) расчёта по всему блоку
+            stats = context_point_biserial(ctx) if ctx.is_binary else None
+            for j, col in enumerate(ctx.numeric_names):
+                corr = stats["correlation"][j] if stats is not None else np.nan
+                if not np.isnan(corr):
+                    interactions.append({
+                        "feature": col,
+                        "type": "numeric",
+                        "correlation": float(corr),
+                        "description": f"Числовой признак {col}"
+                    })
 
         # Анализ категориальных признаков
-        if not X_cat.empty:
-            from scipy.stats import chi2_contingency
-            for col in X_cat.columns[:min(10, len(X_cat.columns))]:
-                try:
-                    cross_tab = pd.crosstab(X_cat[col], y)
-                    if cross_tab.shape[0] >= 2 and cross_tab.shape[1] >= 2:
-                        chi2, p, dof, _ = chi2_contingency(cross_tab)
-                        interactions.append({
-                            "feature": col,
-                            "type": "categorical",
-                            "p_value": float(p),
-                            "chi2": float(chi2),
-                            "description": f"Категориальный признак {col}"
-                        })
-                except Exception:
-                    continue
+        if ctx.categorical_names:
+            # Хи-квадрат берётся из общих таблиц сопряжённости контекста
+            tests = context_contingency(ctx)
+            for j, col in enumerate(ctx.categorical_names):
+                if tests["dof"][j] > 0:
+                    interactions.append({
+                        "feature": col,
+                        "type": "categorical",
+                        "p_value": float(tests["p_value"][j]),
+                        "chi2": float(tests["chi2"][j]),
+                        "description": f"Категориальный признак {col}"
+                    })
 
         # Сортируем по значимости
         interactions.sort(key=lambda x: (
@@ -81,10 +90,29 @@ def interaction_analyzer(
 
         top_interactions = interactions[:top_k]
 
-        if not top_interactions:
+        # Парные взаимодействия: дешёвый отбор по всем парам, LR-тест для лучших
+        pairwise = []
+        screening = None
+        if ctx.is_binary and len(ctx.feature_names) >= 2:
+            screening = context_pairwise_interactions(ctx, max_candidates=max_candidates, n_jobs=n_jobs)
+            pairwise = [
+                {
+                    **pair,
+                    "description": f"Взаимодействие {pair['features'][0]} × {pair['features'][1]}",
+                }
+                for pair in screening["pairs"]
+                if pair["p_value_adjusted"] < alpha
+            ][:top_k]
+
+        if not top_interactions and not pairwise:
             summary = "Взаимодействия не найдены"
         else:
             summary = f"Найдено {len(top_interactions)} значимых взаимодействий"
+            if screening is not None:
+                summary += (
+                    f" и {len(pairwise)} парных "
+                    f"(оценено пар: {screening['n_pairs_evaluated']}, отсеяно: {screening['n_pairs_pruned']})"
+                )
 
         return {
             "tool_name": tool_name,
@@ -92,7 +120,11 @@ def interaction_analyzer(
             "summary": summary,
             "details": {
                 "interactions": top_interactions,
-                "total_analyzed": len(interactions)
+                "total_analyzed": len(interactions),
+                "pairwise_interactions": pairwise,
+                "pair_screening": {
+                    key: value for key, value in screening.items() if key != "pairs"
+                } if screening is not None else None,
             },
             "error_message": None,
         }
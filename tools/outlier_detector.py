@@ -2,11 +2,18 @@
 # Обнаружение выбросов, которые могут влиять на результаты.
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
-from scipy import stats
+from typing import Dict, Any, Optional
+
+from core.analysis_context import AnalysisContext, get_analysis_context
+from core.vectorized_stats import context_outliers
 
 def outlier_detector(
-    df: pd.DataFrame, target_column: str, method: str = "iqr", threshold: float = 1.5, **kwargs
+    df: pd.DataFrame,
+    target_column: str,
+    method: str = "iqr",
+    threshold: float = 1.5,
+    context: Optional[AnalysisContext] = None,
+    **kwargs
 ) -> Dict[str, Any]:
     """
     Обнаруживает выбросы в числовых признаках.
@@ -22,9 +29,9 @@ def outlier_detector(
                 "error_message": f"target_column '{target_column}' not found",
             }
 
-        X_num = df.select_dtypes(include=["number"]).drop(columns=[target_column], errors='ignore')
-        
-        if X_num.empty:
+        ctx = get_analysis_context(df, target_column, context)
+
+        if not ctx.numeric_names or ctx.n_rows == 0:
             return {
                 "tool_name": tool_name,
                 "status": "error",
@@ -33,29 +40,27 @@ def outlier_detector(
                 "error_message": "No numeric features",
             }
 
+        # Границы и маски выбросов для всех столбцов сразу; построчные маски
+        # (битовые поля) остаются в кэше контекста для визуализатора и отчёта
+        masks = context_outliers(ctx, method, threshold)
+
         outliers_info = {}
         total_outliers = 0
-        
-        for col in X_num.columns:
-            if method == "iqr":
-                Q1 = X_num[col].quantile(0.25)
-                Q3 = X_num[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - threshold * IQR
-                upper_bound = Q3 + threshold * IQR
-                outliers = X_num[(X_num[col] < lower_bound) | (X_num[col] > upper_bound)]
-            elif method == "zscore":
-                z_scores = np.abs(stats.zscore(X_num[col].dropna()))
-                outliers = X_num[z_scores > threshold]
-            
-            outlier_count = len(outliers)
-            if outlier_count > 0:
-                outliers_info[col] = {
-                    "count": outlier_count,
-                    "percentage": (outlier_count / len(X_num)) * 100,
-                    "method": method
-                }
-                total_outliers += outlier_count
+
+        for j in np.flatnonzero(masks["count"]):
+            col = ctx.numeric_names[j]
+            outlier_count = int(masks["count"][j])
+            outliers_info[col] = {
+                "count": outlier_count,
+                "percentage": (outlier_count / ctx.n_rows) * 100,
+                "method": method,
+                "lower_bound": float(masks["lower"][j]),
+                "upper_bound": float(masks["upper"][j]),
+            }
+            if "count_0" in masks:
+                outliers_info[col]["count_group_0"] = int(masks["count_0"][j])
+                outliers_info[col]["count_group_1"] = int(masks["count_1"][j])
+            total_outliers += outlier_count
 
         if not outliers_info:
             summary = "Выбросы не обнаружены"
@@ -1,20 +1,31 @@
 # tools/primary_feature_finder.py
-import numpy as np
 import pandas as pd
-from typing import Dict, Any
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.preprocessing import LabelEncoder
+from typing import Dict, Any, Optional
+
+from core.analysis_context import AnalysisContext, get_analysis_context
+from core.binning import MAX_BINS
+from core.split_search import find_best_splits
 
 
 def primary_feature_finder(
-    df: pd.DataFrame, target_column: str, **kwargs
+    df: pd.DataFrame,
+    target_column: str,
+    top_n: int = 5,
+    context: Optional[AnalysisContext] = None,
+    **kwargs
 ) -> Dict[str, Any]:
     """
-    Обучает решающее дерево глубины 1 для поиска самого важного признака.
+    Ищет самый важный признак — лучшее разбиение глубины 1 (решающий пень) по Gini.
+
+    Для каждого признака находится лучший порог (для категориальных —
+    лучшее разбиение множества категорий), признаки ранжируются по
+    Information Gain.
 
     Args:
         df: Входной DataFrame.
         target_column: Имя бинарной целевой переменной.
+        top_n: Сколько следующих за лучшим признаков вернуть в runner_ups.
+        context: Общий контекст анализа. Если не передан, строится по df.
         **kwargs: Дополнительные параметры (не используются).
 
     Returns:
@@ -31,10 +42,9 @@ def primary_feature_finder(
                 "error_message": f"target_column '{target_column}' not found",
             }
 
-        X = df.drop(columns=[target_column])
-        y = df[target_column]
+        ctx = get_analysis_context(df, target_column, context)
 
-        if X.empty:
+        if not ctx.feature_names or ctx.n_rows == 0:
             return {
                 "tool_name": tool_name,
                 "status": "error",
@@ -43,15 +53,9 @@ def primary_feature_finder(
                 "error_message": "Dataset has only target column",
             }
 
-        # Кодируем целевую переменную
-        if y.dtype.kind not in "biufc":
-            y = LabelEncoder().fit_transform(y.astype(str))
-        else:
-            y = y.astype(int).values
-
         # Проверка бинарности
-        unique_classes = np.unique(y)
-        if len(unique_classes) != 2:
+        unique_classes = ctx.classes
+        if not ctx.is_binary:
             return {
                 "tool_name": tool_name,
                 "status": "error",
@@ -60,20 +64,9 @@ def primary_feature_finder(
                 "error_message": f"Target column must be binary. Found {len(unique_classes)} classes: {unique_classes.tolist()}",
             }
 
-        # Подготовка признаков
-        X_proc = X.copy()
-        for col in X_proc.columns:
-            if X_proc[col].dtype.kind not in "biufc":
-                X_proc[col] = LabelEncoder().fit_transform(X_proc[col].astype(str))
-            else:
-                X_proc[col] = X_proc[col].fillna(X_proc[col].median())
-
-        # Обучение дерева
-        clf = DecisionTreeClassifier(max_depth=1, random_state=42)
-        clf.fit(X_proc.values, y)
-
-        feature_idx = int(clf.tree_.feature[0])
-        if feature_idx == -2:  # no split
+        # Лучшее разбиение глубины 1 по гистограммам классов всех признаков
+        splits = find_best_splits(ctx)
+        if not splits:
             return {
                 "tool_name": tool_name,
                 "status": "error",
@@ -82,23 +75,37 @@ def primary_feature_finder(
                 "error_message": "Decision tree did not split",
             }
 
-        feature_name = X_proc.columns[feature_idx]
-        threshold = float(clf.tree_.threshold[0])
-
-        # Расчёт Information Gain
-        n_total = clf.tree_.n_node_samples[0]
-        n_left = clf.tree_.n_node_samples[clf.tree_.children_left[0]]
-        n_right = clf.tree_.n_node_samples[clf.tree_.children_right[0]]
-        parent_impurity = float(clf.tree_.impurity[0])
-        left_impurity = float(clf.tree_.impurity[clf.tree_.children_left[0]])
-        right_impurity = float(clf.tree_.impurity[clf.tree_.children_right[0]])
-        weighted_child_impurity = (left_impurity * n_left + right_impurity * n_right) / n_total
-        information_gain = parent_impurity - weighted_child_impurity
-
-        summary = (
-            f"Признак '{feature_name}' выбран деревом как главный. "
-            f"Порог={threshold:.4f}, Information Gain={information_gain:.4f}"
-        )
+        best = splits[0]
+        feature_name = best["feature"]
+        threshold = best["threshold"]
+        information_gain = best["information_gain"]
+
+        if best["kind"] == "categorical":
+            summary = (
+                f"Признак '{feature_name}' выбран как главный. "
+                f"Категории {best['left_categories']} против остальных, "
+                f"Information Gain={information_gain:.4f}"
+            )
+        else:
+            summary = (
+                f"Признак '{feature_name}' выбран деревом как главный. "
+                f"Порог={threshold:.4f}, Information Gain={information_gain:.4f}"
+            )
+            if best["approximate"]:
+                summary += (
+                    f". Порог приближённый: у признака больше {MAX_BINS} уникальных значений, "
+                    "поиск шёл по квантильным бинам"
+                )
+
+        runner_ups = [
+            {
+                "feature": item["feature"],
+                "information_gain": item["information_gain"],
+                "split_threshold": item["threshold"],
+                "approximate_threshold": item["approximate"],
+            }
+            for item in splits[1:top_n + 1]
+        ]
 
         return {
             "tool_name": tool_name,
@@ -106,10 +113,17 @@ def primary_feature_finder(
             "summary": summary,
             "details": {
                 "best_feature": feature_name,
+                "split_type": best["kind"],
+                # Для категориального признака порог задан по доле класса 1 в категории
                 "split_threshold": threshold,
+                # Порог выбран среди границ квантильных бинов (> MAX_BINS уникальных значений)
+                "approximate_threshold": best["approximate"],
+                "left_categories": best["left_categories"],
+                "missing_go_left": best["missing_left"],
                 "information_gain": information_gain,
-                "n_left": n_left,
-                "n_right": n_right,
+                "n_left": best["n_left"],
+                "n_right": best["n_right"],
+                "runner_ups": runner_ups,
             },
             "error_message": None,
         }
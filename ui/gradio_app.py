@@ -3,21 +3,23 @@
 Gradio UI для InsightFinder.
 """
 
+import asyncio
 import os
 import io
 import zipfile
 import re
 import time
 import base64
-import tempfile
 from pathlib import Path
 from typing import Tuple, List, Optional
 
 import gradio as gr
-import pandas as pd
 
-from core.pipeline import analyze_dataset
+from core.dataset_cache import load_data_cached
+from core.pipeline import analyze_dataframe_async
 from core.logger import get_logger
+from core.orchestrator import DEFAULT_PLANNER
+from core.plotting import PlotRegistry, get_current_registry
 from core.utils import find_binary_target
 
 try:
@@ -33,6 +35,28 @@ except ImportError:
 
 logger = get_logger(__name__, "gradio_app.log")
 
+# Сколько анализов одновременно выполняет процесс. Анализы асинхронные и не
+# занимают поток на пользователя, но каждый держит датасет и пулы процессов —
+# остальные ждут в очереди Gradio.
+MAX_CONCURRENT_ANALYSES = int(os.getenv("INSIGHTFINDER_MAX_CONCURRENT_ANALYSES", "3"))
+# CSV больше этого размера читается потоково (чанками, с компактными целыми и category)
+STREAMING_MIN_BYTES = int(float(os.getenv("INSIGHTFINDER_STREAMING_MIN_MB", "200")) * 1024 * 1024)
+# Понижение float64 до float32 меняет статистики и p-value — только по явному включению
+DOWNCAST_FLOATS = os.getenv("INSIGHTFINDER_DOWNCAST_FLOATS", "0") == "1"
+
+
+def _load_options(filepath: str) -> dict:
+    """
+    Параметры load_data для загруженного файла.
+
+    Небольшие файлы читаются с точными типами; потоковая загрузка включается
+    только для больших CSV, и без INSIGHTFINDER_DOWNCAST_FLOATS=1 дробные
+    столбцы остаются float64.
+    """
+    if os.path.getsize(filepath) < STREAMING_MIN_BYTES:
+        return {}
+    return {"streaming": True, "downcast_floats": DOWNCAST_FLOATS}
+
 
 def call_llm_for_qa(
         report_text: str,
@@ -144,17 +168,24 @@ def call_llm_to_determine_target(
         return columns[0] if columns else ""
 
 
-def run_analysis(file_obj, api_key: str, base_url: str, model: str, question_for_target: str,
+async def run_analysis(file_obj, api_key: str, base_url: str, model: str, question_for_target: str,
+                 planner: Optional[str] = None,
 ) -> Tuple[str, str, str, str, str]:
     """
     Запускает анализ датасета.
 
+    Корутина: загрузка файла и CPU-bound шаги выполняются в пуле потоков,
+    запросы к LLM ожидаются без блокировки, поэтому один процесс Gradio
+    обслуживает несколько анализов одновременно.
+
     Args:
         file_obj: Объект файла Gradio.
         api_key: API ключ.
         base_url: Базовый URL.
         model: Модель.
         question_for_target: Вопрос для определения таргета.
+        planner: Планировщик шагов: "llm", "fixed" (без вызовов Analyst LLM)
+            или "parallel" (план без LLM, инструменты параллельно).
 
     Returns:
         Кортеж: (статус, путь_к_отчету_md, HTML_отчет_для_отображения,
@@ -170,12 +201,15 @@ def run_analysis(file_obj, api_key: str, base_url: str, model: str, question_for
         )
 
     try:
-        df = pd.read_csv(file_obj.name)
+        df = await asyncio.to_thread(load_data_cached, file_obj.name, **_load_options(file_obj.name))
         logger.info("✅ Загружен файл через Gradio UI.")
 
-        binary_cols = [col for col in df.columns if df[col].nunique() == 2]
+        binary_cols = await asyncio.to_thread(
+            lambda: [col for col in df.columns if df[col].nunique() == 2]
+        )
         if binary_cols:
-            determined_target = call_llm_to_determine_target(
+            determined_target = await asyncio.to_thread(
+                call_llm_to_determine_target,
                 question_for_target, binary_cols, api_key, base_url, model
             )
             if determined_target in binary_cols:
@@ -198,22 +232,18 @@ def run_analysis(file_obj, api_key: str, base_url: str, model: str, question_for
                 "", "", "", ""
             )
 
-        with tempfile.NamedTemporaryFile(
-                mode="w", delete=False, suffix=".csv", encoding="utf-8"
-        ) as tmpfile:
-            df.to_csv(tmpfile.name, index=False)
-            tmp_path = tmpfile.name
-
         original_filename = os.path.basename(file_obj.name)
-        report_path, history, report_text = analyze_dataset(
-            tmp_path, target_col, original_filename
-        )
+        result = await analyze_dataframe_async(df, target_col, original_filename, planner=planner)
+        if result is None:
+            return (
+                f"❌ Не удалось преобразовать '{target_col}' в бинарную переменную.",
+                "", "", "", ""
+            )
+        report_path, history, report_text = result
         logger.info("✅ Анализ завершен.")
 
-        os.unlink(tmp_path)
-
         from report.to_html import markdown_to_html_with_images
-        report_html = markdown_to_html_with_images(report_text)
+        report_html = await asyncio.to_thread(markdown_to_html_with_images, report_text)
         logger.info("✅ Отчет преобразован в HTML.")
 
         return (
@@ -313,6 +343,43 @@ def create_zip_with_images(report_text: str) -> Optional[str]:
         return None
 
 
+def create_zip_with_all_plots(registry: Optional[PlotRegistry] = None) -> Optional[str]:
+    """
+    Строит все графики последнего анализа, включая те, на которые отчёт
+    не сослался (отрисовка отложена), и упаковывает их в ZIP архив.
+
+    Args:
+        registry: Реестр графиков анализа (из состояния сессии). None —
+            реестр текущего контекста.
+
+    Returns:
+        Путь к созданному ZIP-файлу или None.
+    """
+    registry = registry or get_current_registry()
+    if registry is None:
+        return None
+
+    try:
+        paths = [path for path in registry.render(registry.names()).values() if path]
+        if not paths:
+            return None
+
+        tmp_dir = "tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        timestamp = int(time.time())
+        zip_file_path = os.path.join(tmp_dir, f"all_plots_{timestamp}.zip")
+
+        with zipfile.ZipFile(zip_file_path, "w") as zip_file:
+            for path in paths:
+                zip_file.write(path, Path(path).name)
+
+        logger.info(f"Архив всех графиков создан: {zip_file_path} ({len(paths)} файлов)")
+        return zip_file_path
+    except Exception as e:
+        logger.error(f"Ошибка создания ZIP со всеми графиками: {e}")
+        return None
+
+
 def create_logs_zip() -> Optional[str]:
     """
     Создает ZIP архив со всеми .log файлами из папки logs и сохраняет его с читаемым именем.
@@ -476,12 +543,15 @@ def build_interface():
         history_state = gr.State("")
         report_html_state = gr.State("")
         report_html_download_state = gr.State("")
+        # Реестр графиков анализа этой сессии (для архива всех графиков); данные в нём сокращены release_data
+        plot_registry_state = gr.State(None)
 
         with gr.Tab("Анализ"):
             with gr.Row():
                 with gr.Column(scale=1):
                     file_input = gr.File(
-                        label="📁 Загрузите CSV-файл", file_types=[".csv"]
+                        label="📁 Загрузите файл (CSV, Parquet, Feather, Arrow)",
+                        file_types=[".csv", ".parquet", ".feather", ".arrow"],
                     )
 
                     with gr.Accordion("⚙️ Настройки API", open=True):
@@ -548,6 +618,16 @@ def build_interface():
                                     "клиентов?",
                     )
 
+                    planner_radio = gr.Radio(
+                        choices=[
+                            ("🧠 LLM выбирает инструменты", "llm"),
+                            ("⚡ Фиксированный план (быстрее)", "fixed"),
+                            ("🚀 Фиксированный план, инструменты параллельно", "parallel"),
+                        ],
+                        value=DEFAULT_PLANNER,
+                        label="Планировщик анализа",
+                    )
+
                     run_btn = gr.Button("🚀 Запустить анализ", variant="primary")
 
                 with gr.Column(scale=2):
@@ -564,6 +644,10 @@ def build_interface():
                         report_html_download = gr.File(label="📥 Скачать отчёт (.html)")
                         logs_download = gr.File(label="📥 Скачать логи (.zip)")
 
+                    with gr.Row(visible=False) as all_plots_row:
+                        all_plots_btn = gr.Button("🖼 Построить все графики")
+                        all_plots_download = gr.File(label="📥 Все графики (.zip)")
+
                     with gr.Group(visible=False) as qa_section:
                         gr.Markdown("### Задать вопрос по отчету")
 
@@ -605,16 +689,21 @@ def build_interface():
             queue=False,
         )
 
-        def on_run_analysis(file_obj, api_key, base_url, model, question_for_target):
+        async def on_run_analysis(file_obj, api_key, base_url, model, question_for_target, planner):
             original_filename = file_obj.name.split("/")[-1] if file_obj else "unknown.csv"
 
-            status, report_path, report_html, report_text, history = run_analysis(
-                file_obj, api_key, base_url, model, question_for_target
+            status, report_path, report_html, report_text, history = await run_analysis(
+                file_obj, api_key, base_url, model, question_for_target, planner
             )
+            # Оркестратор хранит реестр в ContextVar контекста этого обработчика
+            registry = get_current_registry()
 
-            zip_path = create_zip_with_images(report_text)
-            html_file_path = save_html_report(report_html)
-            logs_zip_path = create_logs_zip()
+            zip_path = await asyncio.to_thread(create_zip_with_images, report_text)
+            html_file_path = await asyncio.to_thread(save_html_report, report_html)
+            logs_zip_path = await asyncio.to_thread(create_logs_zip)
+            if registry is not None:
+                # В состоянии сессии остаются описания графиков и нужные им столбцы, а не весь датасет
+                await asyncio.to_thread(registry.release_data)
 
             report_visible = bool(report_html)
             download_visible = bool(report_path or zip_path or html_file_path or logs_zip_path)
@@ -630,10 +719,12 @@ def build_interface():
                 html_file_path if html_file_path and os.path.exists(html_file_path) else None,
                 logs_zip_path if logs_zip_path and os.path.exists(logs_zip_path) else None,
                 gr.update(visible=download_visible),
+                gr.update(visible=download_visible),
                 gr.update(visible=qa_visible),
                 report_html,
                 report_text,
                 history,
+                registry,
             )
 
         run_btn.click(
@@ -644,6 +735,7 @@ def build_interface():
                 base_url_input,
                 model_dropdown if OPENAI_AVAILABLE else model_input,
                 question_for_target_input,
+                planner_radio,
             ],
             outputs=[
                 status_output,
@@ -654,13 +746,18 @@ def build_interface():
                 report_html_download,
                 logs_download,   
                 download_row,
+                all_plots_row,
                 qa_section,
                 report_html_state,
                 report_text_state,
                 history_state,
+                plot_registry_state,
             ],
+            concurrency_limit=MAX_CONCURRENT_ANALYSES,
         )
 
+        all_plots_btn.click(create_zip_with_all_plots, inputs=[plot_registry_state], outputs=[all_plots_download])
+
         def on_ask_question(question, report_text, api_key, base_url, model):
             answer = answer_question(question, report_text, api_key, base_url, model)
             return answer